@@ -31,6 +31,9 @@
 from aghast.interface import frombuffer
 from aghast.interface import fromarray
 from aghast.interface import fromfile
+from aghast.interface import filedirectory
+from aghast.interface import fromshared
+from aghast.interface import merge
 
 def tonumpy(obj):
     import aghast._connect._numpy
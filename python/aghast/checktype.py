@@ -63,16 +63,20 @@ def setparent(parent, value):
             setparent(parent, x)
 
 def _checkitem(check):
-    if check.type is str:
-        return CheckString(check.classname, check.paramname, required=check.required)
-    elif check.type is float:
-        return CheckNumber(check.classname, check.paramname, required=check.required)
-    elif check.type is int:
-        return CheckInteger(check.classname, check.paramname, required=check.required)
-    elif isinstance(check.type, list):
-        return CheckEnum(check.classname, check.paramname, required=check.required, choices=check.type)
-    else:
-        return CheckClass(check.classname, check.paramname, required=check.required, type=check.type)
+    out = getattr(check, "_itemcheck", None)
+    if out is None:
+        if check.type is str:
+            out = CheckString(check.classname, check.paramname, required=check.required)
+        elif check.type is float:
+            out = CheckNumber(check.classname, check.paramname, required=check.required)
+        elif check.type is int:
+            out = CheckInteger(check.classname, check.paramname, required=check.required)
+        elif isinstance(check.type, list):
+            out = CheckEnum(check.classname, check.paramname, required=check.required, choices=check.type)
+        else:
+            out = CheckClass(check.classname, check.paramname, required=check.required, type=check.type)
+        check._itemcheck = out
+    return out
 
 class Vector(Sequence):
     def __init__(self, data):
@@ -181,8 +185,11 @@ class Lookup(Mapping):
         return not self.__eq__(other)
 
 class FBLookup(Lookup):
-    def __init__(self, length, lookup, get, check, parent):
-        self._lookup = {lookup(i).decode("utf-8"): i for i in range(length)}
+    def __init__(self, length, lookup, get, check, parent, keyindex=None):
+        self._length = length
+        self._name = lookup
+        self._lookup = None
+        self._keyindex = keyindex
         self._got = {}
         self._get = get
         assert isinstance(check, CheckLookup), repr(type(check))
@@ -191,18 +198,41 @@ class FBLookup(Lookup):
         self._check = _checkitem(check)
         self._parent = parent
 
+    def _keys(self):
+        if self._lookup is None:
+            self._lookup = {self._name(i).decode("utf-8"): i for i in range(self._length)}
+        return self._lookup
+
+    def _index(self, where):
+        # a key index from the file footer finds one name without decoding all of the others
+        if self._lookup is None and self._keyindex is not None:
+            i = self._keyindex.find(where)
+            if i < 0:
+                raise KeyError(where)
+            if self._name(i).decode("utf-8") == where:
+                return i
+        return self._keys()[where]
+
     def __len__(self):
-        return len(self._lookup)
+        return self._length
 
     def __iter__(self):
-        return iter(self._lookup)
+        return iter(self._keys())
+
+    def __contains__(self, where):
+        try:
+            self._index(where)
+        except KeyError:
+            return False
+        else:
+            return True
 
     def __getitem__(self, where):
         import aghast.interface
 
         item = self._got.get(where, None)
         if item is None:
-            item = self._check.fromflatbuffers(self._get(self._lookup[where]))
+            item = self._check.fromflatbuffers(self._get(self._index(where)))
             self._got[where] = item
             if isinstance(item, aghast.interface.Ghast):
                 item._identifier = where
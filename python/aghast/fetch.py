@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2019, IRIS-HEP
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import collections
+import hashlib
+import os
+import re
+import stat
+import tempfile
+import threading
+
+try:
+    import http.client as httplib
+except ImportError:
+    import httplib
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+class Fetcher(object):
+    def __init__(self):
+        raise TypeError("{0} is an abstract base class; do not construct".format(type(self).__name__))
+
+    def read(self, url, start, stop):
+        return self.readranges(url, [(start, stop)])[0]
+
+    def readranges(self, url, ranges):
+        raise NotImplementedError(type(self).__name__)
+
+################################################################# BlockCache
+
+def _defaultdirectory():
+    # per user and private, so that another user cannot pre-create it or plant blocks in it
+    if not hasattr(os, "getuid"):
+        return os.path.join(tempfile.gettempdir(), "aghast-blocks")
+    directory = os.path.join(tempfile.gettempdir(), "aghast-blocks-{0}".format(os.getuid()))
+    try:
+        os.mkdir(directory, 0o700)
+    except OSError:
+        pass
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077 != 0:
+        raise IOError("{0} is not a directory that only this user can access; pass BlockCache(directory=...)".format(repr(directory)))
+    return directory
+
+class BlockCache(object):
+    def __init__(self, directory=None, blocksize=65536, maxbytes=268435456):
+        if directory is None:
+            directory = _defaultdirectory()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.blocksize = blocksize
+        self.maxbytes = maxbytes
+        self._lock = threading.Lock()
+        self._sizes = collections.OrderedDict()
+        self._total = 0
+        existing = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path) and not name.endswith(".tmp"):
+                info = os.stat(path)
+                existing.append((info.st_atime, name, info.st_size))
+        for atime, name, size in sorted(existing):
+            self._sizes[name] = size
+            self._total += size
+
+    def _prefix(self, url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest() + "-"
+
+    def _name(self, url, validator, index):
+        # the validator identifies the version of the remote file, so a rewritten file never reads old blocks
+        return "{0}{1}-{2}-{3}".format(self._prefix(url), hashlib.sha1(validator.encode("utf-8")).hexdigest()[:16], self.blocksize, index)
+
+    def cached(self, url):
+        prefix = self._prefix(url)
+        with self._lock:
+            return any(name.startswith(prefix) for name in self._sizes)
+
+    def discard(self, url, validator):
+        # drop the blocks of every other version of url
+        prefix = self._prefix(url)
+        keep = self._name(url, validator, "")
+        with self._lock:
+            names = [name for name in self._sizes if name.startswith(prefix) and not name.startswith(keep)]
+            for name in names:
+                self._total -= self._sizes.pop(name)
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def get(self, url, validator, index):
+        name = self._name(url, validator, index)
+        with self._lock:
+            if name not in self._sizes:
+                return None
+            self._sizes[name] = self._sizes.pop(name)
+        try:
+            with open(os.path.join(self.directory, name), "rb") as file:
+                return file.read()
+        except IOError:
+            with self._lock:
+                self._total -= self._sizes.pop(name, 0)
+            return None
+
+    def put(self, url, validator, index, data):
+        name = self._name(url, validator, index)
+        path = os.path.join(self.directory, name)
+        tmp = "{0}.{1}.{2}.tmp".format(path, os.getpid(), threading.current_thread().ident)
+        with open(tmp, "wb") as file:
+            file.write(data)
+        os.rename(tmp, path)
+        with self._lock:
+            self._total += len(data) - self._sizes.pop(name, 0)
+            self._sizes[name] = len(data)
+            while self._total > self.maxbytes and len(self._sizes) > 1:
+                oldname, oldsize = self._sizes.popitem(last=False)
+                self._total -= oldsize
+                try:
+                    os.remove(os.path.join(self.directory, oldname))
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            for name in self._sizes:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+            self._sizes.clear()
+            self._total = 0
+
+    def __len__(self):
+        return len(self._sizes)
+
+    @property
+    def nbytes(self):
+        return self._total
+
+################################################################# HTTPFetcher
+
+class HTTPFetcher(Fetcher):
+    def __init__(self, cache=None, blocksize=65536, timeout=30, headers=None):
+        self.cache = cache
+        self.blocksize = cache.blocksize if cache is not None else blocksize
+        self.timeout = timeout
+        self.headers = dict(headers) if headers is not None else {}
+        self.requests = 0
+        self._local = threading.local()
+        self._validators = {}
+
+    def _connection(self, parsed):
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        key = (parsed.scheme, parsed.netloc)
+        if key not in connections:
+            if parsed.scheme == "https":
+                connections[key] = httplib.HTTPSConnection(parsed.netloc, timeout=self.timeout)
+            else:
+                connections[key] = httplib.HTTPConnection(parsed.netloc, timeout=self.timeout)
+        return key, connections
+
+    def close(self):
+        for connection in getattr(self._local, "connections", {}).values():
+            connection.close()
+        self._local.connections = {}
+
+    def _request(self, url, start, stop):
+        parsed = urlparse(url)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        headers = dict(self.headers)
+        headers["Range"] = "bytes={0}-{1}".format(start, stop - 1)
+
+        key, connections = self._connection(parsed)
+        for attempt in (0, 1):
+            connection = connections[key]
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (httplib.HTTPException, IOError):
+                # a kept-alive connection that the server has since closed fails once; reconnect
+                connection.close()
+                del connections[key]
+                if attempt == 1:
+                    raise
+                key, connections = self._connection(parsed)
+        self.requests += 1
+
+        if response.status not in (200, 206, 416):
+            raise IOError("HTTP {0} {1} for {2}".format(response.status, response.reason, url))
+
+        # which version of the file this is: the ETag, or failing that its modification time and total length
+        match = re.match(r"bytes\s+(?:\d+-\d+|\*)/(\d+)", response.getheader("Content-Range", ""))
+        total = match.group(1) if match is not None else response.getheader("Content-Length", "") if response.status == 200 else ""
+        validator = "{0};{1};{2}".format(response.getheader("ETag", ""), response.getheader("Last-Modified", ""), total)
+
+        if response.status == 206:
+            match = re.match(r"bytes\s+(\d+)-", response.getheader("Content-Range", ""))
+            offset = int(match.group(1)) if match is not None else start
+            return data[start - offset : stop - offset], validator
+        elif response.status == 200:
+            return data[start:stop], validator
+        else:
+            return b"", validator
+
+    def readranges(self, url, ranges):
+        for attempt in (0, 1):
+            validator = self._validators.get(url)
+            if validator is None and self.cache is not None and self.cache.cached(url):
+                # blocks on disk may be from an older version of the file: ask which version is current
+                data, validator = self._request(url, 0, 1)
+                self._validators[url] = validator
+                self.cache.discard(url, validator)
+            out = self._readranges(url, ranges, validator)
+            if out is not None:
+                return out
+        raise IOError("{0} changed while it was being read".format(url))
+
+    def _readranges(self, url, ranges, validator):
+        blocksize = self.blocksize
+        blocks = {}
+        needed = set()
+        for start, stop in ranges:
+            for index in range(start // blocksize, (stop + blocksize - 1) // blocksize):
+                if index not in blocks and self.cache is not None and validator is not None:
+                    data = self.cache.get(url, validator, index)
+                    if data is not None:
+                        blocks[index] = data
+                if index not in blocks:
+                    needed.add(index)
+
+        needed = sorted(needed)
+        runs = []
+        for index in needed:
+            if len(runs) != 0 and runs[-1][1] == index:
+                runs[-1][1] = index + 1
+            else:
+                runs.append([index, index + 1])
+
+        for first, last in runs:
+            data, fresh = self._request(url, first * blocksize, last * blocksize)
+            if fresh != validator:
+                self._validators[url] = fresh
+                if validator is not None:
+                    # the file changed since the blocks we already have were read: start over
+                    if self.cache is not None:
+                        self.cache.discard(url, fresh)
+                    return None
+                validator = fresh
+            for index in range(first, last):
+                block = data[(index - first) * blocksize : (index - first + 1) * blocksize]
+                blocks[index] = block
+                if self.cache is not None and len(block) != 0:
+                    self.cache.put(url, validator, index, block)
+
+        out = []
+        for start, stop in ranges:
+            first = start // blocksize
+            chunk = b"".join(blocks[index] for index in range(first, (stop + blocksize - 1) // blocksize))
+            data = chunk[start - first * blocksize : stop - first * blocksize]
+            if len(data) != stop - start:
+                raise IOError("{0} has fewer than {1} bytes".format(url, stop))
+            out.append(data)
+        return out
+
+################################################################# registry
+
+fetchers = {}
+
+def register(scheme, fetcher):
+    fetchers[scheme.lower()] = fetcher
+
+def fetcher(url):
+    scheme = urlparse(url).scheme.lower()
+    if scheme not in fetchers:
+        if scheme in ("http", "https"):
+            fetchers[scheme] = HTTPFetcher(cache=BlockCache())
+        else:
+            raise ValueError("no fetcher registered for {0} URLs; use aghast.fetch.register".format(repr(scheme)))
+    return fetchers[scheme]
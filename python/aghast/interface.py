@@ -31,12 +31,18 @@
 import collections
 import ctypes
 import functools
+import hashlib
 import math
 import numbers
 import operator
 import os
+import pickle
 import struct
 import sys
+import tempfile
+import threading
+import weakref
+import zlib
 try:
     from collections.abc import Iterable
 except ImportError:
@@ -117,6 +123,7 @@ import aghast.aghast_generated.Object
 import aghast.aghast_generated.Collection
 
 import aghast.checktype
+import aghast.fetch
 
 MININT64 = -9223372036854775808
 MAXINT64 = 9223372036854775807
@@ -132,49 +139,244 @@ def _sameedges(one, two):
         return False
     return (numpy.absolute(one - two) / gap < 1e-6).all()
 
+def _gridindex(scaled, low_inclusive, high_inclusive, lowest, highest):
+    # bin k of a regular grid covers [k, k + 1) (or (k, k + 1] if only high_inclusive); out of [lowest, highest] is clipped to one beyond
+    if high_inclusive and not low_inclusive:
+        index = numpy.ceil(scaled) - 1
+    else:
+        index = numpy.floor(scaled)
+    index = numpy.clip(index, lowest - 1, highest + 1).astype(numpy.int64)
+    if not low_inclusive and not high_inclusive:
+        index[(scaled == numpy.floor(scaled)) & (scaled >= lowest) & (scaled <= highest + 1)] = _gapindex
+    return index
+
+_gapindex = numpy.iinfo(numpy.int64).min
+
 def _name2fb(name):
     return "".join(x.capitalize() for x in name.split("_"))
 
+def _reserve(builder, numbytes):
+    needed = numbytes + 16
+    if builder.head < needed:
+        oldsize = len(builder.Bytes)
+        newsize = min(max(2*oldsize, oldsize + needed), flatbuffers.Builder.MAX_BUFFER_SIZE)
+        if newsize < oldsize + needed:
+            raise flatbuffers.builder.BuilderSizeError("flatbuffers: cannot grow buffer beyond 2 gigabytes")
+        newbytes = bytearray(newsize)
+        newbytes[newsize - oldsize:] = builder.Bytes
+        builder.Bytes = newbytes
+        builder.head += newsize - oldsize
+
+def _vectorfromarray(builder, startvector, array):
+    array = numpy.ascontiguousarray(array).reshape(-1)
+    raw = array.view(numpy.uint8)
+    _reserve(builder, len(raw))
+    startvector(builder, len(array))
+    builder.head = builder.head - len(raw)
+    if len(raw) != 0:
+        numpy.frombuffer(builder.Bytes, dtype=numpy.uint8, count=len(raw), offset=builder.head)[:] = raw
+    return builder.EndVector(len(array))
+
+def _sizeestimate(obj):
+    if obj is None:
+        return 0
+    elif isinstance(obj, Ghast):
+        return obj.serialized_size_estimate()
+    elif isinstance(obj, aghast.checktype.Lookup):
+        return 16 + sum(24 + len(n.encode("utf-8")) + _sizeestimate(x) for n, x in obj.items())
+    elif isinstance(obj, aghast.checktype.Vector):
+        return 16 + sum(4 + _sizeestimate(x) for x in obj)
+    elif isinstance(obj, numpy.ndarray):
+        return 16 + obj.nbytes
+    elif isinstance(obj, bytes):
+        return 16 + len(obj)
+    elif isinstance(obj, str):
+        return 16 + len(obj.encode("utf-8"))
+    elif isinstance(obj, slice):
+        return 32
+    else:
+        return 8
+
+def _fingerprint(hasher, obj, structure_only):
+    if obj is None:
+        hasher.update(b"N")
+    elif isinstance(obj, Ghast):
+        hasher.update(b"G")
+        hasher.update(obj.fingerprint(structure_only).encode("ascii"))
+    elif isinstance(obj, Enum):
+        hasher.update("E{0}".format(obj).encode("utf-8"))
+    elif isinstance(obj, (bool, numpy.bool_)):
+        hasher.update(b"T" if obj else b"F")
+    elif isinstance(obj, numbers.Integral):
+        hasher.update("I{0}".format(int(obj)).encode("ascii"))
+    elif isinstance(obj, numbers.Real):
+        # numbers that compare equal get the same digest, whether given as ints or floats
+        if math.isinf(obj) or math.isnan(obj) or obj != int(obj) or abs(obj) >= 2**53:
+            hasher.update("R{0!r}".format(float(obj)).encode("ascii"))
+        else:
+            hasher.update("I{0}".format(int(obj)).encode("ascii"))
+    elif (sys.version_info[0] >= 3 and isinstance(obj, str)) or (sys.version_info[0] < 3 and isinstance(obj, basestring)):
+        hasher.update(u"S{0}:{1}".format(len(obj), obj).encode("utf-8"))
+    elif isinstance(obj, bytes):
+        hasher.update("B{0}:".format(len(obj)).encode("ascii"))
+        hasher.update(obj)
+    elif isinstance(obj, numpy.ndarray):
+        hasher.update("A{0}{1}".format(obj.dtype.str, obj.shape).encode("ascii"))
+        if obj.dtype.names is None:
+            hasher.update(numpy.ascontiguousarray(obj).view(numpy.uint8))
+        else:
+            # structured arrays may have padding between fields
+            for n in obj.dtype.names:
+                _fingerprint(hasher, obj[n], structure_only)
+    elif isinstance(obj, aghast.checktype.Lookup):
+        hasher.update("L{0}:".format(len(obj)).encode("ascii"))
+        for n, x in obj.items():
+            _fingerprint(hasher, n, structure_only)
+            _fingerprint(hasher, x, structure_only)
+    elif isinstance(obj, (aghast.checktype.Vector, list, tuple)):
+        hasher.update("V{0}:".format(len(obj)).encode("ascii"))
+        for x in obj:
+            _fingerprint(hasher, x, structure_only)
+    else:
+        hasher.update(repr(obj).encode("utf-8"))
+
+def _invalidate(node):
+    # the node and all of its ancestors no longer match their cached digests or the flatbuffer bytes they were read from
+    while node is not None:
+        node._structure_fingerprint = None
+        node._modified = True
+        node._validated = None
+        node = getattr(node, "_parent", None)
+
+def _equal(one, two, tolerance):
+    if isinstance(one, Ghast):
+        return one._equal(two, tolerance)
+    else:
+        return one == two
+
+def _pristine(node):
+    # the flatbuffer table that a node still exactly matches, or None if it was built or modified in Python
+    if getattr(node, "_modified", False):
+        return None
+    return getattr(getattr(node, "_flatbuffers", None), "_tab", None)
+
+def _sourcedir(source):
+    # relative external_source=file locations are resolved from the directory of the file that was read
+    filename = getattr(source, "filename", None)
+    return None if filename is None else os.path.dirname(filename)
+
+def _samebytes(one, two):
+    tabone = _pristine(one)
+    tabtwo = _pristine(two)
+    if tabone is None or tabtwo is None or tabone.Pos != tabtwo.Pos:
+        return False
+    if tabone.Bytes is tabtwo.Bytes:
+        # the same table of the same buffer, however each side reached it
+        return True
+    if hasattr(one, "_parent") or hasattr(two, "_parent") or _sourcedir(tabone.Bytes) != _sourcedir(tabtwo.Bytes):
+        return False
+    if isinstance(tabone.Bytes, bytes) and isinstance(tabtwo.Bytes, bytes):
+        return tabone.Bytes == tabtwo.Bytes
+    return _samearray(numpy.frombuffer(tabone.Bytes, dtype=numpy.uint8), numpy.frombuffer(tabtwo.Bytes, dtype=numpy.uint8))
+
+def _samearray(one, two):
+    # memcmp-style comparison that stops at the first differing chunk; only exact for types without NaN or signed zero
+    if one.shape != two.shape or one.dtype != two.dtype:
+        return False
+    if one.__array_interface__ == two.__array_interface__:
+        return True
+    one = one.reshape(-1)
+    two = two.reshape(-1)
+    step = max(1, _filterchunk // max(1, one.dtype.itemsize))
+    for i in range(0, len(one), step):
+        if not numpy.array_equal(one[i : i + step], two[i : i + step]):
+            return False
+    else:
+        return True
+
+def _fbaccessor(fb, check):
+    fbname = _name2fb(check.paramname)
+    fbnamelen = fbname + "Length"
+    fbnamelookup = fbname + "Lookup"
+    fbnametag = fbname + "ByTag"
+
+    def method(name):
+        # generated Flatbuffers classes define accessors on the class; _MockFlatbuffers sets them per instance
+        if hasattr(type(fb), name):
+            return getattr(type(fb), name)
+        else:
+            return lambda fb: getattr(fb, name)()
+
+    if hasattr(fb, fbnametag):
+        gettag = method(fbnametag)
+        def accessor(self, fb):
+            value = gettag(fb)
+            aghast.checktype.setparent(self, value)
+            return value
+
+    elif hasattr(fb, fbnamelookup):
+        def accessor(self, fb):
+            return aghast.checktype.FBLookup(getattr(fb, fbnamelen)(), getattr(fb, fbnamelookup), getattr(fb, fbname), check, self, getattr(fb, "_keyindex", None))
+
+    elif hasattr(fb, fbnamelen):
+        def accessor(self, fb):
+            return aghast.checktype.FBVector(getattr(fb, fbnamelen)(), getattr(fb, fbname), check, self)
+
+    else:
+        get = method(fbname)
+        fromflatbuffers = check.fromflatbuffers
+        def accessor(self, fb):
+            value = fromflatbuffers(get(fb))
+            aghast.checktype.setparent(self, value)
+            return value
+
+    return accessor
+
 def typedproperty(check):
+    private = "_" + check.paramname
+    accessors = {}
+
     @property
     def prop(self):
-        private = "_" + check.paramname
-        if not hasattr(self, private):
+        try:
+            return getattr(self, private)
+        except AttributeError:
             assert hasattr(self, "_flatbuffers"), "not derived from a flatbuffer or not properly initialized"
-            fbname = _name2fb(check.paramname)
-            fbnamelen = fbname + "Length"
-            fbnamelookup = fbname + "Lookup"
-            fbnametag = fbname + "ByTag"
-            if hasattr(self._flatbuffers, fbnametag):
-                value = getattr(self._flatbuffers, fbnametag)()
-                aghast.checktype.setparent(self, value)
-            elif hasattr(self._flatbuffers, fbnamelookup):
-                value = aghast.checktype.FBLookup(getattr(self._flatbuffers, fbnamelen)(), getattr(self._flatbuffers, fbnamelookup), getattr(self._flatbuffers, fbname), check, self)
-            elif hasattr(self._flatbuffers, fbnamelen):
-                value = aghast.checktype.FBVector(getattr(self._flatbuffers, fbnamelen)(), getattr(self._flatbuffers, fbname), check, self)
-            else:
-                value = check.fromflatbuffers(getattr(self._flatbuffers, fbname)())
-                aghast.checktype.setparent(self, value)
+            fb = self._flatbuffers
+            key = (type(self), type(fb))
+            accessor = accessors.get(key)
+            if accessor is None:
+                accessor = accessors[key] = _fbaccessor(fb, check)
+            value = accessor(self, fb)
             setattr(self, private, value)
-        return getattr(self, private)
+            return value
 
     @prop.setter
     def prop(self, value):
         value = check(value)
         aghast.checktype.setparent(self, value)
-        setattr(self, "_" + check.paramname, value)
+        setattr(self, private, value)
+        _invalidate(self)
 
     return prop
 
+class _DirtySeen(set):
+    # passed as "seen" to skip Objects that were validated in the same position and not modified since
+    pass
+
 def _valid(obj, seen, recursive):
     if obj is None:
         pass
     elif isinstance(obj, Ghast):
+        if isinstance(seen, _DirtySeen) and obj._isvalidated():
+            return
         if id(obj) in seen:
             raise ValueError("hierarchy is recursively nested")
         seen.add(id(obj))
         obj._validtypes()
         obj._valid(seen, recursive)
+        if recursive:
+            obj._markvalid()
     elif isinstance(obj, aghast.checktype.Vector):
         for x in obj:
             _valid(x, seen, recursive)
@@ -184,20 +386,6 @@ def _valid(obj, seen, recursive):
     else:
         raise AssertionError(type(obj))
 
-def _getbykey(self, field, where):
-    lookup = "_lookup_" + field
-    if not hasattr(self, lookup):
-        values = getattr(self, field)
-        if isinstance(values, aghast.checktype.Vector):
-            setattr(self, lookup, {x.identifier: x for x in values})
-            if len(getattr(self, lookup)) != len(values):
-                raise ValueError("{0}.{1} keys must be unique".format(type(self).__name__, field))
-        elif isinstance(values, aghast.checktype.Lookup):
-            setattr(self, lookup, values)
-        else:
-            raise AssertionError(type(values))
-    return getattr(self, lookup)[where]
-
 class _MockFlatbuffers(object):
     class _ByTag(object):
         __slots__ = ["getdata", "gettype", "lookup"]
@@ -236,7 +424,22 @@ class _LocIndexer(object):
 
 ################################################# Ghast
 
-class Ghast(object):
+class _GhastType(type):
+    def __new__(meta, name, bases, namespace):
+        inherited = set()
+        mixinslots = []
+        for base in bases:
+            for cls in base.__mro__:
+                inherited.update(cls.__dict__.get("__slots__", ()))
+                mixinslots.extend(cls.__dict__.get("_mixinslots", ()))
+
+        slots = list(namespace.get("__slots__", ())) + mixinslots + ["_" + n for n in namespace.get("_params", ())]
+        namespace["__slots__"] = tuple(n for i, n in enumerate(slots) if n not in inherited and n not in slots[:i])
+        return type.__new__(meta, name, bases, namespace)
+
+class Ghast(_GhastType("GhastBase", (object,), {"__slots__": ()})):
+    __slots__ = ("_flatbuffers", "_parent", "_identifier", "_structure_fingerprint", "_modified", "_validated")
+
     def __repr__(self):
         if "identifier" in self._params:
             identifier = " " + repr(self.identifier)
@@ -266,8 +469,16 @@ class Ghast(object):
     def _valid(self, seen, recursive):
         pass
 
+    def _isvalidated(self):
+        return False
+
+    def _markvalid(self):
+        pass
+
     def checkvalid(self, recursive=True):
         self._valid(set(), recursive)
+        if recursive:
+            self._markvalid()
 
     @property
     def isvalid(self):
@@ -293,6 +504,8 @@ class Ghast(object):
             out = type(self).__new__(type(self))
             if hasattr(self, "_flatbuffers"):
                 out._flatbuffers = self._flatbuffers
+                if getattr(self, "_modified", False):
+                    out._modified = True
             for n in self._params:
                 if n not in exceptions:
                     private = "_" + n
@@ -313,6 +526,29 @@ class Ghast(object):
     def _toflatbuffers(self, builder):
         raise NotImplementedError("missing _toflatbuffers implementation in {0}".format(type(self)))
 
+    def serialized_size_estimate(self):
+        return 16 + 4*len(self._params) + sum(_sizeestimate(getattr(self, n)) for n in self._params)
+
+    def fingerprint(self, structure_only=True):
+        if not structure_only:
+            return self._digest(False)
+        out = getattr(self, "_structure_fingerprint", None)
+        if out is None:
+            out = self._structure_fingerprint = self._digest(True)
+        return out
+
+    def _digest(self, structure_only):
+        hasher = hashlib.sha1(type(self).__name__.encode("ascii"))
+        for n, x in self._fingerprintitems(structure_only):
+            hasher.update(n.encode("ascii"))
+            _fingerprint(hasher, x, structure_only)
+        return hasher.hexdigest()
+
+    _descriptive = ("title", "metadata", "decoration")
+
+    def _fingerprintitems(self, structure_only):
+        return [(n, getattr(self, n)) for n in self._params if not structure_only or n not in self._descriptive]
+
     def dump(self, indent="", width=100, end="\n", file=sys.stdout, flush=False):
         file.write(self._dump(indent, width, end))
         file.write(end)
@@ -320,27 +556,36 @@ class Ghast(object):
             file.flush()
 
     def __eq__(self, other):
+        return self._equal(other, None)
+
+    def isclose(self, other, rtol=1e-05, atol=1e-08):
+        return self._equal(other, (rtol, atol))
+
+    def _equal(self, other, tolerance):
         if self is other:
             return True
-        if getattr(self, "_flatbuffers", None) is not None and self._flatbuffers is getattr(other, "_flatbuffers", None):
+        if getattr(self, "_flatbuffers", None) is not None and self._flatbuffers is getattr(other, "_flatbuffers", None) and not getattr(self, "_modified", False) and not getattr(other, "_modified", False):
             return True
         if type(self) is not type(other):
             return False
-        for n in self._params:
-            selfn = getattr(self, n)
-            othern = getattr(other, n)
+        if _samebytes(self, other):
+            return True
+        for (n, selfn), (m, othern) in zip(self._fingerprintitems(False), other._fingerprintitems(False)):
             if selfn is None or isinstance(selfn, (Ghast, Enum)):
-                if selfn != othern:
+                if not _equal(selfn, othern, tolerance):
                     return False
             elif isinstance(selfn, numpy.ndarray) and isinstance(othern, numpy.ndarray):
-                if not (selfn.shape == othern.shape and (selfn == othern).all()):
+                if selfn.dtype == othern.dtype and selfn.dtype.kind in "biu":
+                    if not _samearray(selfn, othern):
+                        return False
+                elif not (selfn.shape == othern.shape and (selfn == othern).all()):
                     return False
             elif isinstance(selfn, aghast.checktype.Lookup):
                 assert isinstance(othern, aghast.checktype.Lookup)
                 if not set(selfn) == set(othern):
                     return False
                 for x in selfn:
-                    if selfn[x] != othern[x]:
+                    if not _equal(selfn[x], othern[x], tolerance):
                         return False
             else:
                 try:
@@ -351,7 +596,7 @@ class Ghast(object):
                         return False
                 else:
                     for x, y in zip(selfn, othern):
-                        if x != y:
+                        if not _equal(x, y, tolerance):
                             return False
         else:
             return True
@@ -398,6 +643,29 @@ class Object(Ghast):
         self._add(other, pairs, triples, noclobber=False)
         return self
 
+    def accumulate(self):
+        return self
+
+    def finalize(self):
+        return self
+
+    def _isvalidated(self):
+        # an Object's validity depends only on itself and the bins of the Collections it is in
+        return getattr(self, "_validated", None) == self._shape((), ())
+
+    def _markvalid(self):
+        self._validated = self._shape((), ())
+
+    def _checkvalid(self, validate):
+        if validate == "full":
+            self.checkvalid()
+        elif validate == "dirty":
+            if not self._isvalidated():
+                self._valid(_DirtySeen(), True)
+                self._markvalid()
+        elif validate != "none":
+            raise ValueError("validate must be 'full', 'dirty', or 'none', not {0}".format(repr(validate)))
+
     @property
     def loc(self):
         return _LocIndexer(self, False)
@@ -412,32 +680,90 @@ class Object(Ghast):
         data = fb.Data()
         fb2 = deserializer()
         fb2.Init(data.Bytes, data.Pos)
-        return interface._fromflatbuffers(fb, fb2)
+        out = interface._fromflatbuffers(fb, fb2)
+        out._flatbuffers._tab = fb._tab
+        return out
 
-    def __getstate__(self):
-        return self.tobuffer()
+    def __reduce_ex__(self, protocol):
+        outofband = protocol >= 5 and hasattr(pickle, "PickleBuffer")
+        tab = _pristine(self)
+        if tab is not None and not hasattr(self, "_parent") and len(tab.Bytes) >= 4 and struct.unpack_from("<I", tab.Bytes, 0)[0] == tab.Pos:
+            # still exactly the bytes it was read from and the root of nothing more (not a file or an enclosing object): ship them without rebuilding
+            buffer, position, arrays, types = tab.Bytes, tab.Pos, [], []
+        else:
+            arrays, types = [], []
+            def external(x):
+                if not outofband or x.buffer.nbytes < _pickleoutofband:
+                    return x
+                arrays.append(numpy.ascontiguousarray(x.buffer))
+                types.append(type(x))
+                return x._toexternal(len(arrays) - 1)
+            buffer = self._tobuilder(None, external).Output()
+            position = aghast.aghast_generated.Object.Object.GetRootAsObject(buffer, 0)._tab.Pos
+
+        if outofband:
+            return _unpickle, (pickle.PickleBuffer(buffer), position, [pickle.PickleBuffer(x) for x in arrays], types)
+        elif isinstance(buffer, bytes):
+            return _unpickle, (buffer, position, arrays, types)
+        else:
+            return _unpickle, (numpy.frombuffer(buffer, dtype=numpy.uint8).tobytes(), position, arrays, types)
+
+    def _serializable(self, compression, external):
+        filters = _filters(compression)
+        if len(filters) == 0 and external is None and not any(isinstance(x, ExternalBuffer) and x.external_source == ExternalBuffer.samefile for parent, n, x in _buffers(self)):
+            return self
+
+        out = self.detached()
+        for parent, n, x in list(_buffers(out)):
+            y = x
+            if isinstance(y, ExternalBuffer) and y.external_source == ExternalBuffer.samefile:
+                y = y._toinline()
+            if len(filters) != 0 and isinstance(y, InterpretedBuffer) and isinstance(y, InlineBuffer) and (y.filters is None or len(y.filters) == 0):
+                y = y._compressed(filters)
+            if external is not None and isinstance(y, InlineBuffer):
+                y = external(y)
+            if y is not x:
+                setattr(parent, n, y)
+        return out
 
-    def __setstate__(self, state):
-        out = Object._fromflatbuffers(aghast.aghast_generated.Object.Object.GetRootAsObject(state, 0))
-        self._flatbuffers = out._flatbuffers
+    def _tobuilder(self, compression, external=None):
+        obj = self._serializable(compression, external)
+        builder = flatbuffers.Builder(min(obj.serialized_size_estimate(), flatbuffers.Builder.MAX_BUFFER_SIZE))
+        builder.Finish(obj._toflatbuffers(builder))
+        return builder
 
-    def tobuffer(self):
-        self.checkvalid()
-        builder = flatbuffers.Builder(1024)
-        builder.Finish(self._toflatbuffers(builder))
-        return builder.Output()
+    def tobuffer(self, compression=None, validate="full"):
+        self._checkvalid(validate)
+        return self._tobuilder(compression).Output()
 
     def toarray(self):
         return numpy.frombuffer(self.tobuffer(), dtype=numpy.uint8)
 
-    def tofile(self, file):
-        self.checkvalid()
+    def tofile(self, file, compression=None, external_threshold=None, append=False, name=None, validate="full"):
+        self._checkvalid(validate)
 
         opened = False
         if not hasattr(file, "write"):
-            file = open(file, "wb")
+            file = open(file, "r+b" if append and os.path.exists(file) else "wb")
             opened = True
 
+        entries = None
+        if append:
+            if not hasattr(file, "seek") or not hasattr(file, "read"):
+                raise TypeError("appending requires a file name or a readable, seekable file object")
+            file.seek(0, os.SEEK_END)
+            size = file.tell()
+            if size == 0:
+                entries = []
+            else:
+                def read(start, stop):
+                    file.seek(start)
+                    return file.read(stop - start)
+                entries, tail = _readdirectory(read, size)
+                file.seek(tail)
+        elif name is not None:
+            entries = []
+
         if not hasattr(file, "tell"):
             class FileLike(object):
                 def __init__(self, file):
@@ -455,19 +781,169 @@ class Object(Ghast):
                     return self.offset
             file = FileLike(file)
 
+        def external(buffer):
+            if buffer.buffer.nbytes <= external_threshold:
+                return buffer
+            file.write(b"\x00" * (-file.tell() % 8))
+            pointer = file.tell()
+            file.write(buffer.buffer)
+            return buffer._toexternal(pointer)
+
         try:
-            file.write(b"gast")
-            builder = flatbuffers.Builder(1024)
-            builder.Finish(self._toflatbuffers(builder))
+            if entries is None or len(entries) == 0:
+                file.write(b"gast")
+            builder = self._tobuilder(compression, None if external_threshold is None else external)
+            file.write(b"\x00" * (-file.tell() % 8))
             offset = file.tell()
             file.write(builder.Output())
+            pointer, numkeys = 0, 0
+            if isinstance(self, Collection) and len(self.objects) != 0:
+                file.write(b"\x00" * (-file.tell() % 8))
+                pointer = file.tell()
+                numkeys = _KeyIndex.write(file, list(self.objects))
+
+            if entries is None:
+                if numkeys != 0:
+                    file.write(struct.pack("<QQ", pointer, numkeys))
+                    file.write(b"gidx")
+            else:
+                # the directory and trailer are the only bytes rewritten by the next append
+                name = "" if name is None else name
+                version = max([v + 1 for n, v, r, k, m in entries if n == name] + [0])
+                entries.append((name, version, offset, pointer, numkeys))
+                _writedirectory(file, entries)
+
             file.write(struct.pack("<Q", offset))
             file.write(b"gast")
+            if append and hasattr(file, "truncate"):
+                file.truncate()
 
         finally:
             if opened:
                 file.close()
 
+    def toshared(self, name=None, compression=None):
+        buffer = self.tobuffer(compression=compression)
+        memory = _sharedmemory(name, create=True, size=_sharedheader + len(buffer))
+        memory.buf[:4] = b"gast"
+        struct.pack_into("<Qq", memory.buf, 8, len(buffer), 1)
+        memory.buf[_sharedheader : _sharedheader + len(buffer)] = buffer
+        return Shared(memory)
+
+# "gast", the flatbuffer's length, and the number of handles (the creator's and every reader's) still attached
+_sharedheader = 64
+
+class Shared(object):
+    # the creator's reference; the block is unlinked when it and every reader have let go, whichever is last
+    def __init__(self, memory):
+        self._memory = memory
+        self.name = memory.name
+
+    def __repr__(self):
+        return "<Shared {0}{1}>".format(repr(self.name), "" if self._memory is not None else " (closed)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        if self._memory is not None:
+            _sharedrelease(self._memory)
+            self._memory = None
+
+def _sharedmemory(name, create=False, size=0):
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        raise ImportError("toshared and fromshared require multiprocessing.shared_memory (Python 3.8 or later)")
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:
+        memory = shared_memory.SharedMemory(name=name, create=create, size=size)
+        if os.name != "nt":
+            # before Python 3.13, the resource tracker would unlink the block when any process that attached exits
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(memory._name, "shared_memory")
+        return memory
+
+def _sharedref(memory, delta):
+    # updated under an flock, so attaching and releasing in different processes don't race; Windows frees blocks with their last handle
+    try:
+        import fcntl
+    except ImportError:
+        return None
+    path = os.path.join(tempfile.gettempdir(), "aghast-shared-{0}.lock".format(memory.name.lstrip("/")))
+    with open(path, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            count, = struct.unpack_from("<q", memory.buf, 16)
+            if delta > 0 and count <= 0:
+                raise OSError("shared memory {0} has already been released".format(repr(memory.name)))
+            count += delta
+            struct.pack_into("<q", memory.buf, 16, count)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    if count <= 0:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return count
+
+def _sharedrelease(memory):
+    count = _sharedref(memory, -1)
+    if count is not None and count <= 0:
+        if sys.version_info < (3, 13):
+            # unlink unregisters from the resource tracker, so it has to be registered again first
+            from multiprocessing import resource_tracker
+            resource_tracker.register(memory._name, "shared_memory")
+        memory.unlink()
+    try:
+        memory.close()
+    except BufferError:
+        # only at exit, with arrays still viewing the block; the mapping goes with the process
+        pass
+
+class _SharedView(object):
+    # base of a reader's arrays: the reader's reference is released when the last of them is collected or the process exits
+    def __init__(self, memory, nbytes):
+        self.__array_interface__ = {"shape": (nbytes,), "typestr": "|u1", "version": 3,
+                                    "data": (numpy.frombuffer(memory.buf, dtype=numpy.uint8, count=nbytes, offset=_sharedheader).ctypes.data, True)}
+        import multiprocessing.util
+        multiprocessing.util.Finalize(self, _sharedrelease, args=(memory,), exitpriority=0)
+
+def fromshared(name, checkvalid=False):
+    memory = _sharedmemory(name)
+    try:
+        if bytes(memory.buf[:4]) != b"gast":
+            raise OSError("shared memory {0} does not begin with magic 'gast'".format(repr(name)))
+        nbytes, = struct.unpack_from("<Q", memory.buf, 8)
+        _sharedref(memory, 1)
+    except:
+        memory.close()
+        raise
+    return frombuffer(numpy.asarray(_SharedView(memory, nbytes)), checkvalid=checkvalid)
+
+_pickleoutofband = 65536
+
+def _unpickle(buffer, position, arrays, types):
+    fb = aghast.aghast_generated.Object.Object()
+    fb.Init(numpy.frombuffer(buffer, dtype=numpy.uint8), position)
+    out = Object._fromflatbuffers(fb)
+    if len(arrays) != 0:
+        # buffers that were sent out-of-band stand in for the "samefile" pointers they were replaced with
+        for parent, n, x in list(_buffers(out)):
+            if isinstance(x, ExternalBuffer) and x.external_source == ExternalBuffer.samefile:
+                array = numpy.frombuffer(arrays[x.pointer], dtype=numpy.uint8)
+                y = x._toinline(array)
+                if type(y) is not types[x.pointer]:
+                    # InterpretedInlineInt64Buffer and InterpretedInlineFloat64Buffer only have a buffer
+                    y = types[x.pointer](array)
+                setattr(parent, n, y)
+    return out
+
 def frombuffer(buffer, checkvalid=False, offset=0):
     out = Object._fromflatbuffers(aghast.aghast_generated.Object.Object.GetRootAsObject(buffer, offset))
     if checkvalid:
@@ -477,15 +953,303 @@ def frombuffer(buffer, checkvalid=False, offset=0):
 def fromarray(array, checkvalid=False):
     return frombuffer(array, checkvalid=checkvalid)
 
-def fromfile(file, mode="r+", checkvalid=False):
-    if isinstance(file, str):
-        file = numpy.memmap(file, dtype=numpy.uint8, mode=mode)
-    if file[:4].tostring() != b"gast":
+class _KeyIndex(object):
+    # names of a root Collection's objects sorted by their UTF-8 bytes, binary searched in place:
+    # numkeys + 1 "<u8" offsets into the names, numkeys "<u8" positions in Collection.objects, then the names
+    __slots__ = ("file", "offsets", "positions", "names", "numkeys")
+
+    def __init__(self, file, pointer, numkeys):
+        self.file = file
+        self.numkeys = numkeys
+        self.offsets = file[pointer : pointer + 8*(numkeys + 1)].view("<u8")
+        self.positions = file[pointer + 8*(numkeys + 1) : pointer + 8*(2*numkeys + 1)].view("<u8")
+        self.names = pointer + 8*(2*numkeys + 1)
+
+    @staticmethod
+    def write(file, keys):
+        names = [x.encode("utf-8") for x in keys]
+        order = sorted(range(len(names)), key=lambda i: names[i])
+        offsets = numpy.zeros(len(names) + 1, dtype="<u8")
+        offsets[1:] = numpy.cumsum([len(names[i]) for i in order])
+        file.write(offsets.tobytes())
+        file.write(numpy.array(order, dtype="<u8").tobytes())
+        file.write(b"".join(names[i] for i in order))
+        return len(names)
+
+    def _name(self, i):
+        return self.file[self.names + int(self.offsets[i]) : self.names + int(self.offsets[i + 1])].tobytes()
+
+    def find(self, key):
+        try:
+            key = key.encode("utf-8")
+        except AttributeError:
+            return -1
+        low, high = 0, self.numkeys
+        while low < high:
+            mid = (low + high) // 2
+            if self._name(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self.numkeys and self._name(low) == key:
+            return int(self.positions[low])
+        else:
+            return -1
+
+def _readdirectory(read, size):
+    # returns (name, version, root offset, key index pointer, number of keys) for each root and where the trailing metadata begins
+    if size < 16 or read(0, 4) != b"gast":
         raise OSError("file does not begin with magic 'gast'")
-    if file[-4:].tostring() != b"gast":
+    if read(size - 4, size) != b"gast":
         raise OSError("file does not end with magic 'gast'")
-    offset, = struct.unpack("<Q", file[-12:-4])
-    return frombuffer(file[offset:-12], checkvalid=checkvalid)
+    root, = struct.unpack("<Q", read(size - 12, size - 4))
+    magic = read(size - 16, size - 12) if size >= 36 else None
+
+    if magic == b"gdir":
+        pointer, numentries = struct.unpack("<QQ", read(size - 32, size - 16))
+        table = numpy.frombuffer(read(pointer, pointer + 40*numentries), dtype="<u8").reshape(numentries, 5)
+        names = read(pointer + 40*numentries, size - 32)
+        entries = []
+        start = 0
+        for offset, keyindex, numkeys, version, length in table.tolist():
+            entries.append((names[start : start + length].decode("utf-8"), version, offset, keyindex, numkeys))
+            start += length
+        return entries, pointer
+
+    elif magic == b"gidx":
+        pointer, numkeys = struct.unpack("<QQ", read(size - 32, size - 16))
+        return [("", 0, root, pointer, numkeys)], size - 32
+
+    else:
+        return [("", 0, root, 0, 0)], size - 12
+
+def _writedirectory(file, entries):
+    file.write(b"\x00" * (-file.tell() % 8))
+    pointer = file.tell()
+    names = [n.encode("utf-8") for n, v, r, k, m in entries]
+    file.write(numpy.array([(r, k, m, v, len(x)) for (n, v, r, k, m), x in zip(entries, names)], dtype="<u8").tobytes())
+    file.write(b"".join(names))
+    file.write(struct.pack("<QQ", pointer, len(entries)))
+    file.write(b"gdir")
+
+def filedirectory(file):
+    if isinstance(file, str):
+        file = numpy.memmap(file, dtype=numpy.uint8, mode="r")
+    entries, tail = _readdirectory(lambda start, stop: file[start:stop].tobytes(), len(file))
+    return [(n, v) for n, v, r, k, m in entries]
+
+def fromfile(file, mode="r+", checkvalid=False, name=None, version=None):
+    if isinstance(file, str):
+        file = numpy.memmap(file, dtype=numpy.uint8, mode=mode)
+    entries, tail = _readdirectory(lambda start, stop: file[start:stop].tobytes(), len(file))
+    if name is not None or version is not None:
+        entries = [x for x in entries if (name is None or x[0] == name) and (version is None or x[1] == version)]
+        if len(entries) == 0:
+            raise KeyError("no object named {0} with version {1} in file".format(repr(name), repr(version)))
+
+    name, version, offset, pointer, numkeys = entries[-1]
+    out = frombuffer(file, checkvalid=checkvalid, offset=offset)
+    if isinstance(out, Collection) and numkeys != 0:
+        if numkeys == out._flatbuffers.ObjectsLength() and pointer + 8*(2*numkeys + 1) <= tail:
+            out._flatbuffers._keyindex = _KeyIndex(file, pointer, numkeys)
+    return out
+
+def merge(objects, workers=None, processes=False):
+    objects = list(objects)
+    if len(objects) == 0:
+        raise ValueError("merge requires at least one object")
+    if len(objects) == 1:
+        return objects[0].detached()
+
+    outer = [_mergeouter(x) for x in objects]
+    if any(len(x) != len(outer[0]) for x in outer):
+        raise ValueError("cannot merge objects nested in Collections with different numbers of axes")
+    outershape = ()
+    outermaps = [() for x in objects]
+    for i in range(len(outer[0])):
+        union, maps = _mergebinnings([x[i] for x in outer])
+        outershape = outershape + union._binshape()
+        outermaps = [x + y for x, y in zip(outermaps, maps)]
+
+    jobs = []
+    build = _mergeplan(objects, outershape, outermaps, jobs)
+    return build(_mergerun(jobs, workers, processes))
+
+def _mergeouter(obj):
+    out = []
+    node = getattr(obj, "_parent", None)
+    while node is not None:
+        out = [x.binning for x in node.axis] + out
+        node = getattr(node, "_parent", None)
+    return out
+
+def _mergebinnings(binnings):
+    # partial results usually share a handful of binnings; promote and restructure each distinct one once
+    distinct = []
+    which = []
+    for binning in binnings:
+        for i in range(len(distinct) - 1, max(-1, len(distinct) - 17), -1):
+            if binning is distinct[i] or binning == distinct[i]:
+                which.append(i)
+                break
+        else:
+            which.append(len(distinct))
+            distinct.append(binning)
+
+    union = distinct[0]
+    for binning in distinct[1:]:
+        union = Binning._plan(union, binning)[1][0]
+
+    # the fold should already be a fixed point; if promotion or restructuring still moves it, try again
+    while True:
+        maps = []
+        for binning in distinct:
+            (one, two), (new, selfmap, othermap) = Binning._plan(union, binning)
+            if one is not union or any(x is not None for x in selfmap):
+                union = new
+                break
+            union = new
+            maps.append(othermap)
+        else:
+            return union, [maps[i] for i in which]
+
+def _mergeinputs(buffers, newshape, indexes):
+    out = []
+    for buffer, (maps, index, duplicates) in zip(buffers, indexes):
+        inshape = tuple(n if x is None else len(x) for n, x in zip(newshape, maps))
+        order = "c" if buffer.dimension_order == InterpretedBuffer.c_order else "f"
+        out.append((buffer.flatarray.reshape(inshape, order=order), index, duplicates))
+    return out
+
+def _mergeplan(objects, outershape, outermaps, jobs):
+    first = objects[0]
+    for x in objects[1:]:
+        if type(x) is not type(first) or not isinstance(first, (Histogram, Collection)):
+            raise ValueError("cannot merge {0} and {1}".format(first, x))
+
+    if isinstance(first, Collection):
+        if any(len(x.axis) != len(first.axis) for x in objects):
+            raise ValueError("cannot merge Collections with different numbers of axes")
+        unions = []
+        for i in range(len(first.axis)):
+            union, maps = _mergebinnings([x.axis[i].binning for x in objects])
+            unions.append(union)
+            outershape = outershape + union._binshape()
+            outermaps = [x + y for x, y in zip(outermaps, maps)]
+
+        builds = collections.OrderedDict()
+        for x in objects:
+            for n in x.objects:
+                if n not in builds:
+                    members = [i for i, y in enumerate(objects) if n in y.objects]
+                    builds[n] = _mergeplan([objects[i].objects[n] for i in members], outershape, [outermaps[i] for i in members], jobs)
+
+        def build(results):
+            out = first.detached(exceptions=("objects", "axis"))
+            out.axis = [x.detached(exceptions=("binning",)) for x in first.axis]
+            for axis, union in zip(out.axis, unions):
+                axis.binning = union.detached()
+            out.objects = collections.OrderedDict((n, x(results)) for n, x in builds.items())
+            return out
+
+        return build
+
+    if any(len(x.axis) != len(first.axis) for x in objects):
+        raise ValueError("cannot merge Histograms with different numbers of axes")
+    for n in ("profile", "axis_covariances", "profile_covariances", "functions"):
+        if any(len(getattr(x, n)) != 0 for x in objects):
+            raise NotImplementedError("merging Histograms with {0} is not supported".format(n))
+
+    unions = []
+    for i in range(len(first.axis)):
+        union, maps = _mergebinnings([x.axis[i].binning for x in objects])
+        unions.append(union)
+        outershape = outershape + union._binshape()
+        outermaps = [x + y for x, y in zip(outermaps, maps)]
+
+    statistics = []
+    for i in range(len(first.axis)):
+        stats = [x.detached() for x in first.axis[i].statistics]
+        for x in objects[1:]:
+            stats = [y._add(z, True) for y, z in zip(stats, x.axis[i].statistics)]
+        statistics.append(stats)
+
+    indexes = []
+    memo = {}
+    for maps in outermaps:
+        key = tuple(id(x) for x in maps)
+        if key not in memo:
+            memo[key] = (maps,) + _remapindex(outershape, maps)
+        indexes.append(memo[key])
+    counts = [x.counts for x in objects]
+    if all(isinstance(x, UnweightedCounts) for x in counts):
+        components = [[x.counts for x in counts]]
+    else:
+        components = [[x.counts if isinstance(x, UnweightedCounts) else x.sumw for x in counts]]
+        has_sumw2 = all(isinstance(x, WeightedCounts) and x.sumw2 is not None for x in counts)
+        has_unweighted = all(isinstance(x, UnweightedCounts) or x.unweighted is not None for x in counts)
+        if has_sumw2:
+            components.append([x.sumw2 for x in counts])
+        if has_unweighted:
+            components.append([x.counts if isinstance(x, UnweightedCounts) else x.unweighted.counts for x in counts])
+
+    start = len(jobs)
+    for buffers in components:
+        dtype = numpy.result_type(*[x.numpy_dtype for x in buffers]).newbyteorder("=")
+        jobs.append((outershape, dtype, _mergeinputs(buffers, outershape, indexes)))
+
+    def build(results):
+        buffers = [InterpretedInlineBuffer.fromarray(x.reshape(-1)) for x in results[start : start + len(components)]]
+        out = first.detached(exceptions=("axis", "counts"))
+        out.axis = [x.detached(exceptions=("binning", "statistics")) for x in first.axis]
+        for axis, union, stats in zip(out.axis, unions, statistics):
+            axis.binning = union.detached()
+            axis.statistics = stats
+        if all(isinstance(x, UnweightedCounts) for x in counts):
+            out.counts = UnweightedCounts(buffers[0])
+        else:
+            out.counts = WeightedCounts(buffers[0],
+                                        sumw2=buffers[1] if has_sumw2 else None,
+                                        unweighted=UnweightedCounts(buffers[-1]) if has_unweighted else None)
+        return out
+
+    return build
+
+def _mergeaccumulate(jobs):
+    out = []
+    for shape, dtype, inputs in jobs:
+        buf = numpy.zeros(shape, dtype=dtype)
+        for array, index, duplicates in inputs:
+            if index is None:
+                buf += array
+            elif duplicates:
+                numpy.add.at(buf, index, array)
+            else:
+                buf[index] += array
+        out.append(buf)
+    return out
+
+def _mergereduce(one, two):
+    for x, y in zip(one, two):
+        x += y
+    return one
+
+def _mergerun(jobs, workers, processes):
+    numinputs = max([len(inputs) for shape, dtype, inputs in jobs] + [0])
+    if workers is None or workers <= 1 or numinputs <= 1:
+        return _mergeaccumulate(jobs)
+
+    import concurrent.futures
+    numchunks = min(workers, numinputs)
+    chunks = [[(shape, dtype, inputs[i*len(inputs) // numchunks : (i + 1)*len(inputs) // numchunks]) for shape, dtype, inputs in jobs] for i in range(numchunks)]
+
+    executor = concurrent.futures.ProcessPoolExecutor if processes else concurrent.futures.ThreadPoolExecutor
+    with executor(max_workers=workers) as pool:
+        partials = list(pool.map(_mergeaccumulate, chunks))
+        while len(partials) > 1:
+            futures = [pool.submit(_mergereduce, partials[i], partials[i + 1]) for i in range(0, len(partials) - 1, 2)]
+            partials = [x.result() for x in futures] + partials[len(futures)*2:]
+    return partials[0]
 
 def _dumpstring(obj):
     if obj.count("\n") > 0:
@@ -616,6 +1380,8 @@ class BufferFilterEnum(Enum):
     base = "Buffer"
 
 class Buffer(Ghast):
+    __slots__ = ("_unfiltered_cache",)
+
     none = BufferFilterEnum("none", aghast.aghast_generated.Filter.Filter.filter_none)
     gzip = BufferFilterEnum("gzip", aghast.aghast_generated.Filter.Filter.filter_gzip)
     lzma = BufferFilterEnum("lzma", aghast.aghast_generated.Filter.Filter.filter_lzma)
@@ -625,14 +1391,147 @@ class Buffer(Ghast):
     def __init__(self):
         raise TypeError("{0} is an abstract base class; do not construct".format(type(self).__name__))
 
+    def _equal(self, other, tolerance):
+        if tolerance is None or not isinstance(other, Buffer):
+            return super(Buffer, self)._equal(other, tolerance)
+        # approximately equal buffers are compared by contents, however they are stored
+        one = self.flatarray if isinstance(self, InterpretedBuffer) else self.array
+        two = other.flatarray if isinstance(other, InterpretedBuffer) else other.array
+        if one.shape != two.shape:
+            return False
+        elif one.dtype.kind in "fc" or two.dtype.kind in "fc":
+            rtol, atol = tolerance
+            return numpy.allclose(one, two, rtol=rtol, atol=atol, equal_nan=True)
+        else:
+            return (one == two).all()
+
+    def _digest(self, structure_only):
+        # the same contents give the same digest whether stored inline, externally, or compressed
+        hasher = hashlib.sha1(b"Buffer")
+        if not structure_only:
+            _fingerprint(hasher, self.flatarray if isinstance(self, InterpretedBuffer) else self.array, False)
+        return hasher.hexdigest()
+
+_filterchunk = 1048576
+
+def _lz4frame():
+    try:
+        import lz4.frame
+    except ImportError:
+        raise ImportError("Install lz4 package with:\n    pip install lz4\nor\n    conda install -c conda-forge lz4")
+    return lz4.frame
+
+def _filters(compression):
+    if compression is None:
+        return ()
+    elif isinstance(compression, BufferFilterEnum):
+        return (compression,)
+    elif not all(isinstance(x, BufferFilterEnum) for x in compression):
+        raise TypeError("compression must be None, a Buffer filter, or a list of Buffer filters, not {0}".format(repr(compression)))
+    else:
+        return tuple(x for x in compression if x != Buffer.none)
+
+def _filterencode(array, filters):
+    data = numpy.ascontiguousarray(array).reshape(-1).view(numpy.uint8)
+    for x in filters[::-1]:
+        if x == Buffer.none:
+            continue
+        elif x == Buffer.gzip:
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            out = bytearray()
+        elif x == Buffer.lzma:
+            import lzma
+            compressor = lzma.LZMACompressor()
+            out = bytearray()
+        elif x == Buffer.lz4:
+            compressor = _lz4frame().LZ4FrameCompressor()
+            out = bytearray(compressor.begin())
+        else:
+            raise NotImplementedError(x)
+
+        view = memoryview(data)
+        for i in range(0, len(data), _filterchunk):
+            out += compressor.compress(view[i : i + _filterchunk])
+        out += compressor.flush()
+        data = numpy.frombuffer(out, dtype=numpy.uint8)
+
+    return data
+
+def _filterdecode(array, filters):
+    data = array
+    for x in filters:
+        if x == Buffer.none:
+            continue
+        elif x == Buffer.gzip:
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif x == Buffer.lzma:
+            import lzma
+            decompressor = lzma.LZMADecompressor()
+        elif x == Buffer.lz4:
+            decompressor = _lz4frame().LZ4FrameDecompressor()
+        else:
+            raise NotImplementedError(x)
+
+        out = bytearray()
+        view = memoryview(data)
+        for i in range(0, len(data), _filterchunk):
+            out += decompressor.decompress(view[i : i + _filterchunk])
+        if hasattr(decompressor, "flush"):
+            out += decompressor.flush()
+        data = numpy.frombuffer(out, dtype=numpy.uint8)
+
+    return data
+
+def _unfiltered(obj, key, raw, filters):
+    cached = getattr(obj, "_unfiltered_cache", None)
+    if cached is None or len(cached[0]) != len(key) or not all(x is y for x, y in zip(cached[0], key)):
+        cached = (key, _filterdecode(raw, filters))
+        obj._unfiltered_cache = cached
+    return cached[1]
+
+def _buffers(node):
+    for n in node._params:
+        x = getattr(node, n)
+        if isinstance(x, Buffer):
+            yield node, n, x
+        elif isinstance(x, Ghast):
+            for y in _buffers(x):
+                yield y
+        elif isinstance(x, (aghast.checktype.Vector, aghast.checktype.Lookup)):
+            for y in (x.values() if isinstance(x, aghast.checktype.Lookup) else x):
+                if isinstance(y, Ghast):
+                    for z in _buffers(y):
+                        yield z
+
 class InlineBuffer(object):
+    __slots__ = ()
+
     def __init__(self):
         raise TypeError("{0} is an abstract base class; do not construct".format(type(self).__name__))
 
+class _MemmapPool(object):
+    def __init__(self):
+        self._memmaps = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, path):
+        path = os.path.realpath(path)
+        with self._lock:
+            out = self._memmaps.get(path)
+            if out is None:
+                out = numpy.memmap(path, dtype=numpy.uint8, mode="r")
+                self._memmaps[path] = out
+            return out
+
+_memmaps = _MemmapPool()
+
 class ExternalSourceEnum(Enum):
     base = "ExternalBuffer"
 
 class ExternalBuffer(object):
+    __slots__ = ()
+    _mixinslots = ("_fetched",)
+
     memory   = ExternalSourceEnum("memory", aghast.aghast_generated.ExternalSource.ExternalSource.external_memory)
     samefile = ExternalSourceEnum("samefile", aghast.aghast_generated.ExternalSource.ExternalSource.external_samefile)
     file     = ExternalSourceEnum("file", aghast.aghast_generated.ExternalSource.ExternalSource.external_file)
@@ -642,7 +1541,43 @@ class ExternalBuffer(object):
     def __init__(self):
         raise TypeError("{0} is an abstract base class; do not construct".format(type(self).__name__))
 
+    def _externalarray(self):
+        if self.external_source == ExternalBuffer.memory:
+            return numpy.ctypeslib.as_array(ctypes.cast(self.pointer, ctypes.POINTER(ctypes.c_uint8)), shape=(self.numbytes,))
+
+        elif self.external_source == ExternalBuffer.samefile:
+            tab = getattr(getattr(self, "_flatbuffers", None), "_tab", None)
+            if tab is None:
+                raise ValueError("{0} with external_source=samefile must be read from a file".format(type(self).__name__))
+            return numpy.frombuffer(tab.Bytes, dtype=numpy.uint8, count=self.numbytes, offset=self.pointer)
+
+        elif self.external_source == ExternalBuffer.file:
+            if self.location is None:
+                raise ValueError("{0} with external_source=file must have a location".format(type(self).__name__))
+            path = os.path.expanduser(self.location)
+            if not os.path.isabs(path):
+                source = getattr(getattr(getattr(self, "_flatbuffers", None), "_tab", None), "Bytes", None)
+                if getattr(source, "filename", None) is not None:
+                    path = os.path.join(os.path.dirname(source.filename), path)
+            return numpy.frombuffer(_memmaps[path], dtype=numpy.uint8, count=self.numbytes, offset=self.pointer)
+
+        elif self.external_source == ExternalBuffer.url:
+            if self.location is None:
+                raise ValueError("{0} with external_source=url must have a location".format(type(self).__name__))
+            key = (self.location, self.pointer, self.numbytes)
+            cached = getattr(self, "_fetched", None)
+            if cached is None or cached[0] != key:
+                data = aghast.fetch.fetcher(self.location).read(self.location, self.pointer, self.pointer + self.numbytes)
+                cached = (key, numpy.frombuffer(data, dtype=numpy.uint8))
+                self._fetched = cached
+            return cached[1]
+
+        else:
+            raise NotImplementedError(self.external_source)
+
 class RawBuffer(object):
+    __slots__ = ()
+
     def __init__(self):
         raise TypeError("{0} is an abstract base class; do not construct".format(type(self).__name__))
 
@@ -661,6 +1596,8 @@ class EndiannessEnum(Enum):
         self.endianness = endianness
 
 class Interpretation(object):
+    __slots__ = ()
+
     none    = DTypeEnum("none", aghast.aghast_generated.DType.DType.dtype_none, numpy.dtype(numpy.uint8))
     bool    = DTypeEnum("bool", aghast.aghast_generated.DType.DType.dtype_bool, numpy.dtype(numpy.bool_))
     int8    = DTypeEnum("int8", aghast.aghast_generated.DType.DType.dtype_int8, numpy.dtype(numpy.int8))
@@ -735,7 +1672,62 @@ class DimensionOrderEnum(Enum):
         super(DimensionOrderEnum, self).__init__(name, value)
         self.dimension_order = dimension_order
 
+def _remapindex(newshape, maps):
+    # one index that scatters an array into newshape, sending position i along axis d to maps[d][i] (None for as-is)
+    if all(x is None for x in maps):
+        return None, False
+    duplicates = any(x is not None and len(numpy.unique(x)) != len(x) for x in maps)
+    if sum(x is not None for x in maps) == 1:
+        return tuple(slice(None) if x is None else x for x in maps), duplicates
+    else:
+        return numpy.ix_(*[numpy.arange(n, dtype=numpy.int64) if x is None else x for n, x in zip(newshape, maps)]), duplicates
+
+def _scatter(out, index, duplicates, array, op):
+    if index is None:
+        op(out, array, out=out)
+    elif duplicates:
+        op.at(out, index, array)
+    else:
+        out[index] = op(out[index], array)
+
+def _rebinaxis(buf, axis, selfmap, length):
+    # sums the entries of buf along axis that selfmap sends to the same new bin; negative entries are dropped
+    before = (slice(None),)*axis
+    valid = (selfmap >= 0)
+    numvalid = numpy.count_nonzero(valid)
+    if numvalid == 0:
+        return numpy.zeros(buf.shape[:axis] + (length,) + buf.shape[axis + 1:], dtype=buf.dtype)
+
+    if numvalid != len(selfmap):
+        positions = numpy.flatnonzero(valid)
+        if positions[-1] + 1 - positions[0] == numvalid:
+            selfmap = selfmap[positions[0] : positions[-1] + 1]
+            buf = buf[before + (slice(positions[0], positions[-1] + 1),)]
+        else:
+            selfmap = selfmap[positions]
+            buf = numpy.take(buf, positions, axis=axis)
+
+    if len(selfmap) > 1 and (selfmap[1:] < selfmap[:-1]).any():
+        if len(buf.shape) == 1 and issubclass(buf.dtype.type, numpy.floating):
+            return numpy.bincount(selfmap, weights=buf, minlength=length).astype(buf.dtype)
+        order = numpy.argsort(selfmap, kind="mergesort")
+        selfmap = selfmap[order]
+        buf = numpy.take(buf, order, axis=axis)
+
+    # selfmap is now nondecreasing, so each new bin is a contiguous run of old bins
+    starts = numpy.flatnonzero(numpy.concatenate([[True], selfmap[1:] != selfmap[:-1]]))
+    if len(starts) != len(selfmap):
+        buf = numpy.add.reduceat(buf, starts, axis=axis)
+    targets = selfmap[starts]
+    if len(targets) == length and targets[-1] == length - 1:
+        return buf
+    out = numpy.zeros(buf.shape[:axis] + (length,) + buf.shape[axis + 1:], dtype=buf.dtype)
+    out[before + (targets,)] = buf
+    return out
+
 class InterpretedBuffer(Interpretation):
+    __slots__ = ()
+
     c_order       = DimensionOrderEnum("c_order", aghast.aghast_generated.DimensionOrder.DimensionOrder.c_order, "C")
     fortran_order = DimensionOrderEnum("fortran", aghast.aghast_generated.DimensionOrder.DimensionOrder.fortran_order, "F")
     orders = [c_order, fortran_order]
@@ -776,25 +1768,18 @@ class InterpretedBuffer(Interpretation):
         original = buf
 
         i = len(oldshape)
-        newshape = ()
         for binning, selfmap in pairs[::-1]:
             assert isinstance(selfmap, tuple)
             i -= len(selfmap)
             if binning is None:
-                buf = buf.sum(axis=i)
+                buf = buf.sum(axis=tuple(range(i, i + len(selfmap))))
             else:
-                newshape = binning._binshape() + newshape
-                newbuf = numpy.zeros(oldshape[:i] + newshape, dtype=dtype, order=order)
-                for j in range(len(selfmap)):
+                for j, length in enumerate(binning._binshape()):
                     if isinstance(selfmap[j], numpy.ndarray):
-                        clear = (selfmap[j] < 0)
-                        if clear.any():
-                            if buf is original:
-                                buf = buf.copy()
-                            buf[(Ellipsis, clear) + (slice(None),)*(len(selfmap) - j - 1)] = 0
-                            selfmap[j][clear] = 0
-                numpy.add.at(newbuf, i*(slice(None),) + selfmap, buf)
-                buf = newbuf
+                        buf = _rebinaxis(buf, i + j, selfmap[j], length)
+
+        if buf.dtype != dtype or numpy.may_share_memory(buf, original) or not buf.flags[order.upper() + "_CONTIGUOUS"]:
+            buf = numpy.array(buf, dtype=dtype, order=order.upper())
 
         if len(buf.shape) == 0:
             buf = buf.reshape(1)
@@ -815,17 +1800,11 @@ class InterpretedBuffer(Interpretation):
 
     def _remap(self, newshape, selfmap):
         order = "c" if self.dimension_order == self.c_order else "f"
-        dtype = self.numpy_dtype
-
-        buf = self.flatarray
-
         oldshape = tuple(len(sm) if sm is not None else ns for ns, sm in zip(newshape, selfmap))
 
-        for i in range(len(newshape) - 1, -1, -1):
-            if selfmap[i] is not None:
-                newbuf = numpy.zeros(oldshape[:i] + newshape[i:], dtype=dtype, order=order)
-                newbuf[i*(slice(None),) + (selfmap[i],)] = buf.reshape((-1, len(selfmap[i])) + newshape[i + 1 :], order=order)
-                buf = newbuf
+        index, duplicates = _remapindex(newshape, selfmap)
+        buf = numpy.zeros(newshape, dtype=self.numpy_dtype, order=order)
+        _scatter(buf, index, duplicates, self.flatarray.reshape(oldshape, order=order), numpy.add)
 
         if self.dtype == InterpretedBuffer.int64 and self.endianness == InterpretedBuffer.little_endian and self.dimension_order == self.dimension_order == InterpretedBuffer.c_order:
             return InterpretedInlineInt64Buffer(buf.view(numpy.uint8))
@@ -841,12 +1820,52 @@ class InterpretedBuffer(Interpretation):
                                            endianness=self.endianness,
                                            dimension_order=self.dimension_order)
 
+    def _remapadd(self, other, newshape, selfmap, othermap, noclobber, op=numpy.add):
+        selforder = "c" if self.dimension_order == self.c_order else "f"
+        otherorder = "c" if other.dimension_order == other.c_order else "f"
+        selfshape = tuple(len(sm) if sm is not None else ns for ns, sm in zip(newshape, selfmap))
+        othershape = tuple(len(om) if om is not None else ns for ns, om in zip(newshape, othermap))
+        dtype = numpy.result_type(self.numpy_dtype, other.numpy_dtype)
+
+        otherindex, otherduplicates = _remapindex(newshape, othermap)
+        otherarray = other.flatarray.reshape(othershape, order=otherorder)
+
+        if not noclobber and all(sm is None for sm in selfmap) and (self.filters is None or len(self.filters) == 0) and dtype == self.numpy_dtype:
+            array = self.flatarray
+            if array.flags.writeable:
+                _scatter(array.reshape(newshape, order=selforder), otherindex, otherduplicates, otherarray, op)
+                return self
+
+        selfindex, selfduplicates = _remapindex(newshape, selfmap)
+        buf = numpy.zeros(newshape, dtype=dtype.newbyteorder("="))
+        _scatter(buf, selfindex, selfduplicates, self.flatarray.reshape(selfshape, order=selforder), numpy.add)
+        _scatter(buf, otherindex, otherduplicates, otherarray, op)
+        return InterpretedInlineBuffer.fromarray(buf.reshape(-1))
+
+    def _toexternal(self, pointer):
+        return InterpretedExternalBuffer(pointer,
+                                         self.buffer.nbytes,
+                                         external_source=ExternalBuffer.samefile,
+                                         filters=self.filters,
+                                         postfilter_slice=self.postfilter_slice,
+                                         dtype=self.dtype,
+                                         endianness=self.endianness,
+                                         dimension_order=self.dimension_order)
+
+    def _compressed(self, filters):
+        return InterpretedInlineBuffer(_filterencode(self.flatarray, filters),
+                                       filters=filters,
+                                       postfilter_slice=None,
+                                       dtype=self.dtype,
+                                       endianness=self.endianness,
+                                       dimension_order=self.dimension_order)
+
     def _add(self, other, noclobber, op=numpy.add):
-        if noclobber:
-            if isinstance(self, InterpretedInlineBuffer) or isinstance(other, InterpretedInlineBuffer):
+        if noclobber or (self.filters is not None and len(self.filters) != 0):
+            if isinstance(self, (InterpretedInlineBuffer, InterpretedExternalBuffer)) or isinstance(other, (InterpretedInlineBuffer, InterpretedExternalBuffer)):
                 return InterpretedInlineBuffer(op(self.flatarray, other.flatarray).view(numpy.uint8),
-                                               filters=self.filters,
-                                               postfilter_slice=self.postfilter_slice,
+                                               filters=None,
+                                               postfilter_slice=None,
                                                dtype=self.dtype,
                                                endianness=self.endianness,
                                                dimension_order=self.dimension_order)
@@ -862,6 +1881,8 @@ class InterpretedBuffer(Interpretation):
 
         else:
             array = self.flatarray
+            if not array.flags.writeable:
+                return self._add(other, True, op=op)
             op(array, other.flatarray, out=array)
             return self
 
@@ -893,6 +1914,9 @@ The *buffer* is the actual data, encoded in Flatbuffers as an array of bytes wit
     def array(self):
         return numpy.frombuffer(self.buffer, dtype=InterpretedBuffer.none.dtype)
 
+    def _toexternal(self, pointer):
+        return RawExternalBuffer(pointer, len(self.buffer), external_source=ExternalBuffer.samefile)
+
     @classmethod
     def _fromflatbuffers(cls, fb):
         out = cls.__new__(cls)
@@ -901,10 +1925,7 @@ The *buffer* is the actual data, encoded in Flatbuffers as an array of bytes wit
         return out
 
     def _toflatbuffers(self, builder):
-        aghast.aghast_generated.RawInlineBuffer.RawInlineBufferStartBufferVector(builder, len(self.buffer))
-        builder.head = builder.head - len(self.buffer)
-        builder.Bytes[builder.head : builder.head + len(self.buffer)] = self.buffer.tostring()
-        buffer = builder.EndVector(len(self.buffer))
+        buffer = _vectorfromarray(builder, aghast.aghast_generated.RawInlineBuffer.RawInlineBufferStartBufferVector, self.buffer)
 
         aghast.aghast_generated.RawInlineBuffer.RawInlineBufferStart(builder)
         aghast.aghast_generated.RawInlineBuffer.RawInlineBufferAddBuffer(builder, buffer)
@@ -921,11 +1942,13 @@ class RawExternalBuffer(Buffer, RawBuffer, ExternalBuffer):
         "pointer":         aghast.checktype.CheckInteger("RawExternalBuffer", "pointer", required=True, min=0),
         "numbytes":        aghast.checktype.CheckInteger("RawExternalBuffer", "numbytes", required=True, min=0),
         "external_source": aghast.checktype.CheckEnum("RawExternalBuffer", "external_source", required=False, choices=ExternalBuffer.sources),
+        "location":        aghast.checktype.CheckString("RawExternalBuffer", "location", required=False),
         }
 
     pointer       = typedproperty(_params["pointer"])
     numbytes      = typedproperty(_params["numbytes"])
     external_source = typedproperty(_params["external_source"])
+    location      = typedproperty(_params["location"])
 
     description = "A generic, uninterpreted array stored outside the Flatbuffers hierarchy; used for small buffers, like <<Ntuple>> pages, that are interpreted centrally, as in an <<Ntuple>> column."
     validity_rules = ()
@@ -935,27 +1958,37 @@ This array class is like <<RawInlineBuffer>>, but its contents are outside of th
 If the *external_source* is `memory`, then the *pointer* and *numbytes* are interpreted as a raw array in memory. If the *external_source* is `samefile`, then the *pointer* is taken to be a seek position in the same file that stores the Flatbuffer (assuming the Flatbuffer resides in a file). If *external_source* is `file`, then the *location* property is taken to be a file path, and the *pointer* is taken to be a seek position in that file. If *external_source* is `url`, then the *location* property is taken to be a URL and the bytes are requested by HTTP.
 """
 
-    def __init__(self, pointer, numbytes, external_source=ExternalBuffer.memory):
+    def __init__(self, pointer, numbytes, external_source=ExternalBuffer.memory, location=None):
         self.pointer = pointer
         self.numbytes = numbytes
         self.external_source = external_source
+        self.location = location
 
     @property
     def array(self):
-        return numpy.ctypeslib.as_array(ctypes.cast(self.pointer, ctypes.POINTER(ctypes.c_uint8)), shape=(self.numbytes,))
+        return self._externalarray()
+
+    def _toinline(self, array=None):
+        return RawInlineBuffer(self.array if array is None else array)
 
     def _toflatbuffers(self, builder):
+        location = None if self.location is None else builder.CreateString(self.location.encode("utf-8"))
+
         aghast.aghast_generated.RawExternalBuffer.RawExternalBufferStart(builder)
         aghast.aghast_generated.RawExternalBuffer.RawExternalBufferAddPointer(builder, self.pointer)
         aghast.aghast_generated.RawExternalBuffer.RawExternalBufferAddNumbytes(builder, self.numbytes)
         if self.external_source != ExternalBuffer.memory:
             aghast.aghast_generated.RawExternalBuffer.RawExternalBufferAddExternalSource(builder, self.external_source.value)
+        if location is not None:
+            aghast.aghast_generated.RawExternalBuffer.RawExternalBufferAddLocation(builder, location)
         return aghast.aghast_generated.RawExternalBuffer.RawExternalBufferEnd(builder)
 
     def _dump(self, indent, width, end):
         args = ["pointer={0}".format(repr(self.pointer)), "numbytes={0}".format(repr(self.numbytes))]
         if self.external_source != ExternalBuffer.memory:
             args.append("external_source={0}".format(repr(self.external_source)))
+        if self.location is not None:
+            args.append("location={0}".format(_dumpstring(self.location)))
         return _dumpline(self, args, indent, width, end)
 
 ################################################# InterpretedInlineBuffer
@@ -1021,12 +2054,15 @@ The *dimension_order* may be `c_order` to follow the C programming language's co
         self.array
 
     @classmethod
-    def fromarray(cls, array):
+    def fromarray(cls, array, compression=None):
         if not isinstance(array, numpy.ndarray):
             array = numpy.array(array)
         dtype, endianness = Interpretation.from_numpy_dtype(array.dtype)
         order = InterpretedBuffer.fortran_order if numpy.isfortran(array) else InterpretedBuffer.c_order
-        if dtype == InterpretedBuffer.int64 and endianness == InterpretedBuffer.little_endian and order == InterpretedBuffer.c_order:
+        filters = _filters(compression)
+        if len(filters) != 0:
+            return cls(_filterencode(array, filters), filters=filters, dtype=dtype, endianness=endianness, dimension_order=order)
+        elif dtype == InterpretedBuffer.int64 and endianness == InterpretedBuffer.little_endian and order == InterpretedBuffer.c_order:
             return InterpretedInlineInt64Buffer(array)
         elif dtype == InterpretedBuffer.float64 and endianness == InterpretedBuffer.little_endian and order == InterpretedBuffer.c_order:
             return InterpretedInlineFloat64Buffer(array)
@@ -1038,7 +2074,7 @@ The *dimension_order* may be `c_order` to follow the C programming language's co
         if len(self.filters) == 0:
             array = self.buffer
         else:
-            raise NotImplementedError(self.filters)
+            array = _unfiltered(self, (self.buffer, self.filters), self.buffer, self.filters)
 
         if array.dtype.itemsize != 1:
             array = array.view(InterpretedBuffer.none.dtype)
@@ -1080,10 +2116,7 @@ The *dimension_order* may be `c_order` to follow the C programming language's co
         return out
 
     def _toflatbuffers(self, builder):
-        aghast.aghast_generated.InterpretedInlineBuffer.InterpretedInlineBufferStartBufferVector(builder, self.buffer.nbytes)
-        builder.head = builder.head - self.buffer.nbytes
-        builder.Bytes[builder.head : builder.head + self.buffer.nbytes] = self.buffer.tostring()
-        buffer = builder.EndVector(self.buffer.nbytes)
+        buffer = _vectorfromarray(builder, aghast.aghast_generated.InterpretedInlineBuffer.InterpretedInlineBufferStartBufferVector, self.buffer)
 
         if len(self.filters) == 0:
             filters = None
@@ -1110,7 +2143,7 @@ The *dimension_order* may be `c_order` to follow the C programming language's co
     def _dump(self, indent, width, end):
         args = ["buffer={0}".format(_dumparray(self.flatarray, indent + "    ", end))]
         if len(self.filters) != 0:
-            args.append("filters=[{0}]".format(", ".format(repr(x) for x in self.filters)))
+            args.append("filters=[{0}]".format(", ".join(repr(x) for x in self.filters)))
         if self.postfilter_slice is not None:
             args.append("postfilter_slice=slice({0}, {1}, {2})".format(self.postfilter_slice.start if self.postfilter_slice.hasStart else "None",
                                                                        self.postfilter_slice.stop if self.postfilter_slice.hasStop else "None",
@@ -1191,10 +2224,7 @@ This class is equivalent to an <<InterpretedInlineBuffer>> with no *filters*, no
         return out
 
     def _toflatbuffers(self, builder):
-        aghast.aghast_generated.InterpretedInlineInt64Buffer.InterpretedInlineInt64BufferStartBufferVector(builder, self.buffer.nbytes)
-        builder.head = builder.head - self.buffer.nbytes
-        builder.Bytes[builder.head : builder.head + self.buffer.nbytes] = self.buffer.tostring()
-        buffer = builder.EndVector(self.buffer.nbytes)
+        buffer = _vectorfromarray(builder, aghast.aghast_generated.InterpretedInlineInt64Buffer.InterpretedInlineInt64BufferStartBufferVector, self.buffer)
 
         aghast.aghast_generated.InterpretedInlineInt64Buffer.InterpretedInlineInt64BufferStart(builder)
         aghast.aghast_generated.InterpretedInlineInt64Buffer.InterpretedInlineInt64BufferAddBuffer(builder, buffer)
@@ -1272,10 +2302,7 @@ This class is equivalent to an <<InterpretedInlineBuffer>> with no *filters*, no
         return out
 
     def _toflatbuffers(self, builder):
-        aghast.aghast_generated.InterpretedInlineFloat64Buffer.InterpretedInlineFloat64BufferStartBufferVector(builder, self.buffer.nbytes)
-        builder.head = builder.head - self.buffer.nbytes
-        builder.Bytes[builder.head : builder.head + self.buffer.nbytes] = self.buffer.tostring()
-        buffer = builder.EndVector(self.buffer.nbytes)
+        buffer = _vectorfromarray(builder, aghast.aghast_generated.InterpretedInlineFloat64Buffer.InterpretedInlineFloat64BufferStartBufferVector, self.buffer)
 
         aghast.aghast_generated.InterpretedInlineFloat64Buffer.InterpretedInlineFloat64BufferStart(builder)
         aghast.aghast_generated.InterpretedInlineFloat64Buffer.InterpretedInlineFloat64BufferAddBuffer(builder, buffer)
@@ -1360,12 +2387,10 @@ The *dimension_order* may be `c_order` to follow the C programming language's co
 
     @property
     def flatarray(self):
-        self._buffer = numpy.ctypeslib.as_array(ctypes.cast(self.pointer, ctypes.POINTER(ctypes.c_uint8)), shape=(self.numbytes,))
-
         if len(self.filters) == 0:
-            array = self._buffer
+            array = self._externalarray()
         else:
-            raise NotImplementedError(self.filters)
+            array = _unfiltered(self, (self.pointer, self.numbytes, self.external_source, self.filters), self._externalarray(), self.filters)
 
         if self.postfilter_slice is not None:
             start = self.postfilter_slice.start if self.postfilter_slice.has_start else None
@@ -1388,8 +2413,16 @@ The *dimension_order* may be `c_order` to follow the C programming language's co
             raise ValueError("InterpretedExternalBuffer.buffer length is {0} but multiplicity at this position in the hierarchy is {1}".format(len(array), functools.reduce(operator.mul, shape, 1)))
         return array.reshape(shape, order=self.dimension_order.dimension_order)
 
+    def _toinline(self, array=None):
+        return InterpretedInlineBuffer(self._externalarray() if array is None else array,
+                                       filters=self.filters,
+                                       postfilter_slice=self.postfilter_slice,
+                                       dtype=self.dtype,
+                                       endianness=self.endianness,
+                                       dimension_order=self.dimension_order)
+
     def _toflatbuffers(self, builder):
-        location = None if self.location is None else builder.CreateString(location.encode("utf-8"))
+        location = None if self.location is None else builder.CreateString(self.location.encode("utf-8"))
 
         if len(self.filters) == 0:
             filters = None
@@ -1403,7 +2436,7 @@ The *dimension_order* may be `c_order` to follow the C programming language's co
         aghast.aghast_generated.InterpretedExternalBuffer.InterpretedExternalBufferAddPointer(builder, self.pointer)
         aghast.aghast_generated.InterpretedExternalBuffer.InterpretedExternalBufferAddNumbytes(builder, self.numbytes)
         if self.external_source != ExternalBuffer.memory:
-            aghast.aghast_generated.InterpretedExternalBuffer.InterpretedExternalBufferAddExternalSource(builder, self.external_source.values)
+            aghast.aghast_generated.InterpretedExternalBuffer.InterpretedExternalBufferAddExternalSource(builder, self.external_source.value)
         if filters is not None:
             aghast.aghast_generated.InterpretedExternalBuffer.InterpretedExternalBufferAddFilters(builder, filters)
         if self.postfilter_slice is not None:
@@ -1423,7 +2456,7 @@ The *dimension_order* may be `c_order` to follow the C programming language's co
         if self.external_source != ExternalBuffer.memory:
             args.append("external_source={0}".format(repr(self.external_source)))
         if len(self.filters) != 0:
-            args.append("filters=[{0}]".format(", ".format(repr(x) for x in self.filters)))
+            args.append("filters=[{0}]".format(", ".join(repr(x) for x in self.filters)))
         if self.postfilter_slice is not None:
             args.append("postfilter_slice=slice({0}, {1}, {2})".format(self.postfilter_slice.start if self.postfilter_slice.hasStart else "None",
                                                                        self.postfilter_slice.stop if self.postfilter_slice.hasStop else "None",
@@ -1440,13 +2473,18 @@ The *dimension_order* may be `c_order` to follow the C programming language's co
 
     def _add(self, other, noclobber, op=numpy.add):
         if noclobber or self.external_source != self.memory or len(self.filters) != 0:
-            return super(InterpretedExternalBuffer, self)._add(other, noclobber, op=op)
+            return super(InterpretedExternalBuffer, self)._add(other, True, op=op)
 
         else:
             array = self.flatarray
             op(array, other.flatarray, out=array)
             return self
 
+    def _remapadd(self, other, newshape, selfmap, othermap, noclobber, op=numpy.add):
+        if self.external_source != self.memory:
+            noclobber = True
+        return super(InterpretedExternalBuffer, self)._remapadd(other, newshape, selfmap, othermap, noclobber, op=op)
+
 ################################################# StatisticFilter
 
 class StatisticFilter(Ghast):
@@ -1944,6 +2982,35 @@ If not all of the data were included in the quantile calculation, a *filter* des
 
 ################################################# Binning
 
+class _PlanCache(object):
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._plans = collections.OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            plan = self._plans.pop(key, None)
+            if plan is not None:
+                self._plans[key] = plan
+            return plan
+
+    def put(self, key, plan):
+        with self._lock:
+            self._plans.pop(key, None)
+            self._plans[key] = plan
+            while len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def __len__(self):
+        return len(self._plans)
+
+_binningplans = _PlanCache()
+
 class Binning(Ghast):
     def __init__(self):
         raise TypeError("{0} is an abstract base class; do not construct".format(type(self).__name__))
@@ -1952,6 +3019,9 @@ class Binning(Ghast):
     def isnumerical(self):
         return True
 
+    def bin_index(self, values):
+        raise NotImplementedError("{0}.bin_index".format(type(self).__name__))
+
     @staticmethod
     def _promote(one, two):
         if type(one) is type(two):
@@ -1974,6 +3044,33 @@ class Binning(Ghast):
         else:
             raise ValueError("{0} and {1} can't be promoted to the same type of Binning".format(one, two))
 
+    def _plankey(self):
+        # the cached fingerprint only changes through setters, but array parameters can be edited in place
+        hasher = hashlib.sha1(self.fingerprint().encode("ascii"))
+        for n, x in self._fingerprintitems(True):
+            if isinstance(x, numpy.ndarray):
+                _fingerprint(hasher, x, True)
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _plan(one, two):
+        # adding identically structured objects over and over would promote and restructure the same binnings every time
+        key = (one._plankey(), two._plankey())
+        plan = _binningplans.get(key)
+        if plan is None:
+            pair = Binning._promote(one, two)
+            binning, selfmap, othermap = pair[0]._restructure(pair[1])
+            for x in selfmap + othermap:
+                if x is not None:
+                    x.flags.writeable = False
+            promoted = pair[0] is not one or pair[1] is not two
+            _binningplans.put(key, (promoted, None if binning is one else binning.detached(), selfmap, othermap))
+            return pair, (binning, selfmap, othermap)
+
+        promoted, template, selfmap, othermap = plan
+        pair = Binning._promote(one, two) if promoted else (one, two)
+        return pair, (one if template is None else template.detached(), selfmap, othermap)
+
     def _selfmap(self, flows, index):
         selfmap = numpy.empty(self._binshape(), dtype=numpy.int64)
         belows = BinLocation._belows(flows)
@@ -2147,6 +3244,8 @@ class BinLocationEnum(Enum):
     base = "BinLocation"
 
 class BinLocation(object):
+    __slots__ = ()
+
     below3      = BinLocationEnum("below3", aghast.aghast_generated.BinLocation.BinLocation.loc_below3)
     below2      = BinLocationEnum("below2", aghast.aghast_generated.BinLocation.BinLocation.loc_below2)
     below1      = BinLocationEnum("below1", aghast.aghast_generated.BinLocation.BinLocation.loc_below1)
@@ -2316,6 +3415,25 @@ If *loc_underflow* and *loc_overflow* are `nonexistent`, then there are no slots
             pos_overflow = None
         return loc_underflow, pos_underflow, loc_overflow, pos_overflow
 
+    def bin_index(self, values):
+        values = numpy.asarray(values)
+        length = 1 + self.max - self.min
+        pos_underflow, pos_overflow, pos_nanflow = self._positions(self.loc_underflow, self.loc_overflow, None, length)
+        numbelow = int(self.loc_underflow.value < self.nonexistent.value) + int(self.loc_overflow.value < self.nonexistent.value)
+        if issubclass(values.dtype.type, numpy.integer):
+            index = numpy.clip(values, self.min - 1, self.max + 1).astype(numpy.int64) - self.min
+            integral = True
+        else:
+            index = numpy.clip(values, self.min - 1, self.max + 1)
+            integral = (index == numpy.floor(index))
+            index = numpy.where(integral, index, self.min - 1).astype(numpy.int64) - self.min
+        out = numpy.where(integral & (index >= 0) & (index < length), index + numbelow, -1)
+        if pos_underflow is not None:
+            out[integral & (index < 0)] = pos_underflow
+        if pos_overflow is not None:
+            out[integral & (index >= length)] = pos_overflow
+        return out
+
     def _getloc(self, isiloc, where):
         if where is None:
             return None, (slice(None),)
@@ -2459,6 +3577,9 @@ A single interval defines a <<RegularBinning>> and a set of intervals defines an
     def __hash__(self):
         return hash((RealInterval, self.low, self.high, self.low_inclusive, self.high_inclusive))
 
+# matches the layout of the RealInterval Flatbuffers struct
+_RealInterval_dtype = numpy.dtype({"names": ["low", "high", "low_inclusive", "high_inclusive"], "formats": ["<f8", "<f8", "?", "?"], "offsets": [0, 8, 16, 17], "itemsize": 24})
+
 ################################################# RealOverflow
 
 class NonRealMappingEnum(Enum):
@@ -2657,6 +3778,41 @@ The *minf_mapping* specifies whether \u2012\u221e values were ignored when the h
 
         return overflow, pos_underflow, pos_overflow, pos_nanflow
 
+    @staticmethod
+    def _binindex(overflow, values, length, inner):
+        # inner gives each finite value its bin in [0, length), -1 below, length above, or _gapindex between bins
+        values = numpy.asarray(values)
+        if overflow is None:
+            pos_underflow, pos_overflow, pos_nanflow = None, None, None
+            numbelow = 0
+            mappings = (RealOverflow.missing, RealOverflow.missing, RealOverflow.missing)
+        else:
+            pos_underflow, pos_overflow, pos_nanflow = BinLocation._positions(overflow.loc_underflow, overflow.loc_overflow, overflow.loc_nanflow, length)
+            numbelow = sum(1 for x in (overflow.loc_underflow, overflow.loc_overflow, overflow.loc_nanflow) if x.value < BinLocation.nonexistent.value)
+            mappings = (overflow.minf_mapping, overflow.pinf_mapping, overflow.nan_mapping)
+
+        shape = values.shape
+        values = values.reshape(-1)
+        finite = numpy.isfinite(values)
+        allfinite = finite.all()
+        index = inner(values if allfinite else values[finite])
+        out = numpy.where((index >= 0) & (index < length), index + numbelow, -1)
+        if pos_underflow is not None:
+            out[index == -1] = pos_underflow
+        if pos_overflow is not None:
+            out[index == length] = pos_overflow
+        if allfinite:
+            return out.reshape(shape)
+
+        full = numpy.full(values.shape, -1, dtype=numpy.int64)
+        full[finite] = out
+        positions = {RealOverflow.in_underflow: pos_underflow, RealOverflow.in_overflow: pos_overflow, RealOverflow.in_nanflow: pos_nanflow}
+        for mask, mapping in zip((numpy.isneginf(values), numpy.isposinf(values), numpy.isnan(values)), mappings):
+            pos = positions.get(mapping)
+            if pos is not None:
+                full[mask] = pos
+        return full.reshape(shape)
+
 ################################################# RegularBinning
 
 class RegularBinning(Binning):
@@ -2764,6 +3920,16 @@ If the binning is *circular*, then it represents a finite segment in which *inte
         loc_nanflow = None if self.overflow is None else self.overflow.loc_nanflow
         return self._getindex_general(where, self.num, loc_underflow, loc_overflow, loc_nanflow)
 
+    def bin_index(self, values):
+        low, high = self.interval.low, self.interval.high
+        low_inclusive, high_inclusive = self.interval.low_inclusive, self.interval.high_inclusive
+        num, circular = self.num, self.circular
+        def inner(values):
+            if circular:
+                values = low + numpy.mod(values - low, high - low)
+            return _gridindex((values - low) * (float(num) / (high - low)), low_inclusive, high_inclusive, 0, num - 1)
+        return RealOverflow._binindex(self.overflow, values, num, inner)
+
     def _getloc(self, isiloc, where):
         if where is None:
             return None, (slice(None),)
@@ -3119,11 +4285,7 @@ If the binning is *circular*, then it represents a finite segment in which *inte
         return out
 
     def _toflatbuffers(self, builder):
-        edgesbuf = self.edges.tostring()
-        aghast.aghast_generated.EdgesBinning.EdgesBinningStartEdgesVector(builder, len(self.edges))
-        builder.head = builder.head - len(edgesbuf)
-        builder.Bytes[builder.head : builder.head + len(edgesbuf)] = edgesbuf
-        edges = builder.EndVector(len(self.edges))
+        edges = _vectorfromarray(builder, aghast.aghast_generated.EdgesBinning.EdgesBinningStartEdgesVector, self.edges)
 
         aghast.aghast_generated.EdgesBinning.EdgesBinningStart(builder)
         aghast.aghast_generated.EdgesBinning.EdgesBinningAddEdges(builder, edges)
@@ -3152,11 +4314,8 @@ If the binning is *circular*, then it represents a finite segment in which *inte
     def toIrregularBinning(self):
         if self.low_inclusive and self.high_inclusive:
             raise ValueError("EdgesBinning.interval.low_inclusive and EdgesBinning.interval.high_inclusive cannot both be True")
-        intervals = []
-        for i in range(len(self.edges) - 1):
-            intervals.append(RealInterval(self.edges[i], self.edges[i + 1], low_inclusive=self.low_inclusive, high_inclusive=self.high_inclusive))
         overflow = None if self.overflow is None else self.overflow.detached()
-        return IrregularBinning(intervals, overflow=overflow)
+        return IrregularBinning.fromarrays(self.edges[:-1], self.edges[1:], low_inclusive=self.low_inclusive, high_inclusive=self.high_inclusive, overflow=overflow)
 
     def toCategoryBinning(self, format="%g"):
         return self.toIrregularBinning().toCategoryBinning(format=format)
@@ -3167,6 +4326,20 @@ If the binning is *circular*, then it represents a finite segment in which *inte
         loc_nanflow = None if self.overflow is None else self.overflow.loc_nanflow
         return self._getindex_general(where, len(self.edges) - 1, loc_underflow, loc_overflow, loc_nanflow)
 
+    def bin_index(self, values):
+        edges = numpy.asarray(self.edges, dtype=numpy.float64)
+        low_inclusive, high_inclusive, circular = self.low_inclusive, self.high_inclusive, self.circular
+        def inner(values):
+            if circular:
+                values = edges[0] + numpy.mod(values - edges[0], edges[-1] - edges[0])
+            if high_inclusive and not low_inclusive:
+                return numpy.searchsorted(edges, values, side="left") - 1
+            index = numpy.searchsorted(edges, values, side="right") - 1
+            if not low_inclusive and not high_inclusive:
+                index[(index >= 0) & (edges[numpy.maximum(index, 0)] == values)] = _gapindex
+            return index
+        return RealOverflow._binindex(self.overflow, values, len(edges) - 1, inner)
+
     def _getloc(self, isiloc, where):
         if where is None:
             return None, (slice(None),)
@@ -3275,6 +4448,8 @@ class OverlappingFillStrategyEnum(Enum):
     base = "IrregularBinning"
 
 class OverlappingFill(object):
+    __slots__ = ()
+
     unspecified = OverlappingFillStrategyEnum("unspecified", aghast.aghast_generated.OverlappingFillStrategy.OverlappingFillStrategy.overfill_unspecified)
     all         = OverlappingFillStrategyEnum("all", aghast.aghast_generated.OverlappingFillStrategy.OverlappingFillStrategy.overfill_all)
     first       = OverlappingFillStrategyEnum("first", aghast.aghast_generated.OverlappingFillStrategy.OverlappingFillStrategy.overfill_first)
@@ -3288,7 +4463,9 @@ class IrregularBinning(Binning, OverlappingFill):
         "overlapping_fill": aghast.checktype.CheckEnum("IrregularBinning", "overlapping_fill", required=False, choices=OverlappingFill.overlapping_fill_strategies),
         }
 
-    intervals        = typedproperty(_params["intervals"])
+    __slots__ = ("_intervals_array", "_bintable_cache")
+
+    _intervals_property = typedproperty(_params["intervals"])
     overflow         = typedproperty(_params["overflow"])
     overlapping_fill = typedproperty(_params["overlapping_fill"])
 
@@ -3316,29 +4493,123 @@ Irregular bins are usually not directly created by histogramming libraries, but
         self.overflow = overflow
         self.overlapping_fill = overlapping_fill
 
+    @classmethod
+    def fromarrays(cls, low, high, low_inclusive=True, high_inclusive=False, overflow=None, overlapping_fill=OverlappingFill.unspecified):
+        low = numpy.asarray(low, dtype=numpy.float64).reshape(-1)
+        array = numpy.zeros(len(low), dtype=_RealInterval_dtype)
+        array["low"] = low
+        array["high"] = high
+        array["low_inclusive"] = low_inclusive
+        array["high_inclusive"] = high_inclusive
+        return cls._fromintervals_array(array, overflow, overlapping_fill)
+
+    @classmethod
+    def _fromintervals_array(cls, array, overflow, overlapping_fill):
+        check = cls._params["intervals"]
+        if not check.minlen <= len(array) <= check.maxlen:
+            raise TypeError("{0}.{1} length must be between {2} and {3} (inclusive)".format(check.classname, check.paramname, check.minlen, check.maxlen))
+        out = cls.__new__(cls)
+        array.flags.writeable = False
+        out._intervals_array = array
+        out.overflow = overflow
+        out.overlapping_fill = overlapping_fill
+        return out
+
+    @property
+    def intervals(self):
+        if not hasattr(self, "_intervals") and not hasattr(self, "_flatbuffers"):
+            self._intervals = aghast.checktype.Vector([RealInterval(low, high, low_inclusive=low_inclusive, high_inclusive=high_inclusive) for low, high, low_inclusive, high_inclusive in self._intervals_array.tolist()])
+            aghast.checktype.setparent(self, self._intervals)
+        return self._intervals_property
+
+    @intervals.setter
+    def intervals(self, value):
+        self._intervals_property = value
+        self._intervals_array = None
+
+    @property
+    def intervals_array(self):
+        intervals = getattr(self, "_intervals", None)
+        if intervals is None or isinstance(intervals, aghast.checktype.FBVector):
+            if getattr(self, "_intervals_array", None) is not None:
+                out = self._intervals_array
+            else:
+                fb = self._flatbuffers
+                o = fb._tab.Offset(4)
+                if o == 0:
+                    out = numpy.zeros(0, dtype=_RealInterval_dtype)
+                else:
+                    out = numpy.frombuffer(fb._tab.Bytes, dtype=_RealInterval_dtype, count=fb.IntervalsLength(), offset=fb._tab.Vector(o))
+            if intervals is not None:
+                # deserialized RealIntervals that have been looked at may have been modified
+                got = [(i, x) for i, x in enumerate(intervals._got) if x is not None]
+                if len(got) != 0:
+                    out = out.copy()
+                    for i, x in got:
+                        out[i] = (x.low, x.high, x.low_inclusive, x.high_inclusive)
+        else:
+            out = numpy.zeros(len(intervals), dtype=_RealInterval_dtype)
+            out["low"] = [x.low for x in intervals]
+            out["high"] = [x.high for x in intervals]
+            out["low_inclusive"] = [x.low_inclusive for x in intervals]
+            out["high_inclusive"] = [x.high_inclusive for x in intervals]
+        out.flags.writeable = False
+        return out
+
+    def _fingerprintitems(self, structure_only):
+        return [("intervals", self.intervals_array), ("overflow", self.overflow), ("overlapping_fill", self.overlapping_fill)]
+
+    def _numintervals(self):
+        intervals = getattr(self, "_intervals", None)
+        if intervals is None:
+            return len(self.intervals_array)
+        else:
+            return len(intervals)
+
     def _valid(self, seen, recursive):
-        if len(self.intervals) != len(set(self.intervals)):
-            raise ValueError("IrregularBinning.intervals must be unique")
-        if recursive:
-            _valid(self.intervals, seen, recursive)
-            _valid(self.overflow, seen, recursive)
+        intervals = getattr(self, "_intervals", None)
+        if intervals is None or isinstance(intervals, aghast.checktype.FBVector):
+            array = self.intervals_array
+            if len(numpy.unique(array)) != len(array):
+                raise ValueError("IrregularBinning.intervals must be unique")
+            if recursive:
+                low, high = array["low"], array["high"]
+                bad = numpy.nonzero(low > high)[0]
+                if len(bad) != 0:
+                    raise ValueError("RealInterval.low ({0}) must be less than or equal to RealInterval.high ({1})".format(low[bad[0]], high[bad[0]]))
+                bad = numpy.nonzero((low == high) & ~array["low_inclusive"] & ~array["high_inclusive"])[0]
+                if len(bad) != 0:
+                    raise ValueError("RealInterval describes an empty set ({0} == {1} and both endpoints are exclusive)".format(low[bad[0]], high[bad[0]]))
+                _valid(self.overflow, seen, recursive)
+        else:
+            if len(intervals) != len(set(intervals)):
+                raise ValueError("IrregularBinning.intervals must be unique")
+            if recursive:
+                _valid(intervals, seen, recursive)
+                _valid(self.overflow, seen, recursive)
 
     def _binshape(self):
         if self.overflow is None:
             numoverflowbins = 0
         else:
             numoverflowbins = self.overflow._numbins()
-        return (len(self.intervals) + numoverflowbins,)
+        return (self._numintervals() + numoverflowbins,)
+
+    def _detached(self, top, exceptions=()):
+        out = super(IrregularBinning, self)._detached(top, exceptions=exceptions)
+        if out is not self and "intervals" not in exceptions and not hasattr(out, "_intervals"):
+            out._intervals_array = getattr(self, "_intervals_array", None)
+        return out
+
+    def serialized_size_estimate(self):
+        return 16 + 4*len(self._params) + 8 + 24*self._numintervals() + _sizeestimate(self.overflow)
 
     @property
     def dimensions(self):
         return 1
 
     def _toflatbuffers(self, builder):
-        aghast.aghast_generated.IrregularBinning.IrregularBinningStartIntervalsVector(builder, len(self.intervals))
-        for x in self.intervals[::-1]:
-            x._toflatbuffers(builder)
-        intervals = builder.EndVector(len(self.intervals))
+        intervals = _vectorfromarray(builder, aghast.aghast_generated.IrregularBinning.IrregularBinningStartIntervalsVector, self.intervals_array)
 
         aghast.aghast_generated.IrregularBinning.IrregularBinningStart(builder)
         aghast.aghast_generated.IrregularBinning.IrregularBinningAddIntervals(builder, intervals)
@@ -3357,19 +4628,23 @@ Irregular bins are usually not directly created by histogramming libraries, but
         return _dumpline(self, args, indent, width, end)
 
     def toCategoryBinning(self, format="%g"):
+        array = self.intervals_array
         flows = []
         if self.overflow is not None:
             low = numpy.inf
             low_inclusive = False
             high = -numpy.inf
             high_inclusive = False
-            for interval in self.intervals:
-                if interval.low <= low:
-                    low = interval.low
-                    low_inclusive = interval.low_inclusive
-                if interval.high >= high:
-                    high = interval.high
-                    high_inclusive = interval.high_inclusive
+            lows = array["low"]
+            if (lows <= low).any():
+                i = len(lows) - 1 - numpy.argmin(lows[::-1])
+                low = lows[i]
+                low_inclusive = array["low_inclusive"][i]
+            highs = array["high"]
+            if (highs >= high).any():
+                i = len(highs) - 1 - numpy.argmax(highs[::-1])
+                high = highs[i]
+                high_inclusive = array["high_inclusive"][i]
 
             flows.append((self.overflow.loc_underflow, "{0}-inf, {1}{2}".format(
                 "[" if self.overflow.minf_mapping == self.overflow.in_underflow else "(",
@@ -3392,12 +4667,12 @@ Irregular bins are usually not directly created by histogramming libraries, but
         for loc, cat in BinLocation._belows(flows):
             cats.append(cat)
 
-        for interval in self.intervals:
+        for low, high, low_inclusive, high_inclusive in array.tolist():
             cats.append("{0}{1}, {2}{3}".format(
-                "[" if interval.low_inclusive else "(",
-                format % interval.low,
-                format % interval.high,
-                "]" if interval.high_inclusive else ")"))
+                "[" if low_inclusive else "(",
+                format % low,
+                format % high,
+                "]" if high_inclusive else ")"))
 
         for loc, cat in BinLocation._aboves(flows):
             cats.append(cat)
@@ -3408,7 +4683,68 @@ Irregular bins are usually not directly created by histogramming libraries, but
         loc_underflow = None if self.overflow is None else self.overflow.loc_underflow
         loc_overflow = None if self.overflow is None else self.overflow.loc_overflow
         loc_nanflow = None if self.overflow is None else self.overflow.loc_nanflow
-        return self._getindex_general(where, len(self.intervals), loc_underflow, loc_overflow, loc_nanflow)
+        return self._getindex_general(where, self._numintervals(), loc_underflow, loc_overflow, loc_nanflow)
+
+    def bin_index(self, values):
+        if self.overlapping_fill == self.all:
+            raise ValueError("IrregularBinning with overlapping_fill=all can put a value in more than one bin, but bin_index returns one bin per value")
+        numintervals = self._numintervals()
+        points, table = self._bintable()
+
+        def inner(values):
+            slot = numpy.searchsorted(points, values, side="left")
+            exact = (points[numpy.minimum(slot, len(points) - 1)] == values)
+            return table[2*slot + exact]
+        return RealOverflow._binindex(self.overflow, values, numintervals, inner)
+
+    def _bintable(self):
+        # the table depends only on the intervals and overlapping_fill, so repeated fills reuse it
+        key = self.fingerprint()
+        cached = getattr(self, "_bintable_cache", None)
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+
+        intervals = self.intervals_array
+        low, high = intervals["low"], intervals["high"]
+        low_inclusive, high_inclusive = intervals["low_inclusive"], intervals["high_inclusive"]
+
+        # which intervals contain a value only changes at their endpoints: slot 2*k + 1 is points[k] and slot 2*k is
+        # the open segment below it, so each interval covers a contiguous range of slots
+        points = numpy.unique(numpy.concatenate((low, high)))
+        numslots = 2*len(points) + 1
+        first = 2*numpy.searchsorted(points, low) + 2 - low_inclusive.astype(numpy.int64)
+        final = 2*numpy.searchsorted(points, high) + high_inclusive.astype(numpy.int64)
+        nonempty = (first <= final)
+
+        # each slot takes the highest-priority interval covering it: every range is split into two overlapping
+        # power-of-two blocks, and block minima are pushed down one level at a time (O((N + P) log P), no loop over N)
+        priority = numpy.arange(len(low), dtype=numpy.int64)
+        if self.overlapping_fill == self.last:
+            priority = priority[::-1].copy()
+        first, final, priority = first[nonempty], final[nonempty], priority[nonempty]
+        level = numpy.frexp((final - first + 1).astype(numpy.float64))[1] - 1
+        none = len(low)
+        current = None
+        for k in range(int(level.max()) if len(level) != 0 else 0, -1, -1):
+            blocks = numpy.full(numslots, none, dtype=numpy.int64)
+            here = (level == k)
+            numpy.minimum.at(blocks, first[here], priority[here])
+            numpy.minimum.at(blocks, final[here] - (1 << k) + 1, priority[here])
+            if current is not None:
+                half = 1 << k
+                numpy.minimum(blocks, current, out=blocks)
+                numpy.minimum(blocks[half:], current[:-half], out=blocks[half:])
+            current = blocks
+
+        table = numpy.full(numslots, _gapindex, dtype=numpy.int64)
+        covered = (current != none)
+        table[covered] = current[covered] if self.overlapping_fill != self.last else len(low) - 1 - current[covered]
+        # points[0] is the lowest low and points[-1] is the highest high
+        table[:2][~covered[:2]] = -1
+        table[-2:][~covered[-2:]] = len(low)
+
+        self._bintable_cache = (key, points, table)
+        return points, table
 
     def _getloc(self, isiloc, where):
         if where is None:
@@ -3418,45 +4754,45 @@ Irregular bins are usually not directly created by histogramming libraries, but
             return self, (slice(None),)
 
         elif isinstance(where, slice):
+            array = self.intervals_array
             if isiloc:
-                start, stop, step = where.indices(len(self.intervals))
+                start, stop, step = where.indices(len(array))
                 if step <= 0:
                     raise IndexError("slice step cannot be zero or negative")
                 start = max(start, 0)
-                stop = min(stop, len(self.intervals))
+                stop = min(stop, len(array))
                 d, m = divmod(stop - start, step)
                 length = d + (1 if m != 0 else 0)
                 stop = start + step*length
 
                 yes_underflow, yes_overflow = False, False
-                index = numpy.full(len(self.intervals), -1, dtype=numpy.int64)
+                index = numpy.full(len(array), -1, dtype=numpy.int64)
                 index[start:stop:step] = numpy.arange(length)
-                intervals = [x.detached() for x in self.intervals[start:stop:step]]
+                intervals = array[start:stop:step]
 
             else:
                 if where.step is not None:
                     raise IndexError("IrregularBinning.loc slice cannot have a step")
-                yes_underflow, yes_overflow = False, False
-                index = numpy.empty(len(self.intervals), dtype=numpy.int64)
-                length = 0
-                intervals = []
-                for i, interval in enumerate(self.intervals):
-                    if where.start is not None and where.start >= interval.high:
-                        yes_underflow = True
-                        index[i] = -3
-                    elif where.stop is not None and where.stop <= interval.low:
-                        yes_overflow = True
-                        index[i] = -2
-                    else:
-                        index[i] = length
-                        length += 1
-                        intervals.append(interval.detached())
+                index = numpy.empty(len(array), dtype=numpy.int64)
+                below = numpy.zeros(len(array), dtype=numpy.bool_)
+                if where.start is not None:
+                    below = where.start >= array["high"]
+                above = numpy.zeros(len(array), dtype=numpy.bool_)
+                if where.stop is not None:
+                    above = ~below & (where.stop <= array["low"])
+                inside = ~below & ~above
+                yes_underflow, yes_overflow = bool(below.any()), bool(above.any())
+                index[below] = -3
+                index[above] = -2
+                length = int(numpy.count_nonzero(inside))
+                index[inside] = numpy.arange(length)
+                intervals = array[inside]
 
             if length == 0:
                 raise IndexError("slice {0}:{1} would result in no bins".format(where.start, where.stop))
 
             overflow, loc_underflow, pos_underflow, loc_overflow, pos_overflow, loc_nanflow, pos_nanflow = RealOverflow._getloc(self.overflow, yes_underflow, yes_overflow, length)
-            binning = IrregularBinning(intervals, overflow=overflow, overlapping_fill=self.overlapping_fill)
+            binning = IrregularBinning._fromintervals_array(intervals, overflow, self.overlapping_fill)
 
             if pos_underflow is not None:
                 index[index == -3] = pos_underflow
@@ -3468,30 +4804,29 @@ Irregular bins are usually not directly created by histogramming libraries, but
             return binning, (selfmap,)
                 
         elif not isiloc and not isinstance(where, (bool, numpy.bool, numpy.bool_)) and isinstance(where, (numbers.Real, numpy.integer, numpy.floating)):
-            for interval in self.intervals:
-                if interval.low <= where <= interval.high:
-                    break
-            else:
+            array = self.intervals_array
+            if not ((array["low"] <= where) & (where <= array["high"])).any():
                 raise IndexError("index {0} is out of bounds".format(where))
             return self._getloc(False, slice(where, where))
 
         elif isiloc and not isinstance(where, (bool, numpy.bool, numpy.bool_)) and isinstance(where, (numbers.Integral, numpy.integer)):
             i = where
             if i < 0:
-                i += len(self.intervals)
-            if not 0 <= i < len(self.intervals):
+                i += self._numintervals()
+            if not 0 <= i < self._numintervals():
                 raise IndexError("index {0} is out of bounds".format(where))
             return self._getloc(True, slice(i, i))
 
         elif isiloc:
             where = numpy.array(where, copy=False)
             if len(where.shape) == 1 and issubclass(where.dtype.type, (numpy.integer, numpy.bool, numpy.bool_)):
-                intervals = numpy.array(self.intervals, dtype=numpy.object)[where]
+                array = self.intervals_array
+                intervals = array[where]
                 if len(intervals) == 0:
                     raise IndexError("index {0} would result in no bins".format(where))
-                index = numpy.full(len(self.intervals), -1, dtype=numpy.int64)
+                index = numpy.full(len(array), -1, dtype=numpy.int64)
                 index[where] = numpy.arange(len(intervals))
-                binning = IrregularBinning([x.detached() for x in intervals], overflow=(None if self.overflow is None else self.overflow.detached()), overlapping_fill=self.overlapping_fill)
+                binning = IrregularBinning._fromintervals_array(intervals, None if self.overflow is None else self.overflow.detached(), self.overlapping_fill)
                 flows = [] if self.overflow is None else [(self.overflow.loc_underflow, -1), (self.overflow.loc_overflow, -1), (self.overflow.loc_nanflow, -1)]
                 selfmap = self._selfmap(flows, index)
                 return binning, (selfmap,)
@@ -3509,24 +4844,30 @@ Irregular bins are usually not directly created by histogramming libraries, but
         else:
             overlapping_fill = self.unspecified
 
-        selfints = list(self.intervals)
-        otherints = list(other.intervals)
-
-        lookup = {x: i for i, x in enumerate(selfints)}
-        intervals = selfints + [x for x in otherints if x not in lookup]
+        selfints = self.intervals_array
+        otherints = other.intervals_array
 
-        if len(intervals) == len(selfints) == len(otherints) and selfints == otherints and self.overflow == other.overflow:
+        if len(selfints) == len(otherints) and (selfints == otherints).all() and self.overflow == other.overflow:
             if overlapping_fill == self.overlapping_fill:
                 return self, (None,), (None,)
             else:
-                return IrregularBinning([x.detached(reclaim=True) for x in intervals], overflow=(None if self.overflow is None else self.overflow.detached(reclaim=True)), overlapping_fill=overlapping_fill), (None,), (None,)
+                return IrregularBinning._fromintervals_array(selfints.copy(), None if self.overflow is None else self.overflow.detached(reclaim=True), overlapping_fill), (None,), (None,)
 
         else:
+            # an interval of other is new if its first occurrence in self followed by other is in other
+            unique, first, inverse = numpy.unique(numpy.concatenate([selfints, otherints]), return_index=True, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            otherinverse = inverse[len(selfints):]
+            new = (first[otherinverse] == numpy.arange(len(selfints), len(selfints) + len(otherints)))
+            intervals = numpy.concatenate([selfints, otherints[new]])
+
             overflow, pos_underflow, pos_overflow, pos_nanflow = RealOverflow._common(self.overflow, other.overflow, len(intervals))
 
-            lookup = {x: i for i, x in enumerate(intervals)}
+            position = numpy.empty(len(unique), dtype=numpy.int64)
+            position[inverse[:len(selfints)]] = numpy.arange(len(selfints))
+            position[otherinverse[new]] = numpy.arange(len(selfints), len(intervals))
             othermap = other._selfmap([] if other.overflow is None else [(other.overflow.loc_underflow, pos_underflow), (other.overflow.loc_overflow, pos_overflow), (other.overflow.loc_nanflow, pos_nanflow)],
-                                      numpy.array([lookup[x] for x in otherints], dtype=numpy.int64))
+                                      position[otherinverse])
 
             if ((self.overflow is None and overflow is None) or (self.overflow is not None and self.overflow.loc_underflow == overflow.loc_underflow and self.overflow.loc_overflow == overflow.loc_overflow and self.overflow.loc_nanflow == overflow.loc_nanflow)) and len(selfints) == len(intervals):
                 return self, (None,), (othermap,)
@@ -3534,16 +4875,61 @@ Irregular bins are usually not directly created by histogramming libraries, but
             else:
                 selfmap = self._selfmap([] if self.overflow is None else [(self.overflow.loc_underflow, pos_underflow), (self.overflow.loc_overflow, pos_overflow), (self.overflow.loc_nanflow, pos_nanflow)],
                                         numpy.arange(len(selfints), dtype=numpy.int64))
-                return IrregularBinning([x.detached(reclaim=True) for x in intervals], overflow=overflow, overlapping_fill=overlapping_fill), (selfmap,), (othermap,)
+                return IrregularBinning._fromintervals_array(intervals, overflow, overlapping_fill), (selfmap,), (othermap,)
 
 ################################################# CategoryBinning
 
+class _CategoryIndex(object):
+    __slots__ = ("categories", "_lookup", "_sorted", "_order")
+
+    def __init__(self, categories):
+        self.categories = categories
+        self._lookup = None
+        self._sorted = None
+
+    @property
+    def lookup(self):
+        if self._lookup is None:
+            self._lookup = {x: j for j, x in enumerate(self.categories)}
+        return self._lookup
+
+    def indexes(self, values):
+        if isinstance(values, str):
+            return self.lookup.get(values, -1)
+        values = numpy.asarray(values)
+        if values.dtype.kind == "O":
+            # only actual strings can match: None or 1 must not find the categories "None" or "1"
+            isstr = numpy.array([isinstance(x, str) for x in values.reshape(-1)], dtype=numpy.bool_).reshape(values.shape)
+            out = numpy.full(values.shape, -1, dtype=numpy.int64)
+            out[isstr] = self._search(values[isstr].astype(str))
+            return out
+        elif values.dtype.kind == "S":
+            values = values.astype(str)
+        elif values.dtype.kind != "U":
+            return numpy.full(values.shape, -1, dtype=numpy.int64)
+        return self._search(values)
+
+    def _search(self, values):
+        if self._sorted is None:
+            categories = numpy.array(list(self.categories), dtype=str)
+            self._order = numpy.argsort(categories, kind="mergesort")
+            self._sorted = categories[self._order]
+        # the last of any duplicates, like lookup
+        pos = numpy.searchsorted(self._sorted, values, side="right") - 1
+        found = (pos >= 0)
+        found[found] = (self._sorted[pos[found]] == values[found])
+        out = numpy.full(values.shape, -1, dtype=numpy.int64)
+        out[found] = self._order[pos[found]]
+        return out
+
 class CategoryBinning(Binning, BinLocation):
     _params = {
         "categories":   aghast.checktype.CheckVector("CategoryBinning", "categories", required=True, type=str),
         "loc_overflow": aghast.checktype.CheckEnum("CategoryBinning", "loc_overflow", required=False, choices=BinLocation.locations, intlookup=BinLocation._locations),
         }
 
+    __slots__ = ("_category_index",)
+
     categories = typedproperty(_params["categories"])
     loc_overflow = typedproperty(_params["loc_overflow"])
 
@@ -3566,9 +4952,19 @@ If *loc_overflow* is `nonexistent`, unspecified strings were ignored in the fill
         self.loc_overflow = loc_overflow
 
     def _valid(self, seen, recursive):
-        if len(self.categories) != len(set(self.categories)):
+        if len(self.categories) != len(self._categoryindex().lookup):
             raise ValueError("CategoryBinning.categories must be unique")
 
+    def _categoryindex(self):
+        categories = self.categories
+        index = getattr(self, "_category_index", None)
+        if index is None or index.categories is not categories:
+            index = self._category_index = _CategoryIndex(categories)
+        return index
+
+    def category_index(self, categories):
+        return self._categoryindex().indexes(categories)
+
     @property
     def isnumerical(self):
         return False
@@ -3603,6 +4999,15 @@ If *loc_overflow* is `nonexistent`, unspecified strings were ignored in the fill
     def _getindex(self, where):
         return self._getindex_general(where, len(self.categories), None, self.loc_overflow, None)
 
+    def bin_index(self, values):
+        index = numpy.asarray(self._categoryindex().indexes(values))
+        if self.loc_overflow == self.nonexistent:
+            return index
+        elif self.loc_overflow.value < self.nonexistent.value:
+            return index + 1
+        else:
+            return numpy.where(index < 0, len(self.categories), index)
+
     def _getloc(self, isiloc, where):
         if where is None:
             return None, (slice(None),)
@@ -3650,14 +5055,13 @@ If *loc_overflow* is `nonexistent`, unspecified strings were ignored in the fill
         elif not isiloc and isinstance(where, str):
             return self._getloc(False, [where])
 
-        elif not isiloc and isinstance(where, Iterable) and all(isinstance(x, str) for x in where):
-            lookup = {x: j for j, x in enumerate(self.categories)}
-            index = numpy.full(len(lookup), len(where), dtype=numpy.int64)
-            for i, x in enumerate(where):
-                j = lookup.get(x, None)
-                if j is None:
-                    raise IndexError("CategoryBinning does not have category {0}".format(repr(x)))
-                index[j] = i
+        elif not isiloc and ((isinstance(where, numpy.ndarray) and where.dtype.kind == "U") or (isinstance(where, Iterable) and all(isinstance(x, str) for x in where))):
+            where = numpy.asarray(where).reshape(-1)
+            found = self._categoryindex().indexes(where)
+            if (found < 0).any():
+                raise IndexError("CategoryBinning does not have category {0}".format(repr(str(where[numpy.argmax(found < 0)]))))
+            index = numpy.full(len(self.categories), len(where), dtype=numpy.int64)
+            index[found] = numpy.arange(len(where))
 
             if self.loc_overflow != BinLocation.nonexistent or (index == len(where)).any():
                 loc_overflow = BinLocation.above1
@@ -3666,7 +5070,7 @@ If *loc_overflow* is `nonexistent`, unspecified strings were ignored in the fill
                 loc_overflow = BinLocation.nonexistent
                 pos_overflow = None
 
-            binning = CategoryBinning(where, loc_overflow=loc_overflow)
+            binning = CategoryBinning(where.tolist(), loc_overflow=loc_overflow)
             selfmap = self._selfmap([(self.loc_overflow, pos_overflow)], index)
 
             return binning, (selfmap,)
@@ -3694,13 +5098,22 @@ If *loc_overflow* is `nonexistent`, unspecified strings were ignored in the fill
         selfcat = list(self.categories)
         othercat = list(other.categories)
 
-        lookup = {x: i for i, x in enumerate(selfcat)}
-        categories = selfcat + [x for x in othercat if x not in lookup]
-
-        if len(categories) == len(selfcat) == len(othercat) and selfcat == othercat and self.loc_overflow == other.loc_overflow:
+        if selfcat == othercat and self.loc_overflow == other.loc_overflow:
             return self, (None,), (None,)
 
         else:
+            othermap = self._categoryindex().indexes(othercat) if len(othercat) != 0 else numpy.empty(0, dtype=numpy.int64)
+            missing = (othermap < 0)
+            if missing.any():
+                # new categories in order of first appearance in other
+                unique, first, inverse = numpy.unique(numpy.array(othercat, dtype=str)[missing], return_index=True, return_inverse=True)
+                rank = numpy.empty(len(unique), dtype=numpy.int64)
+                rank[numpy.argsort(first)] = numpy.arange(len(unique))
+                othermap[missing] = len(selfcat) + rank[inverse.reshape(-1)]
+                categories = selfcat + [othercat[i] for i in numpy.nonzero(missing)[0][numpy.sort(first)]]
+            else:
+                categories = selfcat
+
             if self.loc_overflow != self.nonexistent or other.loc_overflow != other.nonexistent:
                 loc_overflow = self.above1
                 pos_overflow = len(categories)
@@ -3708,9 +5121,7 @@ If *loc_overflow* is `nonexistent`, unspecified strings were ignored in the fill
                 loc_overflow = self.nonexistent
                 pos_overflow = None
 
-            lookup = {x: i for i, x in enumerate(categories)}
-            othermap = other._selfmap([(other.loc_overflow, pos_overflow)],
-                                      numpy.array([lookup[x] for x in othercat], dtype=numpy.int64))
+            othermap = other._selfmap([(other.loc_overflow, pos_overflow)], othermap)
 
             if self.loc_overflow == loc_overflow and len(selfcat) == len(categories):
                 return self, (None,), (othermap,)
@@ -3816,11 +5227,7 @@ Therefore, even though this binning is sparse, it can have underflow and overflo
         return out
 
     def _toflatbuffers(self, builder):
-        binsbuf = self.bins.tostring()
-        aghast.aghast_generated.SparseRegularBinning.SparseRegularBinningStartBinsVector(builder, len(self.bins))
-        builder.head = builder.head - len(binsbuf)
-        builder.Bytes[builder.head : builder.head + len(binsbuf)] = binsbuf
-        bins = builder.EndVector(len(self.bins))
+        bins = _vectorfromarray(builder, aghast.aghast_generated.SparseRegularBinning.SparseRegularBinningStartBinsVector, self.bins)
 
         aghast.aghast_generated.SparseRegularBinning.SparseRegularBinningStart(builder)
         aghast.aghast_generated.SparseRegularBinning.SparseRegularBinningAddBins(builder, bins)
@@ -3866,24 +5273,27 @@ Therefore, even though this binning is sparse, it can have underflow and overflo
             raise ValueError("SparseRegularBinning.interval.low_inclusive and SparseRegularBinning.interval.high_inclusive cannot both be True")
         overflow = None if self.overflow is None else self.overflow.detached()
         flows = [] if overflow is None else [(overflow.loc_underflow, -numpy.inf), (overflow.loc_overflow, numpy.inf), (overflow.loc_nanflow, numpy.nan)]
-        intervals = []
-        for loc, val in BinLocation._belows(flows):
-            if val == -numpy.inf:
-                intervals.append(RealInterval(-numpy.inf, self.bin_width*(self.minbin) + self.origin, low_inclusive=(overflow.minf_mapping == RealOverflow.in_underflow), high_inclusive=(not self.low_inclusive)))
-                overflow.loc_underflow = BinLocation.nonexistent
-            if val == numpy.inf:
-                intervals.append(RealInterval(self.bin_width*(self.maxbin + 1) + self.origin, numpy.inf, low_inclusive=(not self.high_inclusive), high_inclusive=(overflow.pinf_mapping == RealOverflow.in_overflow)))
-                overflow.loc_overflow = BinLocation.nonexistent
-        for x in self.bins:
-            intervals.append(RealInterval(self.bin_width*(x) + self.origin, self.bin_width*(x + 1) + self.origin))
-        for loc, val in BinLocation._aboves(flows):
-            if val == -numpy.inf:
-                intervals.append(RealInterval(-numpy.inf, self.bin_width*(self.minbin) + self.origin, low_inclusive=(overflow.minf_mapping == RealOverflow.in_underflow), high_inclusive=(not self.low_inclusive)))
-                overflow.loc_underflow = BinLocation.nonexistent
-            if val == numpy.inf:
-                intervals.append(RealInterval(self.bin_width*(self.maxbin + 1) + self.origin, numpy.inf, low_inclusive=(not self.high_inclusive), high_inclusive=(overflow.pinf_mapping == RealOverflow.in_overflow)))
-                overflow.loc_overflow = BinLocation.nonexistent
-        return IrregularBinning(intervals, overflow=overflow)
+        def flowintervals(pairs):
+            out = []
+            for loc, val in pairs:
+                if val == -numpy.inf:
+                    out.append((-numpy.inf, self.bin_width*(self.minbin) + self.origin, overflow.minf_mapping == RealOverflow.in_underflow, not self.low_inclusive))
+                    overflow.loc_underflow = BinLocation.nonexistent
+                if val == numpy.inf:
+                    out.append((self.bin_width*(self.maxbin + 1) + self.origin, numpy.inf, not self.high_inclusive, overflow.pinf_mapping == RealOverflow.in_overflow))
+                    overflow.loc_overflow = BinLocation.nonexistent
+            array = numpy.zeros(len(out), dtype=_RealInterval_dtype)
+            for i, x in enumerate(out):
+                array[i] = x
+            return array
+
+        belows = flowintervals(BinLocation._belows(flows))
+        bins = numpy.zeros(len(self.bins), dtype=_RealInterval_dtype)
+        bins["low"] = self.bin_width*(self.bins) + self.origin
+        bins["high"] = self.bin_width*(self.bins + 1) + self.origin
+        bins["low_inclusive"] = True
+        aboves = flowintervals(BinLocation._aboves(flows))
+        return IrregularBinning._fromintervals_array(numpy.concatenate([belows, bins, aboves]), overflow, OverlappingFill.unspecified)
 
     def toCategoryBinning(self, format="%g"):
         flows = []
@@ -3936,6 +5346,40 @@ Therefore, even though this binning is sparse, it can have underflow and overflo
         loc_nanflow = None if self.overflow is None else self.overflow.loc_nanflow
         return self._getindex_general(where, len(self.bins), loc_underflow, loc_overflow, loc_nanflow)
 
+    def bin_index(self, values):
+        bins = numpy.asarray(self.bins, dtype=numpy.int64)
+        order = numpy.argsort(bins)
+        sortedbins = bins[order]
+        bin_width, origin = float(self.bin_width), self.origin
+        low_inclusive, high_inclusive = self.low_inclusive, self.high_inclusive
+        # keep bin numbers where float64 -> int64 is exact
+        minbin, maxbin = max(self.minbin, -2**62), min(self.maxbin, 2**62)
+        def inner(values):
+            k = _gridindex((values - origin) / bin_width, low_inclusive, high_inclusive, minbin, maxbin)
+            if len(bins) == 0:
+                index = numpy.full(k.shape, _gapindex, dtype=numpy.int64)
+            else:
+                pos = numpy.minimum(numpy.searchsorted(sortedbins, k), len(bins) - 1)
+                index = numpy.where(sortedbins[pos] == k, order[pos], _gapindex)
+            index[k == minbin - 1] = -1
+            index[k == maxbin + 1] = len(bins)
+            return index
+        return RealOverflow._binindex(self.overflow, values, len(bins), inner)
+
+    def _missingbins(self, values):
+        # bin numbers in [minbin, maxbin] that some value falls into but that are not in bins yet
+        values = numpy.asarray(values, dtype=numpy.float64).reshape(-1)
+        values = values[numpy.isfinite(values)]
+        minbin, maxbin = max(self.minbin, -2**62), min(self.maxbin, 2**62)
+        k = numpy.unique(_gridindex((values - self.origin) / float(self.bin_width), self.low_inclusive, self.high_inclusive, minbin, maxbin))
+        k = k[(k >= minbin) & (k <= maxbin)]
+        return k[~numpy.isin(k, numpy.asarray(self.bins, dtype=numpy.int64))]
+
+    def _numbelow(self):
+        if self.overflow is None:
+            return 0
+        return sum(1 for x in (self.overflow.loc_underflow, self.overflow.loc_overflow, self.overflow.loc_nanflow) if x.value < BinLocation.nonexistent.value)
+
     def _getloc(self, isiloc, where):
         if where is None:
             return None, (slice(None),)
@@ -4480,11 +5924,7 @@ Some systematic errors are quantitative (e.g. misalignment) and others are categ
         if len(self.systematic) == 0:
             systematic = None
         else:
-            systematicbuf = systematic.tostring()
-            aghast.aghast_generated.Variation.VariationStartSystematicVector(builder, len(self.systematic))
-            builder.head = builder.head - len(systematicbuf)
-            builder.Bytes[builder.head : builder.head + len(systematicbuf)] = systematicbuf
-            systematic = builder.EndVector(len(self.systematic))
+            systematic = _vectorfromarray(builder, aghast.aghast_generated.Variation.VariationStartSystematicVector, self.systematic)
 
         if category_systematic is not None:
             aghast.aghast_generated.Variation.VariationStartCategorySystematicVector(builder, len(category_systematic))
@@ -4992,6 +6432,13 @@ To be valid, the length of the *counts* buffer (in number of items, not number o
         self.counts = self.counts._add(other.counts, noclobber)
         return self
 
+    def _remapadd(self, other, newshape, selfmap, othermap, noclobber):
+        assert isinstance(other, UnweightedCounts)
+        counts = self.counts._remapadd(other.counts, newshape, selfmap, othermap, noclobber)
+        if counts is not self.counts:
+            self.counts = counts
+        return self
+
     @property
     def flatarray(self):
         return self.counts.flatarray
@@ -5103,6 +6550,27 @@ To be valid, the length of all of these buffers (in number of items, not number
 
         return self
 
+    def _remapadd(self, other, newshape, selfmap, othermap, noclobber):
+        assert isinstance(other, WeightedCounts)
+
+        sumw = self.sumw._remapadd(other.sumw, newshape, selfmap, othermap, noclobber)
+        if sumw is not self.sumw:
+            self.sumw = sumw
+
+        if self.sumw2 is not None and other.sumw2 is not None:
+            sumw2 = self.sumw2._remapadd(other.sumw2, newshape, selfmap, othermap, noclobber)
+            if sumw2 is not self.sumw2:
+                self.sumw2 = sumw2
+        else:
+            self.sumw2 = None
+
+        if self.unweighted is not None and other.unweighted is not None:
+            self.unweighted._remapadd(other.unweighted, newshape, selfmap, othermap, noclobber)
+        else:
+            self.unweighted = None
+
+        return self
+
     @property
     def flatarray(self):
         out = {"sumw": self.sumw.flatarray}
@@ -5191,7 +6659,9 @@ class Function(Ghast):
         data = fb.Data()
         fb2 = deserializer()
         fb2.Init(data.Bytes, data.Pos)
-        return interface._fromflatbuffers(fb, fb2)
+        out = interface._fromflatbuffers(fb, fb2)
+        out._flatbuffers._tab = fb._tab
+        return out
 
 ################################################# FunctionObject
 
@@ -5309,11 +6779,7 @@ The *title*, *metadata*, *decoration*, and *script* properties have no semantic
         if len(self.paramaxis) == 0:
             paramaxis = None
         else:
-            paramaxisbuf = self.paramaxis.tostring()
-            aghast.aghast_generated.ParameterizedFunction.ParameterizedFunctionStartParamaxisVector(builder, len(self.paramaxis))
-            builder.head = builder.head - len(paramaxisbuf)
-            builder.Bytes[builder.head : builder.head + len(paramaxisbuf)] = paramaxisbuf
-            paramaxis = builder.EndVector(len(self.paramaxis))
+            paramaxis = _vectorfromarray(builder, aghast.aghast_generated.ParameterizedFunction.ParameterizedFunctionStartParamaxisVector, self.paramaxis)
 
         if parameter_covariances is not None:
             aghast.aghast_generated.ParameterizedFunction.ParameterizedFunctionStartParameterCovariancesVector(builder, len(parameter_covariances))
@@ -5662,6 +7128,410 @@ The *title*, *metadata*, *decoration*, and *script* properties have no semantic
 
 ################################################# Histogram
 
+def _countsarrays(counts, shape):
+    if isinstance(counts, UnweightedCounts):
+        buffers = [("counts", counts.counts)]
+    else:
+        buffers = [("sumw", counts.sumw), ("sumw2", counts.sumw2), ("unweighted", None if counts.unweighted is None else counts.unweighted.counts)]
+    out = collections.OrderedDict()
+    for n, x in buffers:
+        if x is not None:
+            out[n] = x.flatarray.reshape(shape, order=("c" if x.dimension_order == InterpretedBuffer.c_order else "f"))
+    return out
+
+class _AccumulatorAxis(object):
+    # any binning: restructured on every add, with physical[d] sending each bin of dimension d to its slot in the accumulator
+    __slots__ = ("binning", "physical", "used")
+
+    def __init__(self, binning, shape):
+        self.binning = binning
+        self.physical = [numpy.arange(n, dtype=numpy.int64) for n in shape]
+        self.used = list(shape)
+
+    def accepts(self, binning):
+        return True
+
+    def add(self, binning):
+        self.binning, selfmap, othermap = Binning._plan(self.binning, binning)[1]
+        return self.remap(selfmap, othermap, self.binning._binshape())
+
+    def remap(self, selfmap, othermap, newshape):
+        out = []
+        for d, (sm, om) in enumerate(zip(selfmap, othermap)):
+            if sm is not None:
+                physical = numpy.empty(newshape[d], dtype=numpy.int64)
+                physical[sm] = self.physical[d]
+                fresh = numpy.ones(newshape[d], dtype=numpy.bool_)
+                fresh[sm] = False
+                numfresh = numpy.count_nonzero(fresh)
+                physical[fresh] = numpy.arange(self.used[d], self.used[d] + numfresh)
+                self.physical[d] = physical
+                self.used[d] += numfresh
+            out.append(self.physical[d] if om is None else self.physical[d][om])
+        return out
+
+    def layout(self):
+        return self.binning, self.physical
+
+class _AccumulatorKeyedAxis(object):
+    # category or sparse bins: new bins take the next free slot without rebuilding the binning until finalize
+    __slots__ = ("binning", "slots", "used", "grown")
+
+    def __init__(self, binning):
+        self.binning = binning
+        self.slots = {}
+        for key in self._keys(binning):
+            self.slots[key] = len(self.slots)
+        self.used = [len(self.slots)]
+        self.grown = False
+
+    def _assign(self, binning):
+        keys = self._keys(binning)
+        out = numpy.empty(len(keys), dtype=numpy.int64)
+        for i, key in enumerate(keys):
+            slot = self.slots.get(key)
+            if slot is None:
+                slot = self.slots[key] = self.used[0]
+                self.used[0] += 1
+                self.grown = True
+                self._newkey(key)
+            out[i] = slot
+        return [out]
+
+class _AccumulatorCategoryAxis(_AccumulatorKeyedAxis):
+    __slots__ = ("categories", "overflow")
+
+    def __init__(self, binning):
+        self.categories = list(binning.categories)
+        self.overflow = (binning.loc_overflow != binning.nonexistent)
+        super(_AccumulatorCategoryAxis, self).__init__(binning)
+
+    def _keys(self, binning):
+        categories = list(binning.categories)
+        return [categories[i] if i >= 0 else None for i in binning._selfmap([(binning.loc_overflow, -1)], numpy.arange(len(categories), dtype=numpy.int64)).tolist()]
+
+    def _newkey(self, key):
+        if key is not None:
+            self.categories.append(key)
+
+    def accepts(self, binning):
+        return isinstance(binning, CategoryBinning)
+
+    def add(self, binning):
+        self.overflow = self.overflow or (binning.loc_overflow != binning.nonexistent)
+        return self._assign(binning)
+
+    def layout(self):
+        if not self.grown:
+            return self.binning, [numpy.arange(self.used[0], dtype=numpy.int64)]
+        order = [self.slots[x] for x in self.categories]
+        if self.overflow:
+            order.append(self.slots[None])
+        return CategoryBinning(self.categories, loc_overflow=(CategoryBinning.above1 if self.overflow else CategoryBinning.nonexistent)), [numpy.array(order, dtype=numpy.int64)]
+
+class _AccumulatorSparseAxis(_AccumulatorKeyedAxis):
+    __slots__ = ("bins", "overflow", "minbin", "maxbin")
+
+    _flownames = {-1: "underflow", -2: "overflow", -3: "nanflow"}
+
+    def __init__(self, binning):
+        self.bins = [int(x) for x in binning.bins]
+        self.overflow = binning.overflow
+        self.minbin = binning.minbin
+        self.maxbin = binning.maxbin
+        super(_AccumulatorSparseAxis, self).__init__(binning)
+
+    def _keys(self, binning):
+        bins = [int(x) for x in binning.bins]
+        flows = [] if binning.overflow is None else [(binning.overflow.loc_underflow, -1), (binning.overflow.loc_overflow, -2), (binning.overflow.loc_nanflow, -3)]
+        return [bins[i] if i >= 0 else self._flownames[i] for i in binning._selfmap(flows, numpy.arange(len(bins), dtype=numpy.int64)).tolist()]
+
+    def _newkey(self, key):
+        if not isinstance(key, str):
+            self.bins.append(key)
+
+    def accepts(self, binning):
+        if not isinstance(binning, SparseRegularBinning) or binning.bin_width != self.binning.bin_width or binning.low_inclusive != self.binning.low_inclusive or binning.high_inclusive != self.binning.high_inclusive:
+            return False
+        return binning.origin == self.binning.origin or binning.originto(self.binning.origin).origin == self.binning.origin
+
+    def add(self, binning):
+        if binning.origin != self.binning.origin:
+            binning = binning.originto(self.binning.origin)
+        self.overflow = RealOverflow._common(self.overflow, binning.overflow, 0)[0]
+        self.minbin = max(self.minbin, binning.minbin)
+        self.maxbin = min(self.maxbin, binning.maxbin)
+        return self._assign(binning)
+
+    def layout(self):
+        if not self.grown and self.overflow == self.binning.overflow and self.minbin == self.binning.minbin and self.maxbin == self.binning.maxbin:
+            return self.binning, [numpy.arange(self.used[0], dtype=numpy.int64)]
+        overflow, pos_underflow, pos_overflow, pos_nanflow = RealOverflow._common(self.overflow, None, len(self.bins))
+        order = [self.slots[x] for x in self.bins]
+        for name, pos in (("underflow", pos_underflow), ("overflow", pos_overflow), ("nanflow", pos_nanflow)):
+            if pos is not None:
+                order.append(self.slots[name])
+        binning = SparseRegularBinning(self.bins, self.binning.bin_width, self.binning.origin, overflow=overflow, low_inclusive=self.binning.low_inclusive, high_inclusive=self.binning.high_inclusive, minbin=self.minbin, maxbin=self.maxbin)
+        return binning, [numpy.array(order, dtype=numpy.int64)]
+
+class _Accumulator(object):
+    # counts with spare capacity in every dimension, so that bins brought in by += are amortized O(1) copies each
+    __slots__ = ("outer", "axes", "statistics", "arrays", "changed")
+
+    def __init__(self, outer, binnings, statistics, arrays):
+        self.outer = [_AccumulatorAxis(None, x._binshape()) for x in outer]
+        self.axes = []
+        for binning in binnings:
+            if isinstance(binning, CategoryBinning):
+                self.axes.append(_AccumulatorCategoryAxis(binning))
+            elif isinstance(binning, SparseRegularBinning):
+                self.axes.append(_AccumulatorSparseAxis(binning))
+            else:
+                self.axes.append(_AccumulatorAxis(binning, binning._binshape()))
+        self.statistics = statistics
+        self.arrays = collections.OrderedDict((n, numpy.array(x, dtype=x.dtype.newbyteorder("="), order="C")) for n, x in arrays.items())
+        self.changed = False
+
+    def reserve(self):
+        capacity = next(iter(self.arrays.values())).shape
+        used = sum((x.used for x in self.outer + self.axes), [])
+        if any(u > c for u, c in zip(used, capacity)):
+            newcapacity = tuple(max(u, 2*c) if u > c else c for u, c in zip(used, capacity))
+            for n, x in self.arrays.items():
+                array = numpy.zeros(newcapacity, dtype=x.dtype)
+                array[tuple(slice(0, c) for c in capacity)] = x
+                self.arrays[n] = array
+
+    @staticmethod
+    def _index(slots):
+        index = []
+        for x in slots:
+            if len(x) == 0 or (x[0] == 0 and x[-1] == len(x) - 1 and (x == numpy.arange(len(x))).all()):
+                index.append(slice(0, len(x)))
+            else:
+                index.append(x)
+        if sum(isinstance(x, numpy.ndarray) for x in index) <= 1:
+            return tuple(index)
+        else:
+            return numpy.ix_(*[numpy.arange(x.start, x.stop, dtype=numpy.int64) if isinstance(x, slice) else x for x in index])
+
+    def add(self, arrays, slots):
+        if "counts" in self.arrays and "counts" not in arrays:
+            counts = self.arrays.pop("counts")
+            self.arrays["sumw"] = counts
+            self.arrays["unweighted"] = counts.copy()
+        elif "counts" in arrays and "counts" not in self.arrays:
+            arrays = {"sumw": arrays["counts"], "unweighted": arrays["counts"]}
+        for n in list(self.arrays):
+            if n not in arrays:
+                del self.arrays[n]
+
+        self.reserve()
+        index = self._index(slots)
+        for n, x in self.arrays.items():
+            dtype = numpy.result_type(x.dtype, arrays[n].dtype)
+            if dtype != x.dtype:
+                x = self.arrays[n] = x.astype(dtype)
+            _scatter(x, index, False, arrays[n], numpy.add)
+        self.changed = True
+
+    def layout(self):
+        binnings = []
+        order = sum((x.physical for x in self.outer), [])
+        for axis in self.axes:
+            binning, physical = axis.layout()
+            binnings.append(binning)
+            order.extend(physical)
+
+        index = self._index(order)
+        buffers = dict((n, InterpretedInlineBuffer.fromarray(numpy.ascontiguousarray(x[index]).reshape(-1))) for n, x in self.arrays.items())
+        if "counts" in buffers:
+            counts = UnweightedCounts(buffers["counts"])
+        else:
+            counts = WeightedCounts(buffers["sumw"], sumw2=buffers.get("sumw2"), unweighted=(UnweightedCounts(buffers["unweighted"]) if "unweighted" in buffers else None))
+        return binnings, counts
+
+_fillchunksize = 1048576
+
+def _fillmask(filter, x):
+    if filter is None:
+        return None
+    with numpy.errstate(invalid="ignore"):
+        mask = (x >= filter.min) & (x <= filter.max) & numpy.isfinite(x)
+    if not filter.excludes_minf:
+        mask |= (x == -numpy.inf)
+    if not filter.excludes_pinf:
+        mask |= (x == numpy.inf)
+    if not filter.excludes_nan:
+        mask |= numpy.isnan(x)
+    return mask
+
+def _fillterm(x, weight, moments):
+    term = numpy.power(x, moments.n)
+    if moments.weightpower != 0 and weight is not None:
+        term = term * numpy.power(weight, moments.weightpower)
+    return term
+
+def _fillcounts(chunk, power):
+    return chunk.bincount(power)
+
+def _fillaxismoments(chunk, dimension, moments):
+    x = numpy.asarray(chunk.values[dimension], dtype=numpy.float64)
+    term = _fillterm(x, chunk.weight, moments)
+    mask = _fillmask(moments.filter, x)
+    return numpy.array([term.sum() if mask is None else term[mask].sum()])
+
+def _fillaxisextremes(chunk, dimension, extremes, op):
+    x = numpy.asarray(chunk.values[dimension], dtype=numpy.float64)
+    mask = _fillmask(extremes.filter, x)
+    if mask is not None:
+        x = x[mask]
+    return numpy.array([op.reduce(x, initial=(numpy.inf if op is numpy.minimum else -numpy.inf))])
+
+def _fillprofilemoments(chunk, column, moments):
+    y = numpy.asarray(chunk.binnedcolumn(column), dtype=numpy.float64)
+    term = _fillterm(y, chunk.binnedweight, moments)
+    index = chunk.binned
+    mask = _fillmask(moments.filter, y)
+    if mask is not None:
+        term, index = term[mask], index[mask]
+    return numpy.bincount(index, weights=term, minlength=chunk.numbins)
+
+def _fillprofileextremes(chunk, column, extremes, op):
+    y = numpy.asarray(chunk.binnedcolumn(column), dtype=numpy.float64)
+    index = chunk.binned
+    mask = _fillmask(extremes.filter, y)
+    if mask is not None:
+        y, index = y[mask], index[mask]
+    out = numpy.full(chunk.numbins, numpy.inf if op is numpy.minimum else -numpy.inf)
+    op.at(out, index, y)
+    return out
+
+def _fillbuffer(buffer, partial, op, shape):
+    if buffer.dimension_order == InterpretedBuffer.fortran_order:
+        partial = partial.reshape(shape).reshape(-1, order="F")
+    partial = partial.astype(buffer.numpy_dtype, casting="same_kind", copy=False)
+    return buffer._add(InterpretedInlineBuffer.fromarray(partial), False, op=op)
+
+class _FillChunk(object):
+    # one slice of the input columns with its flat bin indexes; partial sums are computed from this, never per entry
+    __slots__ = ("start", "stop", "values", "weight", "inbins", "binned", "binnedweight", "numbins", "_bincounts")
+
+    def __init__(self, histogram, values, weight, start, stop, numbins):
+        self.start, self.stop = start, stop
+        self.values = [x[start:stop] for x in values]
+        self.weight = None if weight is None else weight[start:stop]
+        self.numbins = numbins
+        self._bincounts = {}
+
+        index = histogram.bin_index(*self.values)
+        if index.shape != (stop - start,):
+            index = numpy.full(stop - start, index, dtype=numpy.int64)
+        inbins = index >= 0
+        if inbins.all():
+            self.inbins, self.binned, self.binnedweight = None, index, self.weight
+        else:
+            self.inbins, self.binned = inbins, index[inbins]
+            self.binnedweight = None if weight is None else self.weight[inbins]
+
+    def binnedcolumn(self, column):
+        column = column[self.start:self.stop]
+        if self.inbins is None:
+            return column
+        else:
+            return column[self.inbins]
+
+    def bincount(self, power):
+        if self.binnedweight is None:
+            power = 0
+        if power not in self._bincounts:
+            if power == 0:
+                self._bincounts[power] = numpy.bincount(self.binned, minlength=self.numbins)
+            elif power == 1:
+                self._bincounts[power] = numpy.bincount(self.binned, weights=self.binnedweight, minlength=self.numbins)
+            else:
+                self._bincounts[power] = numpy.bincount(self.binned, weights=numpy.power(self.binnedweight, power), minlength=self.numbins)
+        return self._bincounts[power]
+
+def _fillpartial(plans, work, weight, length, chunksize):
+    out = [None]*len(plans)
+    for i, start in work:
+        values, numbins, fills = plans[i]
+        # histograms in one plan have identical axes, so they share the bin indexes (and plain counts) of each chunk
+        chunk = _FillChunk(fills[0][0], values, weight, start, min(start + chunksize, length), numbins)
+        partials = [[function(chunk, *args) for node, name, op, shape, function, args in targets] for histogram, targets in fills]
+        if out[i] is None:
+            out[i] = partials
+        else:
+            out[i] = [[op(total, partial) for total, partial, (node, name, op, shape, function, args) in zip(totals, histpartials, targets)] for totals, histpartials, (histogram, targets) in zip(out[i], partials, fills)]
+    return out
+
+def _fill(groups, weight, threads, chunksize):
+    if chunksize is None:
+        chunksize = _fillchunksize
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    if len(groups) == 0:
+        return
+
+    groups = [([numpy.asarray(x).reshape(-1) for x in values], [(histogram, [numpy.asarray(x).reshape(-1) for x in profiles]) for histogram, profiles in members]) for values, members in groups]
+    lengths = set(len(x) for values, members in groups for x in values + [y for histogram, profiles in members for y in profiles])
+    if weight is not None:
+        weight = numpy.asarray(weight)
+        if len(weight.shape) != 0:
+            weight = weight.reshape(-1)
+            lengths.add(len(weight))
+    if len(lengths) != 1:
+        raise ValueError("fill columns must all have the same length, not {0}".format(sorted(lengths)))
+    length = lengths.pop()
+    if weight is not None and len(weight.shape) == 0:
+        weight = numpy.broadcast_to(weight, (length,))
+
+    accumulating = []
+    plans = []
+    for values, members in groups:
+        fills = []
+        for histogram, profiles in members:
+            if getattr(histogram, "_accumulator", None) is not None:
+                accumulating.append(histogram)
+                histogram.finalize()
+            axes = histogram.allaxis
+            binshape = sum((x._binshape() for x in axes), ())
+            offset = sum(x.binning.dimensions for x in axes[:len(axes) - len(histogram.axis)] if x.binning is not None)
+            targets = histogram._filltargets(binshape, offset, weight is not None, profiles)
+            if histogram._fillsparse(values, binshape, targets):
+                binshape = sum((x._binshape() for x in axes), ())
+                targets = histogram._filltargets(binshape, offset, weight is not None, profiles)
+            fills.append((histogram, targets))
+        plans.append((values, functools.reduce(operator.mul, binshape, 1), fills))
+
+    work = [(i, start) for i in range(len(plans)) for start in range(0, max(length, 1), chunksize)]
+    if threads is None or threads <= 1 or len(work) <= 1:
+        partials = [_fillpartial(plans, work, weight, length, chunksize)]
+    else:
+        # each thread sums its share of the chunks into its own partial arrays; numpy releases the GIL in the heavy kernels
+        import concurrent.futures
+        numslices = min(threads, len(work))
+        slices = [work[i*len(work) // numslices : (i + 1)*len(work) // numslices] for i in range(numslices)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+            partials = list(pool.map(lambda x: _fillpartial(plans, x, weight, length, chunksize), slices))
+
+    # nothing is written until every chunk has been binned, so a bad column leaves the histograms untouched
+    for partial in partials:
+        for (values, numbins, fills), totals in zip(plans, partial):
+            if totals is not None:
+                for (histogram, targets), histtotals in zip(fills, totals):
+                    for total, (node, name, op, shape, function, args) in zip(histtotals, targets):
+                        buffer = getattr(node, name)
+                        out = _fillbuffer(buffer, total, op, shape)
+                        if out is buffer:
+                            _invalidate(buffer)
+                        else:
+                            setattr(node, name, out)
+
+    for histogram in accumulating:
+        histogram.accumulate()
+
 class Histogram(Object):
     _params = {
         "axis":                aghast.checktype.CheckVector("Histogram", "axis", required=True, type=Axis, minlen=1),
@@ -5676,8 +7546,10 @@ class Histogram(Object):
         "script":              aghast.checktype.CheckString("Histogram", "script", required=False),
         }
 
-    axis                = typedproperty(_params["axis"])
-    counts              = typedproperty(_params["counts"])
+    __slots__ = ("_accumulator",)
+
+    _axis_property      = typedproperty(_params["axis"])
+    _counts_property    = typedproperty(_params["counts"])
     profile             = typedproperty(_params["profile"])
     axis_covariances    = typedproperty(_params["axis_covariances"])
     profile_covariances = typedproperty(_params["profile_covariances"])
@@ -5737,6 +7609,58 @@ The *title*, *metadata*, *decoration*, and *script* properties have no semantic
             _valid(self.metadata, seen, recursive)
             _valid(self.decoration, seen, recursive)
 
+    @property
+    def axis(self):
+        if getattr(self, "_accumulator", None) is not None:
+            self.finalize()
+        return self._axis_property
+
+    @axis.setter
+    def axis(self, value):
+        if getattr(self, "_accumulator", None) is not None:
+            self.finalize()
+        self._axis_property = value
+
+    @property
+    def counts(self):
+        if getattr(self, "_accumulator", None) is not None:
+            self.finalize()
+        return self._counts_property
+
+    @counts.setter
+    def counts(self, value):
+        if getattr(self, "_accumulator", None) is not None:
+            self.finalize()
+        self._counts_property = value
+
+    def accumulate(self):
+        if getattr(self, "_accumulator", None) is None:
+            binnings = [x.binning for x in self.axis]
+            outer = []
+            node = self
+            while hasattr(node, "_parent"):
+                node = node._parent
+                outer = [x.binning for x in node.axis] + outer
+            shape = sum((x._binshape() for x in outer + binnings), ())
+            self._accumulator = _Accumulator(outer, binnings, [list(x.statistics) for x in self.axis], _countsarrays(self.counts, shape))
+        return self
+
+    def finalize(self):
+        accumulator = getattr(self, "_accumulator", None)
+        if accumulator is not None:
+            self._accumulator = None
+            if accumulator.changed:
+                binnings, self.counts = accumulator.layout()
+                for axis, binning, statistics in zip(self.axis, binnings, accumulator.statistics):
+                    if axis.binning is not binning:
+                        axis.binning = binning
+                    axis.statistics = statistics
+        return self
+
+    def _detached(self, top, exceptions=()):
+        self.finalize()
+        return super(Histogram, self)._detached(top, exceptions=exceptions)
+
     def _shape(self, path, shape):
         shape = ()
         if len(path) > 0 and isinstance(path[0], (Counts, Profile, Function)):
@@ -5889,6 +7813,25 @@ The *title*, *metadata*, *decoration*, and *script* properties have no semantic
 
         return where
 
+    def bin_index(self, *values):
+        binnings = tuple(x.binning for x in self.axis)
+        node = self
+        while hasattr(node, "_parent"):
+            node = node._parent
+            binnings = tuple(x.binning for x in node.axis) + binnings
+        binnings = tuple(x for x in binnings if x is not None)
+        if len(values) != sum(x.dimensions for x in binnings):
+            raise TypeError("bin_index needs one array of values for each dimension of the binnings, from the outermost Collection axis in, not {0}".format(len(values)))
+
+        out, missing = 0, False
+        i = 0
+        for binning in binnings:
+            index = binning.bin_index(*values[i : i + binning.dimensions])
+            out = out*functools.reduce(operator.mul, binning._binshape(), 1) + index
+            missing = missing | (index < 0)
+            i += binning.dimensions
+        return numpy.where(missing, -1, out)
+
     def _getloc(self, isiloc, where, binnings):
         binnings = binnings + tuple(x.binning for x in self.axis)
         oldshape = sum((x._binshape() for x in binnings), ())
@@ -5915,26 +7858,28 @@ The *title*, *metadata*, *decoration*, and *script* properties have no semantic
         return out
 
     def _add(self, other, pairs, triples, noclobber):
+        if not noclobber and getattr(self, "_accumulator", None) is not None:
+            return self._accumulate(other, pairs, triples)
+
         if not isinstance(other, Histogram):
             raise ValueError("cannot add {0} and {1}".format(self, other))
         if len(self.axis) != len(other.axis):
             raise ValueError("cannot add {0}-dimensional Histogram and {1}-dimensional Histogram".format(len(self.axis), len(other.axis)))
 
-        tmppairs = tuple(Binning._promote(one.binning, two.binning) for one, two in zip(self.axis, other.axis))
-        pairs = pairs + tmppairs
-        triples = triples + tuple(one._restructure(two) for one, two in tmppairs)
+        plans = [Binning._plan(one.binning, two.binning) for one, two in zip(self.axis, other.axis)]
+        pairs = pairs + tuple(pair for pair, triple in plans)
+        triples = triples + tuple(triple for pair, triple in plans)
 
         selfcounts, othercounts = Counts._promote(self.counts, other.counts)
 
-        if not all(isinstance(sm, tuple) and sm[0] is None for binning, sm, om in triples):
-            newshape = sum((binning._binshape() for binning, sm, om in triples), ())
-            selfcounts = selfcounts._remap(newshape, sum((sm for binning, sm, om in triples), ()))
-
-        if not all(isinstance(om, tuple) and om[0] is None for binning, sm, om in triples):
+        selfmap = sum((sm for binning, sm, om in triples), ())
+        othermap = sum((om for binning, sm, om in triples), ())
+        if all(sm is None for sm in selfmap) and all(om is None for om in othermap):
+            selfcounts._add(othercounts, noclobber)
+        else:
+            # scatter both into the new shape in one pass, without a full-size temporary per axis
             newshape = sum((binning._binshape() for binning, sm, om in triples), ())
-            othercounts = othercounts._remap(newshape, sum((om for binning, sm, om in triples), ()))
-
-        selfcounts._add(othercounts, noclobber)
+            selfcounts._remapadd(othercounts, newshape, selfmap, othermap, noclobber)
 
         for selfaxis, otheraxis, (binning, sm, om) in zip(self.axis, other.axis, triples[-len(self.axis):]):
             selfaxis.binning = binning
@@ -5955,9 +7900,149 @@ The *title*, *metadata*, *decoration*, and *script* properties have no semantic
         if len(self.functions) != 0:
             raise NotImplementedError
 
+    def _accumulate(self, other, pairs, triples):
+        accumulator = self._accumulator
+        _invalidate(self)
+        if not isinstance(other, Histogram):
+            raise ValueError("cannot add {0} and {1}".format(self, other))
+        if len(accumulator.axes) != len(other.axis):
+            raise ValueError("cannot add {0}-dimensional Histogram and {1}-dimensional Histogram".format(len(accumulator.axes), len(other.axis)))
+        for n in ("profile", "axis_covariances", "profile_covariances", "functions"):
+            if len(getattr(self, n)) != 0 or len(getattr(other, n)) != 0:
+                raise NotImplementedError("accumulating Histograms with {0} is not supported".format(n))
+
+        if not all(axis.accepts(x.binning) for axis, x in zip(accumulator.axes, other.axis)):
+            # a binning that has to be promoted to another type: add normally and start accumulating again
+            self.finalize()
+            self._add(other, pairs, triples, False)
+            return self.accumulate()
+
+        slots = []
+        for axis, (binning, sm, om) in zip(accumulator.outer, triples):
+            slots.extend(axis.remap(sm, om, binning._binshape()))
+        for axis, x in zip(accumulator.axes, other.axis):
+            slots.extend(axis.add(x.binning))
+
+        accumulator.add(_countsarrays(other.counts, tuple(len(x) for x in slots)), slots)
+        accumulator.statistics = [[x._add(y, False) for x, y in zip(statistics, axis.statistics)] for statistics, axis in zip(accumulator.statistics, other.axis)]
+        return self
+
+    def fill(self, *values, **columns):
+        weight = columns.pop("weight", None)
+        threads = columns.pop("threads", None)
+        chunksize = columns.pop("chunksize", None)
+
+        used = set()
+        if len(values) == 0:
+            values = self._fillvalues(columns, used)
+        profiles = self._fillprofiles(columns, used)
+        unexpected = set(columns) - used
+        if len(unexpected) != 0:
+            raise TypeError("fill got columns that are not axis or profile expressions: {0}".format(", ".join(sorted(unexpected))))
+
+        _fill([(values, [(self, profiles)])], weight, threads, chunksize)
+        return self
+
+    def _fillvalues(self, columns, used):
+        values = []
+        for axis in self.allaxis:
+            if axis.binning is not None:
+                if axis.expression not in columns:
+                    raise ValueError("no column for axis expression {0}; pass one array per dimension positionally or name the columns by expression".format(repr(axis.expression)))
+                used.add(axis.expression)
+                column = columns[axis.expression]
+                values.extend(column if axis.binning.dimensions > 1 else [column])
+        return values
+
+    def _fillprofiles(self, columns, used):
+        profiles = []
+        for profile in self.profile:
+            if profile.expression not in columns:
+                raise ValueError("no column for profile expression {0}".format(repr(profile.expression)))
+            used.add(profile.expression)
+            profiles.append(columns[profile.expression])
+        return profiles
+
+    def _fillsparse(self, values, binshape, targets):
+        # in-range values of a SparseRegularBinning may fall into bins it doesn't list yet: append them, grow the buffers
+        axes = self.allaxis
+        outer = len(axes) - len(self.axis)
+        grown = False
+        i, dimension = 0, 0
+        for j, axis in enumerate(axes):
+            if isinstance(axis.binning, SparseRegularBinning):
+                missing = axis.binning._missingbins(values[i])
+                if len(missing) != 0:
+                    if j < outer:
+                        raise ValueError("cannot fill new bins {0} into a SparseRegularBinning of an enclosing Collection; add them to the Collection's axis first".format(missing.tolist()))
+                    position = axis.binning._numbelow() + len(axis.binning.bins)
+                    for node, name, op, shape, function, args in targets:
+                        if shape == binshape:
+                            buffer = getattr(node, name)
+                            fillvalue = numpy.inf if op is numpy.minimum else -numpy.inf if op is numpy.maximum else 0
+                            array = numpy.insert(buffer.array, numpy.full(len(missing), position), fillvalue, axis=dimension)
+                            setattr(node, name, InterpretedInlineBuffer.fromarray(array.reshape(-1)))
+                    axis.binning.bins = numpy.concatenate((numpy.asarray(axis.binning.bins, dtype=numpy.int64), missing))
+                    binshape = binshape[:dimension] + axis.binning._binshape() + binshape[dimension + 1:]
+                    grown = True
+            if axis.binning is not None:
+                i += axis.binning.dimensions
+            dimension += len(axis._binshape())
+        return grown
+
+    def _filltargets(self, binshape, offset, weighted, profiles):
+        if len(self.axis_covariances) != 0 or len(self.profile_covariances) != 0 or len(self.functions) != 0:
+            raise NotImplementedError("fill cannot update axis_covariances, profile_covariances, or functions")
+        for statistics in [x for axis in self.axis for x in axis.statistics] + [x.statistics for x in self.profile]:
+            if len(statistics.quantiles) != 0 or statistics.mode is not None:
+                raise NotImplementedError("fill cannot update Quantiles or Modes")
+
+        if weighted and isinstance(self.counts, UnweightedCounts):
+            # weighted entries into unweighted counts: what was filled so far had unit weights
+            counts = self.counts.counts
+            sumw = counts.flatarray.astype(numpy.dtype(numpy.float64).newbyteorder("<"))
+            self.counts = WeightedCounts(InterpretedInlineBuffer(sumw.view(numpy.uint8), dtype=InterpretedBuffer.float64, dimension_order=counts.dimension_order),
+                                         sumw2=InterpretedInlineBuffer(sumw.copy().view(numpy.uint8), dtype=InterpretedBuffer.float64, dimension_order=counts.dimension_order),
+                                         unweighted=self.counts.detached())
+
+        targets = []
+        if isinstance(self.counts, UnweightedCounts):
+            targets.append((self.counts, "counts", numpy.add, binshape, _fillcounts, (0,)))
+        else:
+            targets.append((self.counts, "sumw", numpy.add, binshape, _fillcounts, (1,)))
+            if self.counts.sumw2 is not None:
+                targets.append((self.counts, "sumw2", numpy.add, binshape, _fillcounts, (2,)))
+            if self.counts.unweighted is not None:
+                targets.append((self.counts.unweighted, "counts", numpy.add, binshape, _fillcounts, (0,)))
+
+        for axis in self.axis:
+            if axis.binning is None:
+                continue
+            for dimension, statistics in enumerate(axis.statistics):
+                for moments in statistics.moments:
+                    targets.append((moments, "sumwxn", numpy.add, (1,), _fillaxismoments, (offset + dimension, moments)))
+                if statistics.min is not None:
+                    targets.append((statistics.min, "values", numpy.minimum, (1,), _fillaxisextremes, (offset + dimension, statistics.min, numpy.minimum)))
+                if statistics.max is not None:
+                    targets.append((statistics.max, "values", numpy.maximum, (1,), _fillaxisextremes, (offset + dimension, statistics.max, numpy.maximum)))
+            offset += axis.binning.dimensions
+
+        for profile, column in zip(self.profile, profiles):
+            statistics = profile.statistics
+            for moments in statistics.moments:
+                targets.append((moments, "sumwxn", numpy.add, binshape, _fillprofilemoments, (column, moments)))
+            if statistics.min is not None:
+                targets.append((statistics.min, "values", numpy.minimum, binshape, _fillprofileextremes, (column, statistics.min, numpy.minimum)))
+            if statistics.max is not None:
+                targets.append((statistics.max, "values", numpy.maximum, binshape, _fillprofileextremes, (column, statistics.max, numpy.maximum)))
+
+        return targets
+
 ################################################# Page
 
 class Page(Ghast):
+    __slots__ = ("_unfiltered_cache",)
+
     _params = {
         "buffer": aghast.checktype.CheckClass("Page", "buffer", required=True, type=RawBuffer),
         }
@@ -5999,7 +8084,7 @@ A <<Page>> contains one raw *buffer*, which may be inline or external.
         column = self.column
 
         if len(column.filters) != 0:
-            raise NotImplementedError("handle column.filters")
+            array = _unfiltered(self, (self.buffer, column.filters), array, column.filters)
 
         if column.postfilter_slice is not None:
             start = column.postfilter_slice.start if column.postfilter_slice.has_start else None
@@ -6147,11 +8232,7 @@ Additionally, pages may have a "`zone map`" of minimum and maximum values in eac
             builder.PrependUOffsetTRelative(x)
         pages = builder.EndVector(len(pages))
 
-        pageoffsetsbuf = self.page_offsets.tostring()
-        aghast.aghast_generated.ColumnChunk.ColumnChunkStartPageOffsetsVector(builder, len(self.page_offsets))
-        builder.head = builder.head - len(pageoffsetsbuf)
-        builder.Bytes[builder.head : builder.head + len(pageoffsetsbuf)] = pageoffsetsbuf
-        page_offsets = builder.EndVector(len(self.page_offsets))
+        page_offsets = _vectorfromarray(builder, aghast.aghast_generated.ColumnChunk.ColumnChunkStartPageOffsetsVector, self.page_offsets)
 
         if page_min is not None:
             aghast.aghast_generated.ColumnChunk.ColumnChunkStartPageMinVector(builder, len(page_min))
@@ -6338,7 +8419,7 @@ The *title*, *metadata*, and *decoration* properties have no semantic constraint
         if self.endianness != InterpretedBuffer.little_endian:
             aghast.aghast_generated.Column.ColumnAddEndianness(builder, self.endianness.value)
         if filters is not None:
-            aghast.aghast_generated.Column.ColumnAddFilters(builder, self.filters)
+            aghast.aghast_generated.Column.ColumnAddFilters(builder, filters)
         if self.postfilter_slice is not None:
             aghast.aghast_generated.Column.ColumnAddPostfilterSlice(builder, aghast.aghast_generated.Slice.CreateSlice(builder, self.postfilter_slice.start, self.postfilter_slice.stop, self.postfilter_slice.step, self.postfilter_slice.hasStart, self.postfilter_slice.hasStop, self.postfilter_slice.hasStep))
         if title is not None:
@@ -6457,11 +8538,7 @@ Optionally, the entry ranges for each chunk can be expressed in a *chunk_offsets
         if len(self.chunk_offsets) == 0:
             chunk_offsets = None
         else:
-            chunkoffsetsbuf = self.chunk_offsets.tostring()
-            aghast.aghast_generated.NtupleInstance.NtupleInstanceStartChunkOffsetsVector(builder, len(self.chunk_offsets))
-            builder.head = builder.head - len(chunkoffsetsbuf)
-            builder.Bytes[builder.head : builder.head + len(chunkoffsetsbuf)] = chunkoffsetsbuf
-            chunk_offsets = builder.EndVector(len(self.chunk_offsets))
+            chunk_offsets = _vectorfromarray(builder, aghast.aghast_generated.NtupleInstance.NtupleInstanceStartChunkOffsetsVector, self.chunk_offsets)
 
         aghast.aghast_generated.NtupleInstance.NtupleInstanceStart(builder)
         aghast.aghast_generated.NtupleInstance.NtupleInstanceAddChunks(builder, chunks)
@@ -6806,6 +8883,47 @@ The *title*, *metadata*, *decoration*, and *script* properties have no semantic
             args.append("script={0}".format(_dumpstring(self.script)))
         return _dumpline(self, args, indent, width, end)
 
+    def accumulate(self):
+        for x in self.objects.values():
+            x.accumulate()
+        return self
+
+    def finalize(self):
+        for x in self.objects.values():
+            x.finalize()
+        return self
+
+    def fill(self, **columns):
+        weight = columns.pop("weight", None)
+        threads = columns.pop("threads", None)
+        chunksize = columns.pop("chunksize", None)
+
+        # histograms binned by the same axis expressions and binnings compute their bin indexes once
+        groups = collections.OrderedDict()
+        used = set()
+        for histogram in self._fillhistograms():
+            values = histogram._fillvalues(columns, used)
+            profiles = histogram._fillprofiles(columns, used)
+            key = tuple((x.expression, None if x.binning is None else x.binning.fingerprint()) for x in histogram.allaxis)
+            if key not in groups:
+                groups[key] = (values, [])
+            groups[key][1].append((histogram, profiles))
+
+        unexpected = set(columns) - used
+        if len(unexpected) != 0:
+            raise TypeError("fill got columns that are not axis or profile expressions: {0}".format(", ".join(sorted(unexpected))))
+
+        _fill(list(groups.values()), weight, threads, chunksize)
+        return self
+
+    def _fillhistograms(self):
+        for x in self.objects.values():
+            if isinstance(x, Histogram):
+                yield x
+            elif isinstance(x, Collection):
+                for y in x._fillhistograms():
+                    yield y
+
     @staticmethod
     def _pairs_triples(one, two):
         oneaxis = [] if one is None else list(one.axis)
@@ -6818,9 +8936,9 @@ The *title*, *metadata*, *decoration*, and *script* properties have no semantic
 
         pairs, triples = Collection._pairs_triples(getattr(one, "_parent", None), getattr(two, "_parent", None))
 
-        tmppairs = tuple(Binning._promote(one.binning, two.binning) for one, two in zip(oneaxis, twoaxis))
-        pairs = pairs + tmppairs
-        triples = triples + tuple(one._restructure(two) for one, two in tmppairs)
+        plans = [Binning._plan(one.binning, two.binning) for one, two in zip(oneaxis, twoaxis)]
+        pairs = pairs + tuple(pair for pair, triple in plans)
+        triples = triples + tuple(triple for pair, triple in plans)
 
         return pairs, triples
 
@@ -6830,9 +8948,9 @@ The *title*, *metadata*, *decoration*, and *script* properties have no semantic
         if len(self.axis) != len(other.axis):
             raise ValueError("cannot add {0}-dimensional Collection and {1}-dimensional Collection".format(len(self.axis), len(other.axis)))
 
-        tmppairs = tuple(Binning._promote(one.binning, two.binning) for one, two in zip(self.axis, other.axis))
-        pairs = pairs + tmppairs
-        triples = triples + tuple(one._restructure(two) for one, two in tmppairs)
+        plans = [Binning._plan(one.binning, two.binning) for one, two in zip(self.axis, other.axis)]
+        pairs = pairs + tuple(pair for pair, triple in plans)
+        triples = triples + tuple(triple for pair, triple in plans)
 
         if set(self.objects) != set(other.objects):
             newobjects = collections.OrderedDict()
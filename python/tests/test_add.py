@@ -1077,3 +1077,179 @@ class Test(unittest.TestCase):
         assert ab.counts.counts.buffer.tostring() == numpy.array([[100, 101, 102, 103, 104, 105, 106, 107, 108, 109, 110], [11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21]]).reshape(-1).tostring()
         assert a.objects["x"].counts.counts.array.tolist() == [[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10], [11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21]]
         assert b.objects["x"].counts.counts.array.tolist() == [[100, 100, 100, 100, 100, 100, 100, 100, 100, 100, 100]]
+
+    def test_merge_histograms(self):
+        hs = [Histogram([Axis(CategoryBinning(["one", "two"]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1, 2])))),
+              Histogram([Axis(CategoryBinning(["two", "three"]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([10, 20])))),
+              Histogram([Axis(CategoryBinning(["four"], loc_overflow=CategoryBinning.above1))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([100, 200])))),
+              Histogram([Axis(CategoryBinning(["one"]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1000]))))]
+        pairwise = hs[0] + hs[1] + hs[2] + hs[3]
+        merged = merge(hs)
+        assert merged.axis[0].binning.categories == pairwise.axis[0].binning.categories == ["one", "two", "three", "four"]
+        assert merged.axis[0].binning.loc_overflow == CategoryBinning.above1
+        assert merged.counts.counts.array.tolist() == pairwise.counts.counts.array.tolist() == [1001, 12, 20, 100, 200]
+        assert hs[0].counts.counts.array.tolist() == [1, 2]
+
+        hs = [Histogram([Axis(RegularBinning(4, RealInterval(0, 4))), Axis(IrregularBinning([RealInterval(0, 1), RealInterval(1, 2)]))], WeightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(8, dtype=float)), sumw2=InterpretedInlineBuffer.fromarray(numpy.arange(8, dtype=float)))),
+              Histogram([Axis(RegularBinning(2, RealInterval(0, 4))), Axis(IrregularBinning([RealInterval(1, 2), RealInterval(2, 3)]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(4)))),
+              Histogram([Axis(RegularBinning(4, RealInterval(0, 4))), Axis(IrregularBinning([RealInterval(2, 3)], overflow=RealOverflow(loc_nanflow=RealOverflow.above1)))], WeightedCounts(InterpretedInlineBuffer.fromarray(numpy.full(8, 0.5)), sumw2=InterpretedInlineBuffer.fromarray(numpy.full(8, 0.25))))]
+        pairwise = hs[0] + hs[1] + hs[2]
+        merged = merge(hs)
+        assert merged.axis[0].binning.intervals_array.tolist() == pairwise.axis[0].binning.intervals_array.tolist()
+        assert merged.axis[1].binning.intervals_array.tolist() == pairwise.axis[1].binning.intervals_array.tolist()
+        assert merged.axis[1].binning.overflow == pairwise.axis[1].binning.overflow
+        assert isinstance(merged.counts, WeightedCounts) and merged.counts.sumw2 is None and merged.counts.unweighted is None
+        assert merged.counts.sumw.array.tolist() == pairwise.counts.sumw.array.tolist()
+
+        profiled = Histogram([Axis(IntegerBinning(0, 1))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(2))), profile=[Profile("y", Statistics(moments=[Moments(InterpretedInlineBuffer.fromarray(numpy.zeros(2)), n=1)]))])
+        try:
+            merge([profiled, profiled.detached()])
+        except NotImplementedError as err:
+            assert "profile" in str(err)
+        else:
+            assert False
+
+    def test_merge_collections(self):
+        cs = [Collection({"x": Histogram([Axis(IntegerBinning(0, 2))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(6))))}, axis=[Axis(CategoryBinning(["one", "two"]))]),
+              Collection({"x": Histogram([Axis(IntegerBinning(1, 3))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.full(3, 100))))}, axis=[Axis(CategoryBinning(["two"]))]),
+              Collection({"x": Histogram([Axis(IntegerBinning(0, 2))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.full(3, 1000)))),
+                          "y": Histogram([Axis(IntegerBinning(0, 1))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([5, 6]))))}, axis=[Axis(CategoryBinning(["three"]))])]
+        merged = merge(cs)
+        assert list(merged.objects) == ["x", "y"]
+        assert merged.axis[0].binning.categories == ["one", "two", "three"]
+        assert merged.objects["x"].axis[0].binning.toCategoryBinning().categories == ["0", "1", "2", "3"]
+        assert merged.objects["x"].counts.counts.array.tolist() == [[0, 1, 2, 0], [3, 104, 105, 100], [1000, 1000, 1000, 0]]
+        assert merged.objects["y"].counts.counts.array.tolist() == [[0, 0], [0, 0], [5, 6]]
+        assert merged.objects["x"]._parent is merged
+        assert cs[0].objects["x"].counts.counts.array.tolist() == [[0, 1, 2], [3, 4, 5]]
+
+    def test_merge_workers(self):
+        hs = [Histogram([Axis(IntegerBinning(i, i + 9))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.full(10, i)))) for i in range(20)]
+        expected = merge(hs).counts.counts.array.tolist()
+        assert sum(expected) == sum(10*i for i in range(20))
+        for workers in (2, 3, 8):
+            assert merge(hs, workers=workers).counts.counts.array.tolist() == expected
+        assert merge(hs, workers=2, processes=True).counts.counts.array.tolist() == expected
+
+    def test_add_remap_fused(self):
+        a = Histogram([Axis(CategoryBinning(["x", "y"])), Axis(CategoryBinning(["p", "q"])), Axis(IntegerBinning(0, 2))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(12))))
+        b = Histogram([Axis(CategoryBinning(["y", "z"])), Axis(CategoryBinning(["q", "r"])), Axis(IntegerBinning(0, 2))], WeightedCounts(InterpretedInlineBuffer.fromarray(numpy.full(12, 0.5)), sumw2=InterpretedInlineBuffer.fromarray(numpy.full(12, 0.25))))
+        expected = numpy.zeros((3, 3, 3))
+        expected[:2, :2] += numpy.arange(12).reshape(2, 2, 3)
+        expected[1:, 1:] += 0.5
+        ab = a + b
+        assert ab.axis[0].binning.categories == ["x", "y", "z"]
+        assert ab.axis[1].binning.categories == ["p", "q", "r"]
+        assert ab.counts.sumw.array.tolist() == expected.tolist()
+        assert ab.counts.sumw2 is None
+        assert a.counts.counts.array.tolist() == numpy.arange(12).reshape(2, 2, 3).tolist()
+        assert b.counts.sumw.array.tolist() == numpy.full((2, 2, 3), 0.5).tolist()
+
+        c = Histogram([Axis(CategoryBinning(["x", "y", "z"])), Axis(IntegerBinning(0, 2))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(9, dtype=numpy.int64))))
+        d = Histogram([Axis(CategoryBinning(["z", "x"])), Axis(IntegerBinning(1, 2))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1, 2, 3, 4]))))
+        buffer = c.counts.counts
+        c += d
+        assert c.counts.counts is buffer
+        assert c.counts.counts.array.tolist() == [[0, 3, 4], [0, 0, 0], [0, 1, 2]]
+
+    def test_add_accumulate(self):
+        def category(i):
+            return Histogram([Axis(CategoryBinning(["c{0}".format(i), "d{0}".format(i // 2)], loc_overflow=(CategoryBinning.above1 if i == 3 else CategoryBinning.nonexistent))), Axis(RegularBinning(2, RealInterval(0, 1)))],
+                             WeightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(6.0 if i == 3 else 4.0) + 10*i), sumw2=InterpretedInlineBuffer.fromarray(numpy.full(6 if i == 3 else 4, 1.0))))
+        def sparse(i):
+            overflow = RealOverflow(loc_overflow=RealOverflow.below1) if i % 3 == 0 else None
+            return Histogram([Axis(SparseRegularBinning([i, -1 - i // 2], 0.5, overflow=overflow))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(3 if i % 3 == 0 else 2) + 10*i)))
+
+        for make in category, sparse:
+            parts = [make(i) for i in range(20)]
+            pairwise = parts[0].detached()
+            for x in parts[1:]:
+                pairwise += x
+            accumulated = parts[0].detached().accumulate()
+            for x in parts[1:]:
+                accumulated += x
+            assert accumulated.axis[0].binning == pairwise.axis[0].binning
+            assert numpy.array_equal(accumulated.counts.array if isinstance(accumulated.counts, UnweightedCounts) else accumulated.counts.sumw.array,
+                                     pairwise.counts.array if isinstance(pairwise.counts, UnweightedCounts) else pairwise.counts.sumw.array)
+            assert (parts[1].counts.counts if isinstance(parts[1].counts, UnweightedCounts) else parts[1].counts.sumw).flatarray.tolist() in ([10, 11], [10.0, 11.0, 12.0, 13.0])
+
+        a = Collection({"x": Histogram([Axis(CategoryBinning(["a"]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([[1], [2]]))))}, axis=[Axis(CategoryBinning(["one", "two"]))])
+        a.accumulate()
+        for i in range(5):
+            a += Collection({"x": Histogram([Axis(CategoryBinning(["a", str(i)]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([[100, i]]))))}, axis=[Axis(CategoryBinning(["two" if i % 2 == 0 else "three"]))])
+        a.finalize()
+        assert a.axis[0].binning.categories == ["one", "two", "three"]
+        assert a.objects["x"].axis[0].binning.categories == ["a", "0", "1", "2", "3", "4"]
+        assert a.objects["x"].counts.array.tolist() == [[1, 0, 0, 0, 0, 0], [302, 0, 0, 2, 0, 4], [200, 0, 1, 0, 3, 0]]
+
+        h = Histogram([Axis(RegularBinning(2, RealInterval(0, 2)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1, 2])))).accumulate()
+        h += Histogram([Axis(RegularBinning(2, RealInterval(0, 2)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([10, 20]))))
+        h += Histogram([Axis(RegularBinning(1, RealInterval(2, 3)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([100]))))
+        assert frombuffer(h.tobuffer()).counts.array.tolist() == [11, 22, 100]
+
+        profiled = Histogram([Axis(IntegerBinning(0, 1))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(2))), profile=[Profile("y", Statistics(moments=[Moments(InterpretedInlineBuffer.fromarray(numpy.zeros(2)), n=1)]))])
+        h = profiled.detached().accumulate()
+        try:
+            h += profiled
+        except NotImplementedError as err:
+            assert "profile" in str(err)
+        else:
+            assert False
+
+    def test_add_planned(self):
+        import aghast.interface
+        aghast.interface._binningplans.clear()
+
+        def make(categories, counts):
+            return Collection({"h": Histogram([Axis(EdgesBinning([0.0, 1.0, 5.0]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array(counts))))},
+                              axis=[Axis(CategoryBinning(categories))])
+
+        a = make(["x", "y"], [1, 2, 3, 4])
+        b = make(["y", "z"], [10, 20, 30, 40])
+        ab = a + b
+        numplans = len(aghast.interface._binningplans)
+        assert numplans == 2
+
+        c = make(["x", "y"], [1, 2, 3, 4])
+        d = make(["y", "z"], [10, 20, 30, 40])
+        cd = c + d
+        assert len(aghast.interface._binningplans) == numplans
+        assert cd.axis[0].binning.categories == ab.axis[0].binning.categories == ["x", "y", "z"]
+        assert cd.axis[0].binning is not ab.axis[0].binning
+        assert cd.objects["h"].counts.counts.array.tolist() == ab.objects["h"].counts.counts.array.tolist() == [[1, 2], [13, 24], [30, 40]]
+
+        e = make(["y", "w"], [100, 200, 300, 400])
+        ce = c + e
+        assert len(aghast.interface._binningplans) == numplans + 1
+        assert ce.axis[0].binning.categories == ["x", "y", "w"]
+        assert ce.objects["h"].counts.counts.array.tolist() == [[1, 2], [103, 204], [300, 400]]
+
+        for i in range(3):
+            c += make(["x", "y"], [1, 1, 1, 1])
+        assert c.objects["h"].counts.counts.array.tolist() == [[4, 5], [6, 7]]
+
+        maxsize = aghast.interface._binningplans.maxsize
+        try:
+            aghast.interface._binningplans.maxsize = 1
+            f = make(["v"], [1, 1]) + make(["u"], [2, 2])
+            assert len(aghast.interface._binningplans) == 1
+            assert f.axis[0].binning.categories == ["v", "u"]
+        finally:
+            aghast.interface._binningplans.maxsize = maxsize
+
+        # array parameters edited in place must not reuse a plan made for their old values
+        g = Histogram([Axis(EdgesBinning([0.0, 1.0, 5.0]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1, 2]))))
+        h = Histogram([Axis(EdgesBinning([0.0, 1.0, 5.0]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([10, 20]))))
+        assert (g + h).axis[0].binning.edges.tolist() == [0.0, 1.0, 5.0]
+        h.axis[0].binning.edges[2] = 3.0
+        gh = g + h
+        assert isinstance(gh.axis[0].binning, IrregularBinning)
+        assert gh.counts.counts.array.sum() == 33
+
+        # columnar intervals are read-only; RealInterval setters invalidate the fingerprint instead
+        i = Histogram([Axis(IrregularBinning.fromarrays([0.0], [1.0]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1]))))
+        self.assertRaises(ValueError, lambda: i.axis[0].binning.intervals_array.__setitem__("high", 2.0))
+        j = i.detached()
+        assert (i + j).axis[0].binning.intervals_array.tolist() == [(0.0, 1.0, True, False)]
+        j.axis[0].binning.intervals[0].high = 2.0
+        assert (i + j).axis[0].binning.intervals_array.tolist() == [(0.0, 1.0, True, False), (0.0, 2.0, True, False)]
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2019, IRIS-HEP
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+# 
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# 
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import time
+import unittest
+
+import numpy
+
+from aghast import *
+import aghast.interface
+
+def walk(collection):
+    total = 0
+    for name, histogram in collection.objects.items():
+        binning = histogram.axis[0].binning
+        total += binning.num + binning.interval.high + len(histogram.title) + histogram.counts.counts.flatarray[3]
+    return total
+
+@unittest.skipUnless(os.environ.get("AGHAST_BENCHMARK"), "set AGHAST_BENCHMARK=1 to run the benchmarks")
+class Test(unittest.TestCase):
+    def runTest(self):
+        pass
+
+    def test_benchmark_typedproperty(self):
+        n = 2000
+        collection = Collection({"h{0}".format(i): Histogram([Axis(RegularBinning(10, RealInterval(-5, 5)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(10, dtype=numpy.int64))), title="h") for i in range(n)})
+        buffer = collection.tobuffer()
+        names = list(Histogram._params)
+
+        # accessor-table misses: choosing how to load a field happens once per class and flatbuffers type, not per object
+        misses = []
+        original = aghast.interface._fbaccessor
+        def counting(fb, check):
+            misses.append((type(fb), check.paramname))
+            return original(fb, check)
+        aghast.interface._fbaccessor = counting
+        try:
+            histograms = list(frombuffer(buffer).objects.values())
+            starttime = time.time()
+            for histogram in histograms:
+                for name in names:
+                    getattr(histogram, name)
+            firsttime = time.time() - starttime
+
+            starttime = time.time()
+            for i in range(10):
+                for histogram in histograms:
+                    for name in names:
+                        getattr(histogram, name)
+            againtime = time.time() - starttime
+
+            assert walk(frombuffer(buffer)) == n*(10 + 5 + 1 + 3)
+            assert len(misses) < n
+
+            del misses[:]
+            assert walk(frombuffer(buffer)) == n*(10 + 5 + 1 + 3)
+            assert len(misses) == 0
+        finally:
+            aghast.interface._fbaccessor = original
+
+        print("typedproperty: first access {0:.3f} s, {1} repeated accesses {2:.3f} s".format(firsttime, 10*n*len(names), againtime))
+
+    def test_benchmark_rebin(self):
+        def addat(array, pairs):
+            # what InterpretedBuffer._rebin did before it had a reduceat/bincount kernel
+            buf = array
+            i = len(array.shape)
+            newshape = ()
+            for binning, selfmap in pairs[::-1]:
+                i -= len(selfmap)
+                newshape = binning._binshape() + newshape
+                newbuf = numpy.zeros(array.shape[:i] + newshape, dtype=array.dtype)
+                selfmap = tuple(x.copy() for x in selfmap)
+                for j in range(len(selfmap)):
+                    clear = (selfmap[j] < 0)
+                    if clear.any():
+                        if buf is array:
+                            buf = buf.copy()
+                        buf[(slice(None),)*(i + j) + (clear,)] = 0
+                        selfmap[j][clear] = 0
+                numpy.add.at(newbuf, i*(slice(None),) + selfmap, buf)
+                buf = newbuf
+            return buf
+
+        def rebin(num, factor, low=0):
+            # merge factor neighboring bins, dropping the first low bins
+            selfmap = numpy.arange(num, dtype=numpy.int64) // factor - low
+            return RegularBinning((num - 1) // factor + 1 - low, RealInterval(0, 1)), (selfmap,)
+
+        def shuffle(num):
+            selfmap = numpy.random.RandomState(12345).permutation(num) // 2
+            selfmap[::7] = -1
+            return CategoryBinning([str(i) for i in range((num - 1) // 2 + 1)]), (selfmap,)
+
+        cases = [("1D 1000000 bins by 10", (1000000,), numpy.float64, [rebin(1000000, 10)]),
+                 ("1D 1000000 bins shuffled", (1000000,), numpy.float64, [shuffle(1000000)]),
+                 ("2D 1000x1000 by 10x10, dropping 5 bins", (1000, 1000), numpy.int64, [rebin(1000, 10, low=5), rebin(1000, 10)]),
+                 ("2D 1000x1000 shuffled x by 4", (1000, 1000), numpy.int64, [shuffle(1000), rebin(1000, 4)]),
+                 ("3D 200x200x50 by 2x2x5", (200, 200, 50), numpy.float64, [rebin(200, 2), rebin(200, 2), rebin(50, 5)])]
+
+        for name, shape, dtype, pairs in cases:
+            array = numpy.random.RandomState(12345).randint(0, 100, shape).astype(dtype)
+            buffer = InterpretedInlineBuffer.fromarray(array.reshape(-1))
+
+            starttime = time.time()
+            expected = addat(array, pairs)
+            addattime = time.time() - starttime
+
+            starttime = time.time()
+            result = buffer._rebin(shape, pairs)
+            rebintime = time.time() - starttime
+
+            assert result.flatarray.dtype == array.dtype
+            assert numpy.array_equal(result.flatarray, expected.reshape(-1)), name
+            print("rebin {0}: {1:.3f} s (add.at reference {2:.3f} s)".format(name, rebintime, addattime))
@@ -138,6 +138,49 @@ class Test(unittest.TestCase):
         h = Histogram([Axis(IrregularBinning([RealInterval(3, 4.5), RealInterval(4.5, 10), RealInterval(10, 20)], overflow=RealOverflow(loc_underflow=RealOverflow.below1, loc_overflow=RealOverflow.above1, loc_nanflow=RealOverflow.above2, minf_mapping=RealOverflow.in_nanflow, pinf_mapping=RealOverflow.in_nanflow)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(6))))
         assert h.axis[0].binning.toCategoryBinning().categories == ["(-inf, 3)", "[3, 4.5)", "[4.5, 10)", "[10, 20)", "[20, +inf)", "{-inf, +inf, nan}"]
 
+    def test_binning_IrregularBinning_arrays(self):
+        b = IrregularBinning.fromarrays([3, 4.5, 10], [4.5, 10, 20], high_inclusive=[False, False, True])
+        assert b.intervals_array["low"].tolist() == [3, 4.5, 10]
+        assert b.intervals == [RealInterval(3, 4.5), RealInterval(4.5, 10), RealInterval(10, 20, high_inclusive=True)]
+        assert b.toCategoryBinning().categories == ["[3, 4.5)", "[4.5, 10)", "[10, 20]"]
+        self.assertRaises(TypeError, lambda: IrregularBinning.fromarrays([], []))
+
+        h = Histogram([Axis(IrregularBinning.fromarrays([3, 4.5, 10], [4.5, 10, 20]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(3))))
+        h.checkvalid()
+        h2 = frombuffer(h.tobuffer())
+        array = h2.axis[0].binning.intervals_array
+        assert array.base is not None and not array.flags.writeable
+        assert array.tolist() == [(3.0, 4.5, True, False), (4.5, 10.0, True, False), (10.0, 20.0, True, False)]
+        assert h2.axis[0].binning.intervals == h.axis[0].binning.intervals
+
+        h2.axis[0].binning.intervals[1].high_inclusive = True
+        assert h2.axis[0].binning.intervals_array["high_inclusive"].tolist() == [False, True, False]
+        assert frombuffer(h2.tobuffer()).axis[0].binning.intervals[1].high_inclusive
+
+        self.assertRaises(ValueError, lambda: IrregularBinning.fromarrays([3, 3], [4, 4]).checkvalid())
+        self.assertRaises(ValueError, lambda: IrregularBinning.fromarrays([3], [2]).checkvalid())
+
+    def test_binning_CategoryBinning_index(self):
+        b = CategoryBinning(["one", "two", "three"])
+        assert b.category_index("two") == 1
+        assert b.category_index("four") == -1
+        assert b.category_index(numpy.array(["three", "four", "one"])).tolist() == [2, -1, 0]
+        assert b.category_index(numpy.array(["three", "one"], dtype=object)).tolist() == [2, 0]
+        assert b._categoryindex() is b._categoryindex()
+
+        b.categories = ["four", "two"]
+        assert b.category_index(["two", "one"]).tolist() == [1, -1]
+
+        b = CategoryBinning(["None", "1", "a"])
+        assert b.category_index(numpy.array([None, 1, "a"], dtype=object)).tolist() == [-1, -1, 2]
+        assert b.category_index(numpy.array([1, 2])).tolist() == [-1, -1]
+        assert b.category_index(numpy.array([b"a", b"1"])).tolist() == [2, 1]
+
+        h = Histogram([Axis(CategoryBinning(["one", "two", "three"]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([10, 20, 30]))))
+        h2 = frombuffer(h.tobuffer())
+        assert h2.loc[numpy.array(["three", "one"])].counts.counts.array.tolist() == [30, 10, 20]
+        self.assertRaises(IndexError, lambda: h2.loc[numpy.array(["three", "four"])])
+
     def test_binning_SparseRegularBinning(self):
         h = Histogram([Axis(SparseRegularBinning([-3, 6, 10, 11, 12], 10, 0.0))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(5))))
         assert h.axis[0].binning.toCategoryBinning().categories == ["[-30, -20)", "[60, 70)", "[100, 110)", "[110, 120)", "[120, 130)"]
@@ -170,3 +213,55 @@ class Test(unittest.TestCase):
         h = Histogram([Axis(SparseRegularBinning([-3, 6, 10, 11, 12], 10, 0.0, overflow=RealOverflow(loc_nanflow=RealOverflow.below1, minf_mapping=RealOverflow.in_nanflow, pinf_mapping=RealOverflow.in_nanflow, nan_mapping=RealOverflow.missing)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(6))))
         assert h.axis[0].binning.toCategoryBinning().categories == ["{-inf, +inf}", "[-30, -20)", "[60, 70)", "[100, 110)", "[110, 120)", "[120, 130)"]
         assert h.axis[0].binning.toIrregularBinning().toCategoryBinning().categories == ["{-inf, +inf}", "[-30, -20)", "[60, 70)", "[100, 110)", "[110, 120)", "[120, 130)"]
+
+    def test_binning_bin_index(self):
+        values = numpy.array([-1, 0, 0.5, 1, 3.99, 4, 10, numpy.nan, -numpy.inf, numpy.inf])
+
+        binning = RegularBinning(4, RealInterval(0, 4), overflow=RealOverflow(loc_underflow=BinLocation.below1, loc_overflow=BinLocation.above1, loc_nanflow=BinLocation.above2))
+        assert binning.bin_index(values).tolist() == [0, 1, 1, 2, 4, 5, 5, 6, 0, 5]
+        assert RegularBinning(4, RealInterval(0, 4)).bin_index(values).tolist() == [-1, 0, 0, 1, 3, -1, -1, -1, -1, -1]
+        assert RegularBinning(4, RealInterval(0, 4, low_inclusive=False, high_inclusive=True)).bin_index(values).tolist() == [-1, -1, 0, 0, 3, 3, -1, -1, -1, -1]
+        assert RegularBinning(4, RealInterval(0, 4), circular=True).bin_index(values).tolist() == [3, 0, 0, 1, 3, 0, 2, -1, -1, -1]
+        assert binning.bin_index(2.5) == 3
+        assert binning.bin_index(numpy.arange(6.0).reshape(2, 3)).tolist() == [[1, 2, 3], [4, 5, 5]]
+
+        binning = EdgesBinning([0, 1, 2, 4], overflow=RealOverflow(loc_underflow=BinLocation.above1, loc_overflow=BinLocation.above2))
+        assert binning.bin_index(values).tolist() == [3, 0, 0, 1, 2, 4, 4, -1, 3, 4]
+        assert EdgesBinning([0, 1, 2, 4], low_inclusive=False, high_inclusive=False).bin_index(values).tolist() == [-1, -1, 0, -1, 2, -1, -1, -1, -1, -1]
+
+        binning = IrregularBinning([RealInterval(2, 4), RealInterval(0, 1), RealInterval(1, 2)], overflow=RealOverflow(loc_underflow=BinLocation.above1, loc_overflow=BinLocation.above2, loc_nanflow=BinLocation.above3))
+        assert binning.bin_index(values).tolist() == [3, 1, 1, 2, 0, 4, 4, 5, 3, 4]
+        assert IrregularBinning([RealInterval(0, 4), RealInterval(0, 1), RealInterval(1, 2)]).bin_index(values).tolist() == [-1, 0, 0, 0, 0, -1, -1, -1, -1, -1]
+        assert IrregularBinning([RealInterval(0, 4), RealInterval(0, 1), RealInterval(1, 2)], overlapping_fill=IrregularBinning.last).bin_index(values).tolist() == [-1, 1, 1, 2, 0, -1, -1, -1, -1, -1]
+        self.assertRaises(ValueError, lambda: IrregularBinning([RealInterval(0, 4), RealInterval(0, 1)], overlapping_fill=IrregularBinning.all).bin_index(values))
+
+        intervals = [RealInterval(0, 3, high_inclusive=True), RealInterval(1, 2, low_inclusive=False), RealInterval(2, 2, high_inclusive=True), RealInterval(2, 5), RealInterval(4, 6, low_inclusive=False, high_inclusive=True)]
+        points = numpy.arange(-0.5, 7, 0.5)
+        for fill in (IrregularBinning.first, IrregularBinning.last):
+            binning = IrregularBinning([x.detached() for x in intervals], overlapping_fill=fill)
+            expected = []
+            for x in points:
+                inside = [i for i, y in enumerate(intervals) if (y.low < x or (y.low_inclusive and y.low == x)) and (x < y.high or (y.high_inclusive and x == y.high))]
+                expected.append(-1 if len(inside) == 0 else inside[0] if fill == IrregularBinning.first else inside[-1])
+            assert binning.bin_index(points).tolist() == expected
+            table = binning._bintable()[1]
+            assert binning._bintable()[1] is table
+        binning.overlapping_fill = IrregularBinning.first
+        assert binning._bintable()[1] is not table
+
+        assert CategoryBinning(["a", "b", "c"], loc_overflow=BinLocation.below1).bin_index(["b", "x", "a"]).tolist() == [2, 0, 1]
+        assert CategoryBinning(["a", "b", "c"]).bin_index(numpy.array(["c", "q"])).tolist() == [2, -1]
+
+        binning = SparseRegularBinning([5, -3, 0], 0.5, overflow=RealOverflow(loc_nanflow=BinLocation.above1))
+        assert binning.bin_index(numpy.array([2.6, -1.4, 0.2, 1.0, numpy.nan])).tolist() == [0, 1, 2, -1, 3]
+        assert SparseRegularBinning([], 0.5).bin_index(numpy.array([2.6])).tolist() == [-1]
+
+        binning = IntegerBinning(3, 6, loc_underflow=BinLocation.below1, loc_overflow=BinLocation.above1)
+        assert binning.bin_index(numpy.array([1, 3, 4, 6, 7])).tolist() == [0, 1, 2, 4, 5]
+        assert binning.bin_index(numpy.array([3.5, 4.0, numpy.nan, numpy.inf])).tolist() == [-1, 2, -1, 5]
+
+        h = Histogram([Axis(RegularBinning(4, RealInterval(0, 4))), Axis(CategoryBinning(["a", "b"]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(8))))
+        assert h.bin_index(numpy.array([0.5, 3.5, 9]), ["b", "a", "a"]).tolist() == [1, 6, -1]
+        self.assertRaises(TypeError, lambda: h.bin_index(numpy.array([0.5])))
+        c = Collection({"h": h}, axis=[Axis(IntegerBinning(0, 1))])
+        assert c.objects["h"].bin_index(numpy.array([1, 0]), numpy.array([0.5, 3.5]), ["b", "a"]).tolist() == [9, 6]
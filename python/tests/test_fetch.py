@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2019, IRIS-HEP
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+# 
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# 
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy
+
+try:
+    import http.server as httpserver
+except ImportError:
+    import BaseHTTPServer as httpserver
+
+from aghast import *
+import aghast.fetch
+
+class RangeHandler(httpserver.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append((self.client_address, self.headers.get("Range")))
+        data = self.server.files[self.path]
+        start, stop = self.headers.get("Range")[len("bytes="):].split("-")
+        start, stop = int(start), min(int(stop) + 1, len(data))
+        self.send_response(206)
+        self.send_header("Content-Range", "bytes {0}-{1}/{2}".format(start, stop - 1, len(data)))
+        self.send_header("Content-Length", str(stop - start))
+        self.end_headers()
+        self.wfile.write(data[start:stop])
+
+    def log_message(self, *args):
+        pass
+
+class Test(unittest.TestCase):
+    def runTest(self):
+        pass
+
+    def setUp(self):
+        self.server = httpserver.HTTPServer(("127.0.0.1", 0), RangeHandler)
+        self.server.files = {}
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = "http://127.0.0.1:{0}".format(self.server.server_address[1])
+        self.tmpdir = tempfile.mkdtemp()
+        self.saved = dict(aghast.fetch.fetchers)
+
+    def tearDown(self):
+        aghast.fetch.fetchers.clear()
+        aghast.fetch.fetchers.update(self.saved)
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_fetch_ranges(self):
+        data = numpy.arange(100000, dtype=numpy.uint8).tobytes()
+        self.server.files["/data"] = data
+        fetcher = aghast.fetch.HTTPFetcher(cache=aghast.fetch.BlockCache(self.tmpdir, blocksize=1000))
+
+        assert fetcher.readranges(self.url + "/data", [(10, 20), (1500, 2500), (2600, 2700), (50000, 50001)]) == [data[10:20], data[1500:2500], data[2600:2700], data[50000:50001]]
+        assert [x[1] for x in self.server.requests] == ["bytes=0-2999", "bytes=50000-50999"]
+        assert len(set(x[0] for x in self.server.requests)) == 1
+
+        del self.server.requests[:]
+        assert fetcher.read(self.url + "/data", 1000, 3000) == data[1000:3000]
+        assert fetcher.read(self.url + "/data", 99990, 100000) == data[99990:]
+        assert [x[1] for x in self.server.requests] == ["bytes=99000-99999"]
+
+        self.assertRaises(IOError, lambda: fetcher.read(self.url + "/data", 99990, 100010))
+
+    def test_fetch_cache_eviction(self):
+        self.server.files["/data"] = data = os.urandom(10000)
+        cache = aghast.fetch.BlockCache(self.tmpdir, blocksize=1000, maxbytes=3000)
+        fetcher = aghast.fetch.HTTPFetcher(cache=cache)
+        for i in range(10):
+            assert fetcher.read(self.url + "/data", i*1000, i*1000 + 10) == data[i*1000 : i*1000 + 10]
+        assert len(cache) == 3 and cache.nbytes == 3000
+        assert len(os.listdir(self.tmpdir)) == 3
+
+        fetcher.close()
+
+        # a new fetcher checks which version of the file the blocks on disk belong to before using them
+        cache2 = aghast.fetch.BlockCache(self.tmpdir, blocksize=1000, maxbytes=3000)
+        assert len(cache2) == 3
+        fetcher2 = aghast.fetch.HTTPFetcher(cache=cache2)
+        assert fetcher2.read(self.url + "/data", 9000, 10000) == data[9000:10000]
+        assert [x[1] for x in self.server.requests[10:]] == ["bytes=0-0"]
+        assert fetcher2.read(self.url + "/data", 8000, 9000) == data[8000:9000]
+        assert [x[1] for x in self.server.requests[10:]] == ["bytes=0-0"]
+        fetcher2.close()
+
+    def test_fetch_cache_rewritten(self):
+        self.server.files["/data"] = old = os.urandom(3000)
+        fetcher = aghast.fetch.HTTPFetcher(cache=aghast.fetch.BlockCache(self.tmpdir, blocksize=1000))
+        assert fetcher.read(self.url + "/data", 0, 3000) == old
+        fetcher.close()
+
+        # the file is rewritten with a different length: the blocks of the old version must not be read
+        self.server.files["/data"] = new = os.urandom(4000)
+        cache = aghast.fetch.BlockCache(self.tmpdir, blocksize=1000)
+        fetcher = aghast.fetch.HTTPFetcher(cache=cache)
+        assert fetcher.read(self.url + "/data", 0, 4000) == new
+        assert len(cache) == 4
+
+        # rewritten while this fetcher still remembers the old version: caught by the next response
+        self.server.files["/data"] = newer = os.urandom(5000)
+        assert fetcher.read(self.url + "/data", 0, 1000) == new[:1000]
+        assert fetcher.read(self.url + "/data", 0, 5000) == newer
+        assert fetcher.read(self.url + "/data", 0, 1000) == newer[:1000]
+        assert len(cache) == 5
+        fetcher.close()
+
+    def test_fetch_default_directory(self):
+        if not hasattr(os, "getuid"):
+            return
+        directory = aghast.fetch._defaultdirectory()
+        assert os.stat(directory).st_mode & 0o077 == 0
+        assert os.stat(directory).st_uid == os.getuid()
+
+    def test_external_url(self):
+        counts = numpy.arange(10.0)
+        self.server.files["/counts"] = b"padding!" + counts.tobytes()
+        aghast.fetch.register("http", aghast.fetch.HTTPFetcher(cache=aghast.fetch.BlockCache(self.tmpdir)))
+
+        buf = InterpretedExternalBuffer(8, 80, external_source=ExternalBuffer.url, location=self.url + "/counts", dtype=InterpretedBuffer.float64)
+        h = Histogram([Axis(RegularBinning(10, RealInterval(0, 1)))], UnweightedCounts(buf))
+        h.checkvalid()
+        assert h.counts.counts.array.tolist() == counts.tolist()
+        assert h.counts.counts.array.tolist() == counts.tolist()
+        assert len(self.server.requests) == 1
+
+        h2 = frombuffer(h.tobuffer())
+        assert h2.counts.counts.external_source == ExternalBuffer.url
+        assert h2.counts.counts.array.tolist() == counts.tolist()
+        assert len(self.server.requests) == 1
+
+        raw = RawExternalBuffer(8, 16, external_source=ExternalBuffer.url, location=self.url + "/counts")
+        assert raw.array.tobytes() == counts[:2].tobytes()
+
+        self.assertRaises(ValueError, lambda: aghast.fetch.fetcher("s3://bucket/key"))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2019, IRIS-HEP
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+# 
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# 
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import numpy
+
+import aghast.interface
+from aghast import *
+
+class Test(unittest.TestCase):
+    def runTest(self):
+        pass
+
+    def test_fill_counts(self):
+        x = numpy.array([-1, 0.5, 0.5, 1.5, 3.5, 10, numpy.nan, numpy.inf])
+        h = Histogram([Axis(RegularBinning(4, RealInterval(0, 4), overflow=RealOverflow(loc_underflow=BinLocation.below1, loc_overflow=BinLocation.above1, loc_nanflow=BinLocation.above2)), expression="x")], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(7, dtype=numpy.int64))))
+        h.fill(x=x)
+        assert h.counts.flatarray.tolist() == [1, 2, 1, 0, 1, 2, 1]
+
+        h.fill(x=x, weight=2.0)
+        assert isinstance(h.counts, WeightedCounts)
+        assert h.counts.sumw.flatarray.tolist() == [3, 6, 3, 0, 3, 6, 3]
+        assert h.counts.sumw2.flatarray.tolist() == [5, 10, 5, 0, 5, 10, 5]
+        assert h.counts.unweighted.flatarray.tolist() == [2, 4, 2, 0, 2, 4, 2]
+
+        original = aghast.interface._fillchunksize
+        try:
+            aghast.interface._fillchunksize = 3
+            h = Histogram([Axis(RegularBinning(4, RealInterval(0, 4)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(4, dtype=numpy.int64))))
+            h.fill(numpy.array([0.5, 1.5, 1.5, 2.5, 3.5, 3.5, 3.5]))
+            assert h.counts.flatarray.tolist() == [1, 2, 1, 3]
+        finally:
+            aghast.interface._fillchunksize = original
+
+        h = Histogram([Axis(RegularBinning(4, RealInterval(0, 4)), expression="x"), Axis(CategoryBinning(["a", "b"]), expression="c")], WeightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(16)), sumw2=InterpretedInlineBuffer.fromarray(numpy.zeros(16))))
+        c = Collection({"h": h}, axis=[Axis(IntegerBinning(0, 1), expression="i")])
+        c.objects["h"].fill(i=[0, 1, 1], x=[0.5, 1.5, 1.5], c=["a", "b", "b"], weight=[1, 2, 3])
+        assert c.objects["h"].counts.sumw.flatarray.tolist() == [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 5, 0, 0, 0, 0]
+        assert c.objects["h"].counts.sumw2.flatarray.tolist() == [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 13, 0, 0, 0, 0]
+        self.assertRaises(TypeError, lambda: c.objects["h"].fill(i=[0], x=[1], c=["a"], z=[1]))
+        self.assertRaises(ValueError, lambda: c.objects["h"].fill(x=[1], c=["a"]))
+        self.assertRaises(ValueError, lambda: c.objects["h"].fill(i=[0, 1], x=[1], c=["a"]))
+
+    def test_fill_statistics(self):
+        h = Histogram([Axis(RegularBinning(4, RealInterval(0, 4)), expression="x", statistics=[Statistics(
+                           moments=[Moments(InterpretedInlineBuffer.fromarray(numpy.zeros(1)), n=0), Moments(InterpretedInlineBuffer.fromarray(numpy.zeros(1)), n=1, filter=StatisticFilter(excludes_pinf=True, excludes_nan=True))],
+                           min=Extremes(InterpretedInlineBuffer.fromarray(numpy.array([numpy.inf]))),
+                           max=Extremes(InterpretedInlineBuffer.fromarray(numpy.array([-numpy.inf])), filter=StatisticFilter(excludes_pinf=True, excludes_nan=True)))])],
+                      UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(4, dtype=numpy.int64))))
+        h.fill(x=numpy.array([-1, 0.5, 0.5, 1.5, 3.5, 10, numpy.nan, numpy.inf]))
+        statistics = h.axis[0].statistics[0]
+        assert statistics.moments[0].sumwxn.flatarray.tolist() == [8]
+        assert statistics.moments[1].sumwxn.flatarray.tolist() == [15]
+        assert numpy.isnan(statistics.min.values.flatarray[0])
+        assert statistics.max.values.flatarray.tolist() == [10]
+
+        h = Histogram([Axis(RegularBinning(2, RealInterval(0, 2)), expression="x")], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(2, dtype=numpy.int64))),
+                      profile=[Profile("y", Statistics(moments=[Moments(InterpretedInlineBuffer.fromarray(numpy.zeros(2)), n=1), Moments(InterpretedInlineBuffer.fromarray(numpy.zeros(2)), n=2)], max=Extremes(InterpretedInlineBuffer.fromarray(numpy.full(2, -numpy.inf)))))])
+        h.fill(x=[0.5, 0.5, 1.5, 5], y=[1, 3, 10, 100])
+        assert h.counts.flatarray.tolist() == [2, 1]
+        assert h.profile[0].statistics.moments[0].sumwxn.flatarray.tolist() == [4, 10]
+        assert h.profile[0].statistics.moments[1].sumwxn.flatarray.tolist() == [10, 100]
+        assert h.profile[0].statistics.max.values.flatarray.tolist() == [3, 10]
+        self.assertRaises(ValueError, lambda: h.fill(x=[0.5]))
+
+    def test_fill_threads(self):
+        x = numpy.random.normal(0, 1, 10000)
+        w = numpy.random.uniform(0, 1, 10000)
+        one = Histogram([Axis(RegularBinning(10, RealInterval(-5, 5)), expression="x")], WeightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(10)), sumw2=InterpretedInlineBuffer.fromarray(numpy.zeros(10))))
+        two = one.detached()
+        one.fill(x=x, weight=w)
+        two.fill(x=x, weight=w, threads=4, chunksize=999)
+        assert numpy.allclose(one.counts.sumw.flatarray, two.counts.sumw.flatarray)
+        assert numpy.allclose(one.counts.sumw2.flatarray, two.counts.sumw2.flatarray)
+        self.assertRaises(ValueError, lambda: two.fill(x=x, chunksize=0))
+
+    def test_fill_collection(self):
+        c = Collection({"a": Histogram([Axis(RegularBinning(2, RealInterval(0, 2)), expression="x")], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(2, dtype=numpy.int64)))),
+                        "b": Histogram([Axis(RegularBinning(2, RealInterval(0, 2)), expression="x")], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(2, dtype=numpy.int64))),
+                                       profile=[Profile("y", Statistics(moments=[Moments(InterpretedInlineBuffer.fromarray(numpy.zeros(2)), n=1)]))]),
+                        "c": Collection({"d": Histogram([Axis(RegularBinning(1, RealInterval(0, 2)), expression="x")], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(1, dtype=numpy.int64))))})})
+        c.fill(x=[0.5, 1.5, 1.5, 3], y=[1, 2, 3, 4], threads=2, chunksize=2)
+        assert c.objects["a"].counts.flatarray.tolist() == [1, 2]
+        assert c.objects["b"].counts.flatarray.tolist() == [1, 2]
+        assert c.objects["b"].profile[0].statistics.moments[0].sumwxn.flatarray.tolist() == [1, 5]
+        assert c.objects["c"].objects["d"].counts.flatarray.tolist() == [3]
+        self.assertRaises(TypeError, lambda: c.fill(x=[0.5], y=[1], z=[1]))
+
+    def test_fill_sparse(self):
+        h = Histogram([Axis(SparseRegularBinning([0, 2], 1.0), expression="x")], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1, 1], dtype=numpy.int64))))
+        h.fill(x=numpy.array([0.5, 5.5, 5.2, 2.5, -1.5, numpy.nan]))
+        assert h.axis[0].binning.bins.tolist() == [0, 2, -2, 5]
+        assert h.counts.flatarray.tolist() == [2, 2, 1, 2]
+
+        h = Histogram([Axis(SparseRegularBinning([1], 1.0), expression="x"), Axis(RegularBinning(2, RealInterval(0, 2)), expression="y")], WeightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(2)), sumw2=InterpretedInlineBuffer.fromarray(numpy.zeros(2))),
+                      profile=[Profile("z", Statistics(moments=[Moments(InterpretedInlineBuffer.fromarray(numpy.zeros(2)), n=1)], max=Extremes(InterpretedInlineBuffer.fromarray(numpy.full(2, -numpy.inf)))))])
+        h.fill(x=[1.5, 3.5], y=[0.5, 1.5], z=[10, 20], weight=[2, 3])
+        assert h.axis[0].binning.bins.tolist() == [1, 3]
+        assert h.counts.sumw.flatarray.tolist() == [2, 0, 0, 3]
+        assert h.counts.sumw2.flatarray.tolist() == [4, 0, 0, 9]
+        assert h.profile[0].statistics.moments[0].sumwxn.flatarray.tolist() == [10, 0, 0, 20]
+        assert h.profile[0].statistics.max.values.flatarray.tolist() == [10, -numpy.inf, -numpy.inf, 20]
+
+        h = Histogram([Axis(RegularBinning(2, RealInterval(0, 2)), expression="x")], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(4, dtype=numpy.int64))))
+        c = Collection({"h": h}, axis=[Axis(SparseRegularBinning([0, 1], 1.0), expression="s")])
+        self.assertRaises(ValueError, lambda: c.objects["h"].fill(s=[7.5], x=[0.5]))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2019, IRIS-HEP
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+# 
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# 
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import numpy
+
+from aghast import *
+
+class Test(unittest.TestCase):
+    def runTest(self):
+        pass
+
+    def test_fingerprint_structure(self):
+        def make(title, counts):
+            return Histogram([Axis(RegularBinning(10, RealInterval(0, 1))), Axis(CategoryBinning(["a", "b"]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array(counts))), title=title)
+
+        a = make("one", numpy.arange(20))
+        b = make("two", numpy.zeros(20, dtype=numpy.int64))
+        assert a.fingerprint() == b.fingerprint()
+        assert a.fingerprint(structure_only=False) != b.fingerprint(structure_only=False)
+        assert {a.fingerprint(): a}[b.fingerprint()] is a
+
+        c = Histogram([Axis(RegularBinning(10, RealInterval(0.0, 1.0))), Axis(CategoryBinning(["a", "b"]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(20))))
+        assert c.fingerprint() == a.fingerprint()
+        assert c.fingerprint(structure_only=False) != a.fingerprint(structure_only=False)
+        c.title = "one"
+        assert c.fingerprint(structure_only=False) == a.fingerprint(structure_only=False)
+
+        d = Histogram([Axis(RegularBinning(10, RealInterval(0, 1))), Axis(CategoryBinning(["a", "c"]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(20))))
+        assert d.fingerprint() != a.fingerprint()
+
+        e = Histogram([Axis(IrregularBinning([RealInterval(0, 1), RealInterval(1, 2)]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(2))))
+        f = Histogram([Axis(IrregularBinning([RealInterval(0, 1), RealInterval(1, 2, high_inclusive=True)]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(2))))
+        assert e.fingerprint() != f.fingerprint()
+        assert e.axis[0].binning.fingerprint() == frombuffer(e.tobuffer()).axis[0].binning.fingerprint()
+
+    def test_fingerprint_invalidate(self):
+        h = Histogram([Axis(RegularBinning(10, RealInterval(0, 1)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(10))))
+        before = h.fingerprint()
+        assert h.fingerprint() is before
+        h.axis[0].binning.interval.high = 2
+        assert h.fingerprint() != before
+        h.axis[0].binning.interval.high = 1
+        assert h.fingerprint() == before
+
+        c = Collection({"h": h}, axis=[Axis(CategoryBinning(["a"]))])
+        before = c.fingerprint()
+        h.axis[0].binning.num = 5
+        assert c.fingerprint() != before
+
+    def test_fingerprint_contents(self):
+        a = Histogram([Axis(IntegerBinning(0, 2))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1, 2, 3]))))
+        b = frombuffer(a.tobuffer(compression=Buffer.gzip))
+        assert a.fingerprint(structure_only=False) == b.fingerprint(structure_only=False)
+        assert frombuffer(a.tobuffer()).fingerprint(structure_only=False) == a.fingerprint(structure_only=False)
+        before = a.fingerprint(structure_only=False)
+        a += a
+        assert a.fingerprint(structure_only=False) != before
@@ -28,9 +28,15 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import gc
+import io
+import os
 import pickle
+import shutil
+import tempfile
 import unittest
 
+import pytest
 import numpy
 
 from aghast import *
@@ -43,6 +49,104 @@ class Test(unittest.TestCase):
         h = Histogram([Axis(RegularBinning(10, RealInterval(-5, 5)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([0.0, 1.1, 2.2, 3.3, 4.4, 5.5, 6.6, 7.7, 8.8, 9.9]))))
         assert h == pickle.loads(pickle.dumps(h))
 
+    def test_pickle_outofband(self):
+        h = Histogram([Axis(RegularBinning(100000, RealInterval(-5, 5)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(100000, dtype=numpy.float64))))
+        for protocol in range(2, pickle.HIGHEST_PROTOCOL + 1):
+            assert h == pickle.loads(pickle.dumps(h, protocol=protocol))
+        if not hasattr(pickle, "PickleBuffer"):
+            return
+
+        buffers = []
+        data = pickle.dumps(h, protocol=5, buffer_callback=buffers.append)
+        assert len(buffers) == 2 and len(data) < 1000
+        buffers = [x.raw() for x in buffers]
+        h2 = pickle.loads(data, buffers=buffers)
+        assert h2 == h
+        assert numpy.shares_memory(h2.counts.counts.buffer, buffers[1])
+
+        # unmodified objects ship the bytes they were read from
+        original = h.tobuffer()
+        buffers = []
+        data = pickle.dumps(frombuffer(original), protocol=5, buffer_callback=buffers.append)
+        assert len(buffers) == 1 and buffers[0].raw().obj is original
+        h3 = pickle.loads(data, buffers=buffers)
+        assert h3 == h
+        h3.title = "changed"
+        assert pickle.loads(pickle.dumps(h3, protocol=5)).title == "changed"
+
+        # detached copies carry their modifications; they must not fall back to the original bytes
+        a = frombuffer(original)
+        a.title = "changed"
+        a.counts = UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.ones(100000)))
+        d = a.detached()
+        for protocol in (2, 5):
+            d2 = pickle.loads(pickle.dumps(d, protocol=protocol))
+            assert d2.title == "changed"
+            assert d2.counts.counts.array.tolist() == [1.0]*100000
+
+        # objects that are not the root of their whole buffer are rebuilt, not shipped with their neighbors
+        c = Collection({"small": Histogram([Axis(RegularBinning(1, RealInterval(0, 1)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([7])))), "large": h})
+        small = frombuffer(c.tobuffer()).objects["small"].detached()
+        assert len(pickle.dumps(small, protocol=2)) < 10000
+        assert pickle.loads(pickle.dumps(small, protocol=2)).counts.counts.array.tolist() == [7]
+
+        tmp = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmp, "appended.ghast")
+            h.tofile(filename, append=True, name="large")
+            small.tofile(filename, append=True, name="small")
+            f = fromfile(filename, mode="r", name="small")
+            for protocol in (2, 5):
+                data = pickle.dumps(f, protocol=protocol)
+                assert len(data) < 10000
+                assert pickle.loads(data) == small
+            del f
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_tobuffer_validate(self):
+        h = Histogram([Axis(RegularBinning(10, RealInterval(-5, 5)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(10, dtype=numpy.float64))))
+        h.tobuffer(validate="dirty")
+        # not through a setter, so only a full validation (the default) notices
+        h.counts._counts = InterpretedInlineBuffer.fromarray(numpy.arange(5, dtype=numpy.float64))
+        h.tobuffer(validate="dirty")
+        h.tobuffer(validate="none")
+        self.assertRaises(ValueError, lambda: h.tobuffer())
+        self.assertRaises(ValueError, lambda: h.tobuffer(validate="full"))
+        self.assertRaises(ValueError, lambda: h.tobuffer(validate="something"))
+        self.assertRaises(ValueError, lambda: h.tofile(io.BytesIO()))
+
+        h.counts.counts = InterpretedInlineBuffer.fromarray(numpy.arange(10, dtype=numpy.float64))
+        h.tobuffer(validate="dirty")
+        h.axis[0].binning.num = 5
+        self.assertRaises(ValueError, lambda: h.tobuffer(validate="dirty"))
+        h.axis[0].binning.num = 10
+
+        # arrays edited in place bypass the setters too
+        e = Histogram([Axis(EdgesBinning([0.0, 1.0, 2.0]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1, 2]))))
+        e.tobuffer()
+        e.axis[0].binning.edges[2] = 0.5
+        self.assertRaises(ValueError, lambda: e.tobuffer())
+
+        c = Collection({"h": h, "h2": h.detached()}, axis=[Axis(RegularBinning(1, RealInterval(-5, 5)))])
+        c.tobuffer(validate="dirty")
+        c.objects["h2"].title = "changed"
+        c.tobuffer(validate="dirty")
+        assert frombuffer(c.tobuffer(validate="dirty")).objects["h2"].title == "changed"
+        c.axis = [Axis(RegularBinning(2, RealInterval(-5, 5)))]
+        self.assertRaises(ValueError, lambda: c.tobuffer(validate="dirty"))
+
+    def test_slots(self):
+        h = Histogram([Axis(IrregularBinning([RealInterval(-5, 0), RealInterval(0, 5)]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1.1, 2.2]))), title="h")
+        h2 = frombuffer(h.tobuffer())
+        for x in (h, h.axis[0], h.axis[0].binning.intervals[0], h.counts.counts, h2, h2.axis[0].binning.intervals[0], h2.counts.counts):
+            self.assertRaises(AttributeError, lambda: x.__dict__)
+        self.assertRaises(AttributeError, lambda: setattr(h, "nonexistent", 123))
+        assert h2 == h
+        assert h2.detached() == h
+        assert pickle.loads(pickle.dumps(h2.detached())) == h
+        assert h2.axis[0].binning.intervals[1].detached(reclaim=True).low == 0
+
     def test_serialization_Metadata(self):
         h = Collection({}, metadata=Metadata("""{"one": 1, "two": 2}""", language=Metadata.json))
         assert h == frombuffer(h.tobuffer(), checkvalid=True)
@@ -308,3 +412,290 @@ class Test(unittest.TestCase):
         # assert h == frombuffer(h.tobuffer(), checkvalid=True)
         # h = Collection({"b": Collection({"c": Histogram([Axis(RegularBinning(10, RealInterval(-5, 5)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(60)))), "d": Histogram([Axis(RegularBinning(100, RealInterval(-5, 5)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(600))))}, axis=[Axis(FractionBinning())])}, axis=[Axis(RegularBinning(3, RealInterval(-1, 1)))])
         # assert h == frombuffer(h.tobuffer(), checkvalid=True)
+
+    def test_serialization_filters(self):
+        for compression in [[Buffer.gzip], [Buffer.lzma], [Buffer.gzip, Buffer.lzma]]:
+            h = BinnedEvaluatedFunction([Axis()], InterpretedInlineBuffer.fromarray(numpy.array([3.14]), compression=compression))
+            assert h.values.filters == compression
+            assert h == frombuffer(h.tobuffer(), checkvalid=True)
+            assert frombuffer(h.tobuffer()).values.array.tolist() == [3.14]
+
+        buf = InterpretedInlineBuffer.fromarray(numpy.arange(1000, dtype=numpy.int32), compression=Buffer.gzip).buffer
+        h = BinnedEvaluatedFunction([Axis(IntegerBinning(0, 999))], InterpretedExternalBuffer(buf.ctypes.data, buf.nbytes, filters=[Buffer.gzip], dtype=InterpretedBuffer.int32))
+        assert h == frombuffer(h.tobuffer(), checkvalid=True)
+        assert frombuffer(h.tobuffer()).values.array.tolist() == list(range(1000))
+
+        h = Ntuple([Column("one", Column.int32, filters=[Buffer.gzip])], [NtupleInstance([Chunk([ColumnChunk([Page(RawInlineBuffer(InterpretedInlineBuffer.fromarray(numpy.array([5, 4, 3], dtype=numpy.int32), compression=Buffer.gzip).buffer))], [0, 3])])])])
+        assert h == frombuffer(h.tobuffer(), checkvalid=True)
+        assert frombuffer(h.tobuffer()).instances[0].chunks[0].column_chunks[0].array.tolist() == [5, 4, 3]
+
+    def test_serialization_filters_lz4(self):
+        pytest.importorskip("lz4.frame")
+        h = BinnedEvaluatedFunction([Axis()], InterpretedInlineBuffer.fromarray(numpy.array([3.14]), compression=Buffer.lz4))
+        assert h == frombuffer(h.tobuffer(), checkvalid=True)
+        assert frombuffer(h.tobuffer()).values.array.tolist() == [3.14]
+
+    def test_serialization_compression(self):
+        h = Collection({"h": Histogram([Axis(RegularBinning(100, RealInterval(-5, 5)))], WeightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(100)), sumw2=InterpretedInlineBuffer.fromarray(numpy.zeros(100, dtype=numpy.int32))))})
+        for compression in [Buffer.gzip, Buffer.lzma]:
+            data = h.tobuffer(compression=compression)
+            assert len(data) < len(h.tobuffer())
+            h2 = frombuffer(data, checkvalid=True)
+            assert h2.objects["h"].counts.sumw.filters == [compression]
+            assert h2.objects["h"].counts.sumw.array.tolist() == [0.0] * 100
+            assert h2.objects["h"].counts.sumw2.array.tolist() == [0] * 100
+            assert h.objects["h"].counts.sumw.filters is None
+
+    def test_serialization_filters_cache(self):
+        h = BinnedEvaluatedFunction([Axis()], InterpretedInlineBuffer.fromarray(numpy.array([3.14]), compression=Buffer.gzip))
+        h2 = frombuffer(h.tobuffer())
+        assert numpy.shares_memory(h2.values.flatarray, h2.values.flatarray)
+
+    def test_serialization_large(self):
+        h = Histogram([Axis(RegularBinning(100000, RealInterval(-5, 5)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(100000))))
+        assert h == frombuffer(h.tobuffer(), checkvalid=True)
+        h = BinnedEvaluatedFunction([Axis(EdgesBinning(numpy.arange(20000, dtype=numpy.float64)[::2]))], InterpretedInlineBuffer(numpy.arange(9999, dtype=numpy.float64)[::-1], dtype=InterpretedInlineBuffer.float64))
+        assert h == frombuffer(h.tobuffer(), checkvalid=True)
+
+    def test_serialized_size_estimate(self):
+        h = Collection({str(i): Histogram([Axis(IrregularBinning([RealInterval(j, j + 1) for j in range(10)]))], WeightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(10.0)), sumw2=InterpretedInlineBuffer.fromarray(numpy.arange(10.0))), title="hello") for i in range(10)})
+        assert h.serialized_size_estimate() >= len(h.tobuffer())
+        h = Histogram([Axis(RegularBinning(100000, RealInterval(-5, 5)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(100000))))
+        assert 800000 <= len(h.tobuffer()) <= h.serialized_size_estimate() < 801000
+        assert h.serialized_size_estimate() == frombuffer(h.tobuffer()).serialized_size_estimate()
+
+    def test_tofile_external(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmp, "test.ghast")
+            h = Collection({"big": Histogram([Axis(RegularBinning(1000, RealInterval(-5, 5)))], WeightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(1000.0)), sumw2=InterpretedInlineBuffer.fromarray(numpy.arange(1000, dtype=numpy.int32)))),
+                            "small": Histogram([Axis(RegularBinning(10, RealInterval(-5, 5)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(10)))),
+                            "ntuple": Ntuple([Column("one", Column.int32)], [NtupleInstance([Chunk([ColumnChunk([Page(RawInlineBuffer(numpy.arange(500, dtype=numpy.int32)))], [0, 500])])])])})
+            h.tofile(filename, external_threshold=1000)
+            assert h.objects["big"].counts.sumw.buffer.nbytes == 8000
+
+            h2 = fromfile(filename, mode="r", checkvalid=True)
+            assert isinstance(h2.objects["big"].counts.sumw, InterpretedExternalBuffer)
+            assert h2.objects["big"].counts.sumw.external_source == InterpretedExternalBuffer.samefile
+            assert isinstance(h2.objects["big"].counts.sumw2, InterpretedExternalBuffer)
+            assert isinstance(h2.objects["small"].counts.counts, InterpretedInlineInt64Buffer)
+            assert isinstance(h2.objects["ntuple"].instances[0].chunks[0].column_chunks[0].pages[0].buffer, RawExternalBuffer)
+            assert h2.objects["big"].counts.sumw.array.tolist() == numpy.arange(1000.0).tolist()
+            assert h2.objects["big"].counts.sumw2.array.tolist() == list(range(1000))
+            assert h2.objects["small"].counts.counts.array.tolist() == list(range(10))
+            assert h2.objects["ntuple"].instances[0].chunks[0].column_chunks[0].array.tolist() == list(range(500))
+
+            h3 = frombuffer(h2.tobuffer(), checkvalid=True)
+            assert isinstance(h3.objects["big"].counts.sumw, InterpretedInlineBuffer)
+            assert h3.objects["big"].counts.sumw.array.tolist() == numpy.arange(1000.0).tolist()
+
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_external_file(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            numpy.concatenate([numpy.arange(10.0), numpy.arange(100.0, 110.0)]).tofile(os.path.join(tmp, "sidecar.bin"))
+            numpy.arange(5, dtype=numpy.int32).tofile(os.path.join(tmp, "pages.bin"))
+            h = Collection({"one": Histogram([Axis(RegularBinning(10, RealInterval(-5, 5)))], UnweightedCounts(InterpretedExternalBuffer(0, 80, external_source=InterpretedExternalBuffer.file, dtype=InterpretedBuffer.float64, location="sidecar.bin"))),
+                            "two": Histogram([Axis(RegularBinning(10, RealInterval(-5, 5)))], UnweightedCounts(InterpretedExternalBuffer(80, 80, external_source=InterpretedExternalBuffer.file, dtype=InterpretedBuffer.float64, location="sidecar.bin"))),
+                            "ntuple": Ntuple([Column("one", Column.int32)], [NtupleInstance([Chunk([ColumnChunk([Page(RawExternalBuffer(4, 16, external_source=RawExternalBuffer.file, location=os.path.join(tmp, "pages.bin")))], [0, 4])])])])})
+            cwd = os.getcwd()
+            os.chdir(tmp)
+            try:
+                h.tofile("test.ghast")
+            finally:
+                os.chdir(cwd)
+
+            h2 = fromfile(os.path.join(tmp, "test.ghast"), mode="r", checkvalid=True)
+            one = h2.objects["one"].counts.counts
+            two = h2.objects["two"].counts.counts
+            assert one.location == "sidecar.bin"
+            assert one.array.tolist() == numpy.arange(10.0).tolist()
+            assert two.array.tolist() == numpy.arange(100.0, 110.0).tolist()
+            assert one.flatarray.base.base is two.flatarray.base.base
+            assert h2.objects["ntuple"].instances[0].chunks[0].column_chunks[0].array.tolist() == [1, 2, 3, 4]
+
+            h3 = h2.objects["one"] + h2.objects["two"]
+            assert h3.counts.counts.array.tolist() == (numpy.arange(10.0) + numpy.arange(100.0, 110.0)).tolist()
+            h4 = h2.objects["one"]
+            h4 += h2.objects["two"]
+            assert h4.counts.counts.array.tolist() == (numpy.arange(10.0) + numpy.arange(100.0, 110.0)).tolist()
+
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_eq_fromfile(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            h = Collection({"one": Histogram([Axis(RegularBinning(10, RealInterval(-5, 5)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(10)))),
+                            "two": Histogram([Axis(IrregularBinning([RealInterval(0, 1), RealInterval(1, 2)]))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(2))))})
+            h.tofile(os.path.join(tmp, "a.ghast"))
+            h.tofile(os.path.join(tmp, "b.ghast"))
+
+            a = fromfile(os.path.join(tmp, "a.ghast"), mode="r")
+            b = fromfile(os.path.join(tmp, "b.ghast"), mode="r")
+            assert a == b
+            assert not hasattr(a, "_objects") and not hasattr(b, "_objects")
+            assert a == h and h == a
+
+            b.objects["two"].axis[0].binning.intervals = [RealInterval(0, 1), RealInterval(1, 3)]
+            assert a != b
+            b.objects["two"].axis[0].binning.intervals = [RealInterval(0, 1), RealInterval(1, 2)]
+            assert a == b
+
+            # relative external files are resolved next to each file, so identical bytes can mean different data
+            for name, values in (("c", [1, 2]), ("d", [3, 4])):
+                os.mkdir(os.path.join(tmp, name))
+                with open(os.path.join(tmp, name, "data.bin"), "wb") as file:
+                    file.write(numpy.array(values, dtype="<i8").tobytes())
+                Histogram([Axis(IntegerBinning(0, 1))], UnweightedCounts(InterpretedExternalBuffer(0, 16, external_source=ExternalBuffer.file, location="data.bin", dtype=InterpretedBuffer.int64))).tofile(os.path.join(tmp, name, "h.ghast"), validate="none")
+            c = fromfile(os.path.join(tmp, "c", "h.ghast"), mode="r")
+            d = fromfile(os.path.join(tmp, "d", "h.ghast"), mode="r")
+            assert c.counts.counts.array.tolist() == [1, 2] and d.counts.counts.array.tolist() == [3, 4]
+            assert not c.isclose(d)
+            assert c.isclose(fromfile(os.path.join(tmp, "c", "h.ghast"), mode="r"))
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_eq_detached(self):
+        buf = Collection({"x": Histogram([Axis(RegularBinning(10, RealInterval(-5, 5)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(10)))), "y": Histogram([Axis(RegularBinning(10, RealInterval(-5, 5)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.arange(10))))}, title="orig").tobuffer()
+        a = frombuffer(buf)
+        a.title = "changed"
+        d = a.detached()
+        assert d.title == "changed"
+        assert d != frombuffer(buf) and frombuffer(buf) != d
+
+        a = frombuffer(buf)
+        a.objects["x"].counts = UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.zeros(10, dtype=numpy.int64)))
+        assert a.objects["x"].detached() != frombuffer(buf).objects["x"]
+        assert a.detached() != frombuffer(buf)
+
+        # sub-tables of the same buffer are equal without reading their fields
+        one = frombuffer(buf).objects["y"]
+        two = frombuffer(buf).objects["y"]
+        assert one == two and not hasattr(one, "_counts") and not hasattr(two, "_counts")
+
+    def test_isclose(self):
+        one = Histogram([Axis(RegularBinning(3, RealInterval(0, 1)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1.0, 2.0, 3.0]))))
+        two = Histogram([Axis(RegularBinning(3, RealInterval(0, 1)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1.0, 2.0, 3.0 + 1e-9]))))
+        assert one != two
+        assert one.isclose(two)
+        assert not one.isclose(two, rtol=0, atol=0)
+        assert one.isclose(frombuffer(two.tobuffer(compression=Buffer.gzip)))
+
+        three = Histogram([Axis(RegularBinning(3, RealInterval(0, 1)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1, 2, 3]))))
+        four = Histogram([Axis(RegularBinning(3, RealInterval(0, 1)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1, 2, 4]))))
+        assert not three.isclose(four, rtol=1)
+        assert not one.isclose(Histogram([Axis(RegularBinning(3, RealInterval(0, 2)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1.0, 2.0, 3.0])))))
+
+    def test_fromfile_keyindex(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmp, "test.ghast")
+            names = ["h{0}".format(i) for i in range(100)] + [u"été", "", "h1 "]
+            c = Collection(dict((n, Histogram([Axis(RegularBinning(3, RealInterval(0, 1)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([i, i, i]))))) for i, n in enumerate(names)))
+            c.tofile(filename)
+
+            c2 = fromfile(filename, mode="r")
+            for i, n in enumerate(names):
+                assert c2.objects[n].counts.counts.array.tolist() == [i, i, i]
+            assert "h42" in c2.objects
+            assert "h100" not in c2.objects
+            self.assertRaises(KeyError, lambda: c2.objects["h100"])
+            assert c2.objects._lookup is None
+            assert len(c2.objects) == len(names)
+            assert set(c2.objects) == set(names)
+
+            Histogram([Axis(RegularBinning(3, RealInterval(0, 1)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1, 2, 3])))).tofile(filename)
+            assert fromfile(filename, mode="r").counts.counts.array.tolist() == [1, 2, 3]
+
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_tofile_append(self):
+        def histogram(i):
+            return Histogram([Axis(RegularBinning(3, RealInterval(0, 1)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([i, i, i]))))
+
+        tmp = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmp, "test.ghast")
+            histogram(0).tofile(filename)
+            histogram(1).tofile(filename, append=True, name="a")
+            Collection({"x": histogram(2), "y": histogram(3)}).tofile(filename, append=True, name="c")
+            histogram(4).tofile(filename, append=True, name="a", external_threshold=0)
+            assert filedirectory(filename) == [("", 0), ("a", 0), ("c", 0), ("a", 1)]
+
+            assert fromfile(filename, mode="r").counts.counts.array.tolist() == [4, 4, 4]
+            assert fromfile(filename, mode="r", name="a").counts.counts.array.tolist() == [4, 4, 4]
+            assert fromfile(filename, mode="r", name="a", version=0).counts.counts.array.tolist() == [1, 1, 1]
+            assert fromfile(filename, mode="r", name="").counts.counts.array.tolist() == [0, 0, 0]
+            c = fromfile(filename, mode="r", name="c")
+            assert c.objects["y"].counts.counts.array.tolist() == [3, 3, 3]
+            assert c.objects._lookup is None
+            self.assertRaises(KeyError, lambda: fromfile(filename, mode="r", name="b"))
+
+        finally:
+            shutil.rmtree(tmp)
+
+        file = io.BytesIO()
+        histogram(5).tofile(file, append=True, name="first")
+        histogram(6).tofile(file, append=True, name="second")
+        array = numpy.frombuffer(file.getvalue(), dtype=numpy.uint8)
+        assert filedirectory(array) == [("first", 0), ("second", 0)]
+        assert fromfile(array, name="first").counts.counts.array.tolist() == [5, 5, 5]
+
+    def test_shared(self):
+        pytest.importorskip("multiprocessing.shared_memory")
+        c = Collection({"h": Histogram([Axis(RegularBinning(3, RealInterval(0, 1)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1, 2, 3]))))})
+        shared = c.toshared()
+        c2 = fromshared(shared.name, checkvalid=True)
+        counts = c2.objects["h"].counts.counts.array
+        assert c2 == c
+
+        c3 = fromshared(shared.name)
+        assert c3.objects["h"].counts.counts.array.tolist() == [1, 2, 3]
+        view = c3.objects["h"].counts.counts.array
+        assert not view.flags.writeable
+
+        # the creator letting go doesn't release the block while readers are still attached
+        shared.close()
+        assert counts.tolist() == [1, 2, 3]
+        assert view.tolist() == [1, 2, 3]
+        shared.close()
+        assert "closed" in repr(shared)
+        del c2, counts
+        gc.collect()
+        assert fromshared(shared.name) == c
+
+        # the last reader to let go unlinks it
+        del c3, view
+        gc.collect()
+        if os.name != "nt":
+            self.assertRaises(OSError, lambda: fromshared(shared.name))
+
+        with c.toshared() as shared:
+            assert fromshared(shared.name) == c
+
+    def test_shared_processes(self):
+        pytest.importorskip("multiprocessing.shared_memory")
+        import multiprocessing
+        import subprocess
+        import sys
+        c = Collection({"h": Histogram([Axis(RegularBinning(3, RealInterval(0, 1)))], UnweightedCounts(InterpretedInlineBuffer.fromarray(numpy.array([1, 2, 3]))))})
+        with c.toshared() as shared:
+            # a reader that exits must not take the block with it
+            script = "import aghast; assert aghast.fromshared({0}).objects['h'].counts.counts.array.tolist() == [1, 2, 3]".format(repr(shared.name))
+            environ = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+            subprocess.check_call([sys.executable, "-c", script], env=environ)
+            subprocess.check_call([sys.executable, "-c", script], env=environ)
+            assert fromshared(shared.name) == c
+
+            pool = multiprocessing.get_context("spawn").Pool(2)
+            try:
+                assert pool.map(fromshared, [shared.name]*4) == [c]*4
+                assert pool.map(fromshared, [shared.name]*4) == [c]*4
+            finally:
+                pool.close()
+                pool.join()
+            assert fromshared(shared.name) == c